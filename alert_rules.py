@@ -0,0 +1,183 @@
+import logging
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from result_index import tokenize, parse_result_filters, describe_filters
+
+logger = logging.getLogger(__name__)
+
+CONDITION_PREFIXES = ('is:', 'cond:')
+THOUSANDS_SEPARATOR = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    include: frozenset = frozenset()  # words the title must contain, all of them
+    exclude: frozenset = frozenset()  # words the title must not contain
+    min_cents: Optional[int] = None
+    max_cents: Optional[int] = None
+    sellers: frozenset = frozenset()  # empty allows every seller
+    blocked_sellers: frozenset = frozenset()
+    conditions: frozenset = frozenset()  # any of these in the listing's condition (its title when it has none)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'AlertRule':
+        return cls(
+            include=frozenset(data.get('include', ())),
+            exclude=frozenset(data.get('exclude', ())),
+            min_cents=data.get('min_cents'),
+            max_cents=data.get('max_cents'),
+            sellers=frozenset(data.get('sellers', ())),
+            blocked_sellers=frozenset(data.get('blocked_sellers', ())),
+            conditions=frozenset(data.get('conditions', ())),
+        )
+
+    def to_dict(self) -> dict:
+        # Plain lists and ints, so rules can be persisted in chat_data
+        data = {name: sorted(getattr(self, name)) for name in
+                ('include', 'exclude', 'sellers', 'blocked_sellers', 'conditions') if getattr(self, name)}
+        if self.min_cents is not None:
+            data['min_cents'] = self.min_cents
+        if self.max_cents is not None:
+            data['max_cents'] = self.max_cents
+        return data
+
+    @property
+    def is_empty(self) -> bool:
+        return self == AlertRule()
+
+    def matches(self, listing, tokens=None) -> bool:
+        # `tokens` is the set of words in the listing's title, when the caller already has it
+        if self.min_cents is not None or self.max_cents is not None:
+            if listing.price_cents is None:
+                return False
+            if self.min_cents is not None and listing.price_cents < self.min_cents:
+                return False
+            if self.max_cents is not None and listing.price_cents > self.max_cents:
+                return False
+        tokens = set(tokenize(listing.name)) if tokens is None else tokens
+        if not self.include <= tokens or not self.exclude.isdisjoint(tokens):
+            return False
+        if self.sellers or self.blocked_sellers:
+            seller = listing.username.lower()
+            if (self.sellers and seller not in self.sellers) or seller in self.blocked_sellers:
+                return False
+        if self.conditions:
+            condition = (listing.extra or {}).get('condition')
+            words = set(tokenize(condition)) if condition else tokens
+            if self.conditions.isdisjoint(words):
+                return False
+        return True
+
+
+def parse_alert_rule(text: str) -> AlertRule:
+    # The result filter syntax ("100-500 iphone -case @seller") plus any number of @sellers,
+    # !@seller to ignore a seller and is:word / cond:word for the listing's condition.
+    # A bare number keeps its old meaning of a maximum price; prices may use thousands separators
+    # ("S$1,200"). Raises ValueError when the title words would contain a number and the rule has
+    # no price, e.g. "1.2.3" or "under 500": that is far more often a mistyped price than a word.
+    text = THOUSANDS_SEPARATOR.sub('', text.strip())
+    price = (text[2:] if text.upper().startswith('S$') else text.lstrip('$')).strip()
+    if price.replace('.', '', 1).isdigit():
+        return AlertRule(max_cents=round(float(price) * 100))
+
+    sellers, blocked_sellers, conditions, rest = set(), set(), set(), []
+    for part in text.split():
+        lowered = part.lower()
+        if lowered.startswith('!@') and len(part) > 2:
+            blocked_sellers.add(lowered[2:])
+        elif lowered.startswith('@') and len(part) > 1:
+            sellers.add(lowered[1:])
+        elif lowered.startswith(CONDITION_PREFIXES):
+            conditions.update(tokenize(lowered.partition(':')[2]))
+        else:
+            rest.append(part)
+
+    filters = parse_result_filters(' '.join(rest))
+    if (filters.get('min_cents') is None and filters.get('max_cents') is None
+            and any(character.isdigit() for word in filters['include'] for character in word)):
+        raise ValueError(f"Could not read a price from {text!r}")
+    return AlertRule(
+        include=frozenset(filters['include']),
+        exclude=frozenset(filters['exclude']),
+        min_cents=filters.get('min_cents'),
+        max_cents=filters.get('max_cents'),
+        sellers=frozenset(sellers),
+        blocked_sellers=frozenset(blocked_sellers),
+        conditions=frozenset(conditions),
+    )
+
+
+def describe_rule(rule: AlertRule) -> str:
+    parts = [describe_filters({'include': sorted(rule.include), 'exclude': sorted(rule.exclude),
+                               'min_cents': rule.min_cents, 'max_cents': rule.max_cents})]
+    if rule.sellers:
+        parts.append("from " + ", ".join(f"@{seller}" for seller in sorted(rule.sellers)))
+    if rule.blocked_sellers:
+        parts.append("not from " + ", ".join(f"@{seller}" for seller in sorted(rule.blocked_sellers)))
+    if rule.conditions:
+        parts.append("condition " + " or ".join(sorted(rule.conditions)))
+    return "; ".join(part for part in parts if part)
+
+
+class RuleSet:
+    # Many alert rules compiled for matching together. A rule with required words is indexed
+    # under each of them and only becomes a candidate for a listing whose title contains all
+    # of them (counted through the index), so rules about other things cost nothing. Rules
+    # without words are indexed by allowed seller, then by maximum price (only rules whose
+    # maximum the listing's price is within are tried); only the remainder sees every listing.
+
+    def __init__(self, rules: dict):
+        # rules: key (e.g. chat_id) -> AlertRule
+        self._keys = list(rules)
+        self._rules = list(rules.values())
+        self._by_token = defaultdict(list)  # word -> positions of rules requiring it
+        self._by_seller = defaultdict(list)  # seller -> positions of word-less rules allowing it
+        by_max_price = []  # (max_cents, position) of the remaining rules with a maximum price
+        self._unindexed = []
+        for position, rule in enumerate(self._rules):
+            if rule.include:
+                for token in rule.include:
+                    self._by_token[token].append(position)
+            elif rule.sellers:
+                for seller in rule.sellers:
+                    self._by_seller[seller].append(position)
+            elif rule.max_cents is not None:
+                by_max_price.append((rule.max_cents, position))
+            else:
+                self._unindexed.append(position)
+        by_max_price.sort()
+        self._max_prices = [max_cents for max_cents, _ in by_max_price]
+        self._by_max_price = [position for _, position in by_max_price]
+
+    def __len__(self):
+        return len(self._rules)
+
+    def _candidates(self, tokens, seller, price_cents) -> list:
+        hits = defaultdict(int)
+        for token in tokens:
+            for position in self._by_token.get(token, ()):
+                hits[position] += 1
+        rules = self._rules
+        candidates = [position for position, count in hits.items() if count == len(rules[position].include)]
+        candidates.extend(self._by_seller.get(seller, ()))
+        if price_cents is not None:
+            candidates.extend(self._by_max_price[bisect_left(self._max_prices, price_cents):])
+        candidates.extend(self._unindexed)
+        return candidates
+
+    def match_listing(self, listing) -> list:
+        # Keys of the rules `listing` satisfies
+        tokens = set(tokenize(listing.name))
+        return [self._keys[position] for position in self._candidates(tokens, listing.username.lower(), listing.price_cents)
+                if self._rules[position].matches(listing, tokens)]
+
+    def match(self, listings) -> dict:
+        # key -> listings matching that rule, in result order; rules matching nothing are left out
+        matches = defaultdict(list)
+        for listing in listings:
+            for key in self.match_listing(listing):
+                matches[key].append(listing)
+        return dict(matches)
\ No newline at end of file
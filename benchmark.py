@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from fixture_server import FixtureServer, FIXTURES_DIR
+
+# Offline benchmarks for the scrape -> parse -> CSV -> render pipeline. Recorded search pages
+# (fixtures/*.html, or *_debug.html files written by save_debug_info) are served locally, and
+# results are written as JSON so runs can be compared across commits.
+
+
+def summarize(samples) -> dict:
+    samples = sorted(samples)
+    return {
+        'n': len(samples),
+        'min_ms': samples[0] * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        'max_ms': samples[-1] * 1000,
+    }
+
+
+def timed(func, iterations):
+    samples = []
+    result = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return samples, result
+
+
+def bench_parse(fixtures, iterations) -> dict:
+    from listing_parser import parse_listings, LXML_AVAILABLE
+
+    backends = ['lxml', 'bs4'] if LXML_AVAILABLE else ['bs4']
+    report = {}
+    for path in fixtures:
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        for backend in backends:
+            samples, results = timed(lambda: parse_listings(html, backend=backend), iterations)
+            entry = summarize(samples)
+            entry['listings'] = len(results)
+            entry['per_card_us'] = entry['median_ms'] * 1000 / max(len(results), 1)
+            report[f"{os.path.basename(path)}:{backend}"] = entry
+    return report
+
+
+def bench_export(listings, iterations) -> dict:
+    from exports import build_export, EXPORT_FORMATS, OPENPYXL_AVAILABLE
+
+    report = {}
+    for fmt in EXPORT_FORMATS:
+        if fmt == 'xlsx' and not OPENPYXL_AVAILABLE:
+            continue
+        samples, export = timed(lambda: build_export(listings, 'benchmark', fmt), iterations)
+        entry = summarize(samples)
+        entry['listings'] = len(listings)
+        entry['bytes'] = len(export)
+        report[fmt] = entry
+    return report
+
+
+def bench_render(listings, iterations) -> dict:
+    from bot_handlers import build_results_page, build_alert_message, RESULTS_PER_PAGE
+
+    pages = max(1, -(-len(listings) // RESULTS_PER_PAGE))
+    filtered_out = set(range(0, len(listings), 7))
+
+    def render_all_pages():
+        for page in range(pages):
+            build_results_page(listings, page, filtered_out)
+
+    page_samples, _ = timed(render_all_pages, iterations)
+    alert_samples, _ = timed(lambda: build_alert_message('benchmark', 1000.0, listings), iterations)
+    results_page = summarize([sample / pages for sample in page_samples])
+    results_page['pages'] = pages
+    return {'show_results_page': results_page, 'scheduled_search_alert': summarize(alert_samples)}
+
+
+def bench_alert_rules(listings, iterations, rule_count) -> dict:
+    # Matching one scrape against many users' alert rules: the compiled RuleSet against
+    # checking every rule on every listing. Rules are drawn from the listings' own words
+    # so a realistic share of them match.
+    import random
+    from alert_rules import AlertRule, RuleSet
+    from result_index import tokenize
+
+    rng = random.Random(0)
+    vocabulary = sorted({token for listing in listings for token in tokenize(listing.name)}) or ['iphone']
+    sellers = sorted({listing.username.lower() for listing in listings}) or ['seller']
+    prices = [listing.price_cents for listing in listings if listing.price_cents is not None] or [10000]
+    rules = {}
+    for key in range(rule_count):
+        rules[key] = AlertRule(
+            include=frozenset(rng.sample(vocabulary, min(len(vocabulary), rng.choice((0, 1, 1, 2, 2, 3))))),
+            exclude=frozenset(rng.sample(vocabulary, min(len(vocabulary), rng.choice((0, 0, 1))))),
+            max_cents=rng.choice(prices) if rng.random() < 0.7 else None,
+            sellers=frozenset([rng.choice(sellers)]) if rng.random() < 0.05 else frozenset(),
+            blocked_sellers=frozenset([rng.choice(sellers)]) if rng.random() < 0.2 else frozenset(),
+        )
+
+    compile_samples, rule_set = timed(lambda: RuleSet(rules), iterations)
+    indexed_samples, indexed = timed(lambda: rule_set.match(listings), iterations)
+
+    def match_linear():
+        matches = {}
+        for key, rule in rules.items():
+            matching = [listing for listing in listings if rule.matches(listing)]
+            if matching:
+                matches[key] = matching
+        return matches
+
+    linear_samples, linear = timed(match_linear, iterations)
+    if indexed != linear:
+        raise AssertionError("RuleSet and linear matching disagree")
+
+    report = {'compile': summarize(compile_samples), 'indexed': summarize(indexed_samples),
+              'linear': summarize(linear_samples)}
+    checks = rule_count * len(listings)
+    for name in ('indexed', 'linear'):
+        report[name]['rule_checks_per_s'] = checks / (report[name]['median_ms'] / 1000)
+    report['rules'] = rule_count
+    report['listings'] = len(listings)
+    report['matched_rules'] = len(indexed)
+    report['speedup'] = report['linear']['median_ms'] / report['indexed']['median_ms']
+    return report
+
+
+async def bench_http_fetch(base_url, iterations) -> dict:
+    import http_scraper
+
+    samples = []
+    results = []
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            results = await http_scraper.scrape_with_http('iphone 15')
+            samples.append(time.perf_counter() - started)
+    finally:
+        await http_scraper.close_client()
+    entry = summarize(samples)
+    entry['listings'] = len(results)
+    return entry
+
+
+async def bench_browser_load(iterations) -> dict:
+    from browser_pool import browser_pool
+    from scraper import load_listings, count_listing_cards
+    from config import CAROUSELL_BASE_URL
+
+    samples = {'total': [], 'goto': [], 'wait': [], 'scroll': []}
+    traffic = {'requests': [], 'blocked': [], 'cached': [], 'bytes': []}
+    cards = 0
+    try:
+        for _ in range(iterations):
+            async with browser_pool.page() as page:
+                started = time.perf_counter()
+                timings = {}
+                async for _ in load_listings(page, f"{CAROUSELL_BASE_URL}/search/iphone 15", timings=timings):
+                    pass
+                samples['total'].append(time.perf_counter() - started)
+                for phase in ('goto', 'wait', 'scroll'):
+                    samples[phase].append(timings.get(phase, 0.0))
+                cards = await count_listing_cards(page)
+            for field, values in traffic.items():
+                values.append(getattr(browser_pool.last_traffic, field))
+    finally:
+        await browser_pool.stop()
+    report = {phase: summarize(values) for phase, values in samples.items()}
+    report['cards'] = cards
+    report['profile'] = browser_pool.profile.name
+    report['traffic'] = {field: {'median': statistics.median(values), 'max': max(values)}
+                         for field, values in traffic.items() if values}
+    return report
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run offline scraper/parser/render benchmarks.")
+    parser.add_argument('--fixtures', nargs='*', default=[os.path.join(FIXTURES_DIR, '*.html')],
+                        help="Glob(s) of recorded search pages to benchmark against")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--browser-iterations', type=int, default=3)
+    parser.add_argument('--alert-rules', type=int, default=5000, help="Number of alert rules to match against")
+    parser.add_argument('--skip-browser', action='store_true', help="Skip the Playwright page-load benchmark")
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    fixtures = sorted({path for pattern in args.fixtures for path in glob.glob(pattern)})
+    if not fixtures:
+        sys.exit("No fixtures found.")
+
+    server = FixtureServer(default_fixture=os.path.basename(fixtures[0]), fixtures_dir=os.path.dirname(fixtures[0]))
+    server.start()
+    # Both scraper engines read the target URL from config at import time
+    os.environ['CAROUSELL_BASE_URL'] = server.base_url
+
+    try:
+        from listing_parser import parse_listings
+        with open(fixtures[0], encoding='utf-8') as f:
+            listings = parse_listings(f.read())
+
+        report = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'fixtures': [os.path.basename(path) for path in fixtures],
+            'iterations': args.iterations,
+            'benchmarks': {
+                'parse': bench_parse(fixtures, args.iterations),
+                'export': bench_export(listings, args.iterations),
+                'render': bench_render(listings, args.iterations),
+                'alert_rules': bench_alert_rules(listings, args.iterations, args.alert_rules),
+                'http_fetch': asyncio.run(bench_http_fetch(server.base_url, args.iterations)),
+            },
+        }
+        if not args.skip_browser:
+            try:
+                report['benchmarks']['browser_load'] = asyncio.run(bench_browser_load(args.browser_iterations))
+            except Exception as e:
+                report['benchmarks']['browser_load'] = {'error': str(e).splitlines()[0]}
+    finally:
+        server.stop()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report['benchmarks'], indent=2))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,14 +1,28 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
-from utils import send_typing_action, update_message, MAIN_MENU, SEARCH, VIEWING_RESULTS, FILTERING, SET_PRICE_ALERT, SET_FREQUENCY, VIEW_TRACKED_ITEMS, EDIT_TRACKED_ITEM
-from scraper import scrape_carousell_async
+from utils import send_typing_action, update_message, MAIN_MENU, SEARCH, VIEWING_RESULTS, FILTERING, SET_PRICE_ALERT, SET_FREQUENCY, VIEW_TRACKED_ITEMS, EDIT_TRACKED_ITEM, REFINING_RESULTS
+from search_cache import search_cache, normalize_search_term
+from scrape_dispatcher import INTERACTIVE
+from subscription_scheduler import SubscriptionScheduler, AUTO
+from seen_listings import seen_listings
+from result_index import parse_result_filters, describe_filters, SORT_ORDERS
+from price_history import price_history
+from result_sessions import result_sessions
+from alert_rules import AlertRule, parse_alert_rule, describe_rule
+from config import PRICE_STATS_WINDOWS
+from outbox import outbox
+from metrics import SEARCH_LATENCY_SECONDS
+import asyncio
 import logging
-import os
+import re
+import time
 
 logger = logging.getLogger(__name__)
 
 RESULTS_PER_PAGE = 5
+WINDOW_PATTERN = re.compile(r'^(\d+)([hdw])$')
+WINDOW_UNITS = {'h': 3600, 'd': 86400, 'w': 7 * 86400}
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
@@ -24,8 +38,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             "4. 📋 Manage your tracked items\n\n"
             "Let's get started! What would you like to do?"
         )
-        message = await context.bot.send_message(chat_id=user_id, text=instructions, parse_mode=ParseMode.HTML)
-        await context.bot.pin_chat_message(chat_id=user_id, message_id=message.message_id)
+        message = await outbox.call(user_id, lambda: context.bot.send_message(chat_id=user_id, text=instructions,
+                                                                              parse_mode=ParseMode.HTML))
+        await outbox.call(user_id, lambda: context.bot.pin_chat_message(chat_id=user_id, message_id=message.message_id))
 
         return await show_main_menu(update, context)
     except Exception as e:
@@ -63,6 +78,7 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             return SET_PRICE_ALERT
         elif query.data == 'set_frequency':
             keyboard = [
+                [InlineKeyboardButton("⚡ Automatic (faster when new items appear)", callback_data='frequency_auto')],
                 [InlineKeyboardButton("Every 30 minutes", callback_data='frequency_30')],
                 [InlineKeyboardButton("Hourly", callback_data='frequency_60')],
                 [InlineKeyboardButton("Daily", callback_data='frequency_1440')],
@@ -93,7 +109,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
             "🔍 <b>Search Carousell</b>: Find items you're interested in\n"
             "💰 <b>Set Price Alert</b>: Get notified about great deals\n"
             "🕒 <b>Schedule Searches</b>: Set up automatic searches (30 mins, hourly, or daily)\n"
-            "📋 <b>View Tracked Items</b>: Manage your saved searches and alerts\n\n"
+            "📋 <b>View Tracked Items</b>: Manage your saved searches and alerts\n"
+            "📈 <b>/stats &lt;item&gt; [7d]</b>: Price statistics from past searches\n\n"
             "Ready to get started? Just tap a button below!"
         )
         keyboard = [
@@ -110,23 +127,46 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
 async def handle_search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
+        started = time.monotonic()
         search_term = update.message.text
         logger.info(f"User {update.effective_user.id} searching for: {search_term}")
-        await update_message(update, f"🔍 Searching for '{search_term}' on Carousell... This might take a moment.")
+        status_message = await update_message(update, f"🔍 Searching for '{search_term}' on Carousell... This might take a moment.")
         await send_typing_action(context, update.effective_chat.id)
 
-        results, filepath = await scrape_carousell_async(search_term)
-
-        if results:
-            context.user_data['search_results'] = results
+        async def notify_queue_position(position):
+            await update_message(update, f"⏳ Lots of people are searching right now - you are #{position} in line.")
+
+        stream = search_cache.open_stream(search_term, priority=INTERACTIVE,
+                                          user_id=update.effective_user.id,
+                                          on_queued=notify_queue_position)
+        # Show the first page as soon as it is filled; the rest keeps loading in the background
+        await stream.wait_for(RESULTS_PER_PAGE)
+        if stream.error is not None:
+            raise stream.error
+
+        if stream.items:
+            result_sessions.put(update.effective_user.id, search_term, stream.items)
+            context.user_data.pop('search_results', None)  # stored here by older versions
+            context.user_data['search_term'] = search_term
             context.user_data['current_page'] = 0
             context.user_data['filtered_out'] = set()  # Store filtered out item IDs
-            await show_results_page(update, context)
-
-            # Send CSV file if available
-            if filepath:
-                await context.bot.send_document(update.effective_chat.id, document=open(filepath, 'rb'),
-                                                filename=os.path.basename(filepath))
+            context.user_data['sort_order'] = 'relevance'
+            context.user_data['result_filters'] = {}
+            message, reply_markup = build_results_page(stream.items, 0, set(), loading=not stream.done)
+            await outbox.call(update.effective_chat.id, lambda: status_message.edit_text(
+                message, reply_markup=reply_markup, parse_mode=ParseMode.HTML))
+            SEARCH_LATENCY_SECONDS.observe(time.monotonic() - started, phase='first_page')
+
+            if stream.done:
+                SEARCH_LATENCY_SECONDS.observe(time.monotonic() - started, phase='complete')
+                # Send the results file if available
+                if stream.export:
+                    await outbox.call(update.effective_chat.id, lambda: context.bot.send_document(
+                        update.effective_chat.id, document=stream.export.data, filename=stream.export.filename))
+            else:
+                context.application.create_task(finish_streamed_search(context, update.effective_chat.id,
+                                                                        update.effective_user.id, status_message,
+                                                                        stream, started), update=update)
 
             return VIEWING_RESULTS
         else:
@@ -137,39 +177,120 @@ async def handle_search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         await update_message(update, "An error occurred while searching. Please try again later.")
         return await show_main_menu(update, context)
 
-async def show_results_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def finish_streamed_search(context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_id: int, results_message,
+                                 stream, started=None) -> None:
     try:
-        results = context.user_data['search_results']
-        page = context.user_data['current_page']
-        filtered_out = context.user_data['filtered_out']
-
-        start_idx = page * RESULTS_PER_PAGE
-        end_idx = start_idx + RESULTS_PER_PAGE
-        page_results = results[start_idx:end_idx]
-
-        message = "Search Results:\n\n"
-        for i, item in enumerate(page_results, start=start_idx + 1):
-            if i - 1 in filtered_out:
-                message += "🚫 "  # Mark filtered items
-            message += f"{i}. {item['name']} - {item['price']}\n"
-            message += f"   Seller: {item['username']}\n\n"
-
-        keyboard = []
-        if page > 0:
-            keyboard.append(InlineKeyboardButton("⬅️ Previous", callback_data="prev_page"))
-        if end_idx < len(results):
-            keyboard.append(InlineKeyboardButton("Next ➡️", callback_data="next_page"))
-
-        keyboard = [keyboard]  # Wrap in another list for row layout
-        keyboard.append([InlineKeyboardButton("🔍 New Search", callback_data="new_search")])
-        keyboard.append([InlineKeyboardButton("🚫 Filter/Unfilter Item", callback_data="filter_item")])
-        keyboard.append([InlineKeyboardButton("🏠 Main Menu", callback_data="back_to_main")])
-
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        results, export = await stream.result()
+        if started is not None:
+            SEARCH_LATENCY_SECONDS.observe(time.monotonic() - started, phase='complete')
+        # Refresh the first page (it now has a Next button) unless the user has moved on
+        if result_sessions.peek(user_id) is results and context.user_data.get('current_page') == 0:
+            message, reply_markup = results_page_for(context, results)
+            await outbox.call(chat_id, lambda: results_message.edit_text(message, reply_markup=reply_markup,
+                                                                         parse_mode=ParseMode.HTML))
+
+        if export:
+            await outbox.call(chat_id, lambda: context.bot.send_document(chat_id, document=export.data,
+                                                                         filename=export.filename))
+    except Exception as e:
+        logger.error(f"Error in finish_streamed_search function: {str(e)}", exc_info=True)
+
+def clamp_page(page, item_count) -> int:
+    return max(0, min(page, (item_count - 1) // RESULTS_PER_PAGE))
+
+def build_results_page(results, page, filtered_out, loading=False, sort='relevance', result_filters=None,
+                       positions=None):
+    # Filtered-out items and items excluded by result_filters don't take up page slots.
+    # Items keep their original numbers so they can still be filtered/unfiltered by number.
+    # `positions` is the selection for these arguments, when the caller already made it.
+    if positions is None:
+        positions = result_sessions.index_for(results).select(sort, result_filters, hidden=filtered_out)
+    page = clamp_page(page, len(positions))
+    start_idx = page * RESULTS_PER_PAGE
+    end_idx = start_idx + RESULTS_PER_PAGE
+
+    message = "Search Results"
+    if len(positions) != len(results) or sort != 'relevance':
+        message += f" ({len(positions)} of {len(results)}, sorted by {SORT_ORDERS.get(sort, sort)})"
+    message += ":\n"
+    if result_filters:
+        message += f"🎛 {describe_filters(result_filters)}\n"
+    if filtered_out:
+        message += f"🚫 {len(filtered_out)} item(s) filtered out\n"
+    message += "\n"
+    for position in positions[start_idx:end_idx]:
+        item = results[position]
+        message += f"{position + 1}. {item.name} - {item.price}\n"
+        message += f"   Seller: {item.username}\n\n"
+    if not positions:
+        message += "No items match your filters.\n"
+    if loading:
+        message += "⏳ Loading more results...\n"
+
+    keyboard = []
+    if page > 0:
+        keyboard.append(InlineKeyboardButton("⬅️ Previous", callback_data="prev_page"))
+    if end_idx < len(positions):
+        keyboard.append(InlineKeyboardButton("Next ➡️", callback_data="next_page"))
+
+    keyboard = [keyboard]  # Wrap in another list for row layout
+    keyboard.append([InlineKeyboardButton(("✅ " if sort == order else "") + label, callback_data=f"sort_{order}")
+                     for order, label in (('price_asc', "Price ⬆️"), ('price_desc', "Price ⬇️"), ('newest', "Newest"))])
+    refine_row = [InlineKeyboardButton("🎛 Refine Results", callback_data="refine_results")]
+    if result_filters:
+        refine_row.append(InlineKeyboardButton("✖️ Clear Filters", callback_data="clear_filters"))
+    keyboard.append(refine_row)
+    keyboard.append([InlineKeyboardButton("🔍 New Search", callback_data="new_search")])
+    keyboard.append([InlineKeyboardButton("🚫 Filter/Unfilter Item", callback_data="filter_item")])
+    keyboard.append([InlineKeyboardButton("🏠 Main Menu", callback_data="back_to_main")])
+
+    return message, InlineKeyboardMarkup(keyboard)
+
+def results_page_for(context: ContextTypes.DEFAULT_TYPE, results):
+    # The stored page is clamped to the pages that exist now, so Previous works right away after
+    # filters shrink the results or Next was pressed on the last page
+    user_data = context.user_data
+    sort = user_data.get('sort_order', 'relevance')
+    result_filters = user_data.get('result_filters')
+    positions = result_sessions.index_for(results).select(sort, result_filters, hidden=user_data['filtered_out'])
+    user_data['current_page'] = clamp_page(user_data['current_page'], len(positions))
+    return build_results_page(results, user_data['current_page'], user_data['filtered_out'],
+                              sort=sort, result_filters=result_filters, positions=positions)
+
+async def session_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # The user's current results; fetched again (usually from the search cache) when their
+    # session has expired or been evicted. Returns None when there is nothing to show.
+    user_id = update.effective_user.id
+    results = result_sessions.get(user_id)
+    if results is not None:
+        return results
+
+    search_term = context.user_data.get('search_term')
+    if not search_term:
+        return None
+    logger.info(f"Result session for user {user_id} expired; fetching '{search_term}' again")
+    await send_typing_action(context, update.effective_chat.id)
+    results, _ = await search_cache.open_stream(search_term, priority=INTERACTIVE, user_id=user_id).result()
+    if not results:
+        return None
+    # Item numbers from the old result set may point elsewhere now
+    context.user_data['filtered_out'] = set()
+    result_sessions.put(user_id, search_term, results)
+    return results
+
+async def show_results_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    try:
+        results = await session_results(update, context)
+        if results is None:
+            await update_message(update, "⌛ These results are no longer available. Please start a new search.")
+            return False
+        message, reply_markup = results_page_for(context, results)
         await update_message(update, message, reply_markup=reply_markup)
+        return True
     except Exception as e:
         logger.error(f"Error in show_results_page function: {str(e)}", exc_info=True)
         await update_message(update, "An error occurred while displaying results. Please try again later.")
+        return False
 
 async def handle_results_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
@@ -184,10 +305,27 @@ async def handle_results_navigation(update: Update, context: ContextTypes.DEFAUL
         elif query.data == "filter_item":
             await update_message(update, "Enter the number of the item you want to filter out or unfilter:")
             return FILTERING
+        elif query.data.startswith("sort_") and query.data[len("sort_"):] in SORT_ORDERS:
+            order = query.data[len("sort_"):]
+            # Pressing the active sort again goes back to Carousell's order
+            context.user_data['sort_order'] = 'relevance' if context.user_data.get('sort_order') == order else order
+            context.user_data['current_page'] = 0
+        elif query.data == "refine_results":
+            await update_message(update,
+                                 "Type your filters, for example <code>100-500 iphone -case @seller</code>:\n"
+                                 "• <code>100-500</code>, <code>&lt;500</code> or <code>&gt;100</code> for a price range\n"
+                                 "• words the title must contain, and <code>-word</code> for words it must not\n"
+                                 "• <code>@username</code> for a seller\n"
+                                 "Type <code>clear</code> to remove all filters.")
+            return REFINING_RESULTS
+        elif query.data == "clear_filters":
+            context.user_data['result_filters'] = {}
+            context.user_data['current_page'] = 0
         elif query.data == "back_to_main":
             return await show_main_menu(update, context)
 
-        await show_results_page(update, context)
+        if not await show_results_page(update, context):
+            return await show_main_menu(update, context)
         return VIEWING_RESULTS
     except Exception as e:
         logger.error(f"Error in handle_results_navigation function: {str(e)}", exc_info=True)
@@ -206,7 +344,8 @@ async def handle_filter_item(update: Update, context: ContextTypes.DEFAULT_TYPE)
             filtered_out.add(item_number)
             await update_message(update, f"Item {item_number + 1} has been filtered out.")
 
-        await show_results_page(update, context)
+        if not await show_results_page(update, context):
+            return await show_main_menu(update, context)
         return VIEWING_RESULTS
     except ValueError:
         await update_message(update, "Please enter a valid item number.")
@@ -216,24 +355,56 @@ async def handle_filter_item(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update_message(update, "An error occurred. Please try again later.")
         return await show_main_menu(update, context)
 
+async def handle_refine_results(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        text = update.message.text.strip()
+        if text.lower() == 'clear':
+            result_filters = {}
+        else:
+            result_filters = {key: value for key, value in parse_result_filters(text).items() if value or value == 0}
+            if not result_filters:
+                await update_message(update, "I couldn't understand those filters. Please try again, or type 'clear'.")
+                return REFINING_RESULTS
+
+        context.user_data['result_filters'] = result_filters
+        context.user_data['current_page'] = 0
+        if not await show_results_page(update, context):
+            return await show_main_menu(update, context)
+        return VIEWING_RESULTS
+    except Exception as e:
+        logger.error(f"Error in handle_refine_results function: {str(e)}", exc_info=True)
+        await update_message(update, "An error occurred. Please try again later.")
+        return await show_main_menu(update, context)
+
 async def handle_set_price_alert(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
         logger.info(f"User {update.effective_user.id} setting price alert")
         if context.user_data.get('setting_alert'):
             context.user_data['alert_item'] = update.message.text
             await update_message(update,
-                                 f"Got it! You're looking for '{update.message.text}'. Now, what's the maximum price you're willing to pay? (e.g., 50 for S$50)")
+                                 f"Got it! You're looking for '{update.message.text}'. Now, what's the maximum price you're willing to pay? (e.g., 50 for S$50)\n\n"
+                                 "You can also be more specific, for example <code>100-500 pro -case @seller !@reseller is:new</code>:\n"
+                                 "• <code>100-500</code>, <code>&lt;500</code> or <code>&gt;100</code> for a price range\n"
+                                 "• words the title must contain, and <code>-word</code> for words it must not\n"
+                                 "• <code>@username</code> for sellers to watch, <code>!@username</code> for sellers to ignore\n"
+                                 "• <code>is:new</code> or <code>is:used</code> for the item's condition")
             context.user_data['setting_alert'] = False
             return SET_PRICE_ALERT
         else:
             try:
-                max_price = float(update.message.text)
+                rule = parse_alert_rule(update.message.text)
+                if rule.is_empty:
+                    raise ValueError("empty alert rule")
+                max_price = None if rule.max_cents is None else rule.max_cents / 100
                 search_term = context.user_data['alert_item']
 
                 if 'tracked_items' not in context.user_data:
                     context.user_data['tracked_items'] = []
 
-                context.user_data['tracked_items'].append({'name': search_term, 'price': max_price})
+                context.user_data['tracked_items'].append({'name': search_term, 'price': max_price, 'rule': rule.to_dict()})
+                # Used by the scheduled search set up next
+                context.user_data['max_price'] = max_price
+                context.user_data['alert_rule'] = rule.to_dict()
 
                 keyboard = [
                     [InlineKeyboardButton("Set up scheduled search", callback_data='set_frequency')],
@@ -241,12 +412,12 @@ async def handle_set_price_alert(update: Update, context: ContextTypes.DEFAULT_T
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 await update_message(update,
-                                     f"✅ Price alert set for '{search_term}' at S${max_price:.2f}. Would you like to set up a scheduled search for this item?",
+                                     f"✅ Price alert set for '{search_term}' ({describe_rule(rule)}). Would you like to set up a scheduled search for this item?",
                                      reply_markup=reply_markup)
                 return MAIN_MENU
             except ValueError:
                 await update_message(update,
-                                     "Oops! That doesn't look like a valid price. Please enter a number (e.g., 50 for S$50).")
+                                     "Oops! That doesn't look like a valid price or filter. Please enter a number (e.g., 50 for S$50).")
                 return SET_PRICE_ALERT
     except Exception as e:
         logger.error(f"Error in handle_set_price_alert function: {str(e)}", exc_info=True)
@@ -260,30 +431,27 @@ async def handle_set_frequency(update: Update, context: ContextTypes.DEFAULT_TYP
         query = update.callback_query
         logger.info(f"User {update.effective_user.id} setting search frequency: {query.data}")
         if query.data.startswith('frequency_'):
-            minutes = int(query.data.split('_')[1])
+            choice = query.data.split('_')[1]
+            minutes = AUTO if choice == 'auto' else int(choice)
             context.user_data['search_frequency'] = minutes
             search_term = context.user_data.get('alert_item', 'your item')
             max_price = context.user_data.get('max_price', None)
+            rule = AlertRule.from_dict(context.user_data.get('alert_rule', {})) if 'alert_rule' in context.user_data else None
 
-            job_queue = context.job_queue
             chat_id = update.effective_chat.id
 
-            # Remove existing job if any
-            if 'job' in context.chat_data:
-                old_job = context.chat_data['job']
-                old_job.schedule_removal()
-
-            # Schedule new job
-            new_job = job_queue.run_repeating(scheduled_search, interval=minutes * 60, first=10, chat_id=chat_id,
-                                              name=str(chat_id),
-                                              data={'search_term': search_term, 'max_price': max_price})
-            context.chat_data['job'] = new_job
+            # Replaces any existing subscription for this chat
+            subscription = subscription_scheduler.subscribe(context.job_queue, chat_id, search_term, max_price, minutes, rule)
+            context.chat_data['subscription'] = {'search_term': search_term, 'max_price': max_price, 'minutes': minutes,
+                                                 'rule': subscription.rule.to_dict()}
 
-            frequency_text = "every 30 minutes" if minutes == 30 else "hourly" if minutes == 60 else "daily"
+            frequency_text = describe_frequency(minutes)
             message = (f"✅ Great! I've set up a scheduled search for '{search_term}' {frequency_text}. "
                        f"I'll check Carousell {frequency_text} and let you know if I find any matching items.")
-            if max_price:
-                message += f" I'll only notify you about items priced at S${max_price:.2f} or below."
+            if minutes != AUTO:
+                message += " I may check a little more often when new listings show up quickly, and less often when nothing changes."
+            if not subscription.rule.is_empty:
+                message += f" I'll only notify you about items matching: {describe_rule(subscription.rule)}."
             message += "\n\nDon't worry if you don't hear from me for a while - it just means I haven't found any matches yet. I'll keep looking!"
 
             keyboard = [[InlineKeyboardButton("🏠 Back to Main Menu", callback_data='back_to_main')]]
@@ -297,44 +465,70 @@ async def handle_set_frequency(update: Update, context: ContextTypes.DEFAULT_TYP
         await update_message(update, "An error occurred while setting the search frequency. Please try again later.")
         return await show_main_menu(update, context)
 
-async def scheduled_search(context: ContextTypes.DEFAULT_TYPE):
+def describe_frequency(minutes):
+    if minutes == AUTO:
+        return "automatically (more often when new listings appear often)"
+    return "every 30 minutes" if minutes == 30 else "hourly" if minutes == 60 else "daily"
+
+def build_alert_message(search_term, max_price, matching_items, rule=None):
+    message = f"🔔 Alert! I found {len(matching_items)} new or cheaper item(s) matching your search for '{search_term}'"
+    if rule is not None and not rule.is_empty and rule != AlertRule(max_cents=rule.max_cents):
+        message += f" ({describe_rule(rule)})"
+    elif max_price:
+        message += f" at or below S${max_price:.2f}"
+    message += ":\n\n"
+    for item in matching_items[:5]:
+        message += f"• {item.name}\n  💰 Price: {item.price}\n  🔗 Link: {item.link()}\n\n"
+    if len(matching_items) > 5:
+        message += f"\nThere are {len(matching_items) - 5} more items. Check the full results in the attached file."
+    return message
+
+async def scheduled_search(context: ContextTypes.DEFAULT_TYPE, subscription, matching_items, export):
+    # `matching_items` are the group's results that passed this subscription's alert rule
     try:
-        job = context.job
-        search_term = job.data['search_term']
-        max_price = job.data['max_price']
+        chat_id = subscription.chat_id
+        search_term = subscription.search_term
+        max_price = subscription.max_price
 
-        logger.info(f"Running scheduled search for '{search_term}' with max price {max_price}")
-        results, filepath = await scrape_carousell_async(search_term)
+        logger.info(f"{len(matching_items)} listings for '{search_term}' match the alert rule of chat {chat_id}")
 
-        if results:
-            matching_items = [item for item in results if
-                              max_price is None or float(item['price'].replace('S$', '').replace(',', '')) <= max_price]
+        if matching_items:
+            # Only alert on listings that are new or have dropped in price since the last run
+            matching_items = await asyncio.to_thread(seen_listings.filter_new, chat_id,
+                                                     normalize_search_term(search_term), matching_items)
             if matching_items:
-                message = f"🔔 Alert! I found {len(matching_items)} item(s) matching your search for '{search_term}'"
-                if max_price:
-                    message += f" at or below S${max_price:.2f}"
-                message += ":\n\n"
-                for item in matching_items[:5]:
-                    message += f"• {item['name']}\n  💰 Price: {item['price']}\n  🔗 Link: carousell.sg/u/{item['username']}/\n\n"
-                if len(matching_items) > 5:
-                    message += f"\nThere are {len(matching_items) - 5} more items. Check the full results in the CSV file."
-
-                # Send CSV file
-                if filepath:
-                    await context.bot.send_message(job.chat_id, message)
-                    await context.bot.send_document(job.chat_id, document=open(filepath, 'rb'),
-                                                    filename=os.path.basename(filepath))
-                    logger.info(f"Sent alert for {len(matching_items)} items to user {job.chat_id}")
+                message = build_alert_message(search_term, max_price, matching_items, subscription.rule)
+                # Queued rather than awaited so one group tick can fan out to many chats;
+                # alerts still waiting in the same chat's queue are merged into one message
+                outbox.send_alert(context.bot, chat_id, message)
+                # The results file is only worth uploading when the message can't list everything
+                if export and len(matching_items) > 5:
+                    outbox.submit(chat_id, lambda: context.bot.send_document(chat_id, document=export.data,
+                                                                             filename=export.filename))
+                logger.info(f"Queued alert for {len(matching_items)} items to user {chat_id}")
     except Exception as e:
         logger.error(f"Error in scheduled_search function: {str(e)}", exc_info=True)
 
+subscription_scheduler = SubscriptionScheduler(scheduled_search)
+
+def restore_subscriptions(application) -> None:
+    # Rebuilds scheduled searches from persisted chat data; the scheduler staggers their first runs
+    restored = 0
+    for chat_id, chat_data in application.chat_data.items():
+        subscription = chat_data.get('subscription')
+        if subscription:
+            rule = subscription.get('rule')
+            subscription_scheduler.subscribe(application.job_queue, chat_id, subscription['search_term'],
+                                             subscription['max_price'], subscription['minutes'],
+                                             None if rule is None else AlertRule.from_dict(rule))
+            restored += 1
+    logger.info(f"Restored {restored} scheduled searches")
+
 async def stop_scheduled_search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     try:
         logger.info(f"User {update.effective_user.id} stopping scheduled searches")
-        if 'job' in context.chat_data:
-            job = context.chat_data['job']
-            job.schedule_removal()
-            del context.chat_data['job']
+        context.chat_data.pop('subscription', None)
+        if subscription_scheduler.unsubscribe(update.effective_chat.id):
             await update_message(update, "✅ Your scheduled searches have been stopped. You won't receive any more automatic notifications.")
         else:
             await update_message(update, "You don't have any active scheduled searches. Would you like to set one up?")
@@ -346,6 +540,51 @@ async def stop_scheduled_search(update: Update, context: ContextTypes.DEFAULT_TY
         logger.error(f"Error in stop_scheduled_search function: {str(e)}", exc_info=True)
         await update_message(update, "An error occurred while stopping the scheduled search. Please try again later.")
 
+def format_cents(cents) -> str:
+    return f"S${cents / 100:,.2f}"
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    try:
+        args = list(context.args or [])
+        windows = []
+        while args and WINDOW_PATTERN.match(args[-1].lower()):
+            windows.insert(0, args.pop().lower())
+        search_term = ' '.join(args)
+        if not search_term:
+            await update_message(update, "Usage: /stats &lt;item&gt; [window...], e.g. /stats iphone 15 7d 30d")
+            return
+        windows = windows or PRICE_STATS_WINDOWS.split(',')
+        logger.info(f"User {update.effective_user.id} requested price stats for '{search_term}' over {windows}")
+
+        message = f"📈 Price stats for '{search_term}':\n"
+        found = False
+        for window in windows:
+            amount, unit = WINDOW_PATTERN.match(window).groups()
+            stats = await asyncio.to_thread(price_history.stats, normalize_search_term(search_term),
+                                            int(amount) * WINDOW_UNITS[unit])
+            message += f"\n<b>Last {window}</b>: "
+            if stats is None:
+                message += "no data\n"
+                continue
+            found = True
+            message += (f"{stats['count']} listing(s)\n"
+                        f"  Min {format_cents(stats['min'])} · Median {format_cents(stats['median'])}\n"
+                        f"  P25 {format_cents(stats['p25'])} · P75 {format_cents(stats['p75'])}\n")
+            if stats['trend'] is not None:
+                arrow = "📈" if stats['trend'] > 0 else "📉" if stats['trend'] < 0 else "➡️"
+                message += f"  Trend {arrow} {stats['trend']:+.1%} vs the previous {window}\n"
+        if not found:
+            message += "\nI haven't seen any prices for that search yet. Search for it first and check back later!"
+        await update_message(update, message)
+    except Exception as e:
+        logger.error(f"Error in stats_command function: {str(e)}", exc_info=True)
+        await update_message(update, "An error occurred while fetching price stats. Please try again later.")
+
+def describe_tracked_item(item) -> str:
+    if item.get('rule'):
+        return describe_rule(AlertRule.from_dict(item['rule']))
+    return f"S${item['price']:.2f}"
+
 async def view_tracked_items(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
         tracked_items = context.user_data.get('tracked_items', [])
@@ -359,7 +598,7 @@ async def view_tracked_items(update: Update, context: ContextTypes.DEFAULT_TYPE)
         message = "📋 Here are your tracked items:\n\n"
         keyboard = []
         for i, item in enumerate(tracked_items):
-            message += f"{i + 1}. {item['name']} - S${item['price']:.2f}\n"
+            message += f"{i + 1}. {item['name']} - {describe_tracked_item(item)}\n"
             keyboard.append([InlineKeyboardButton(f"Edit {item['name']}", callback_data=f'edit_{i}')])
 
         keyboard.append([InlineKeyboardButton("🏠 Back to Main Menu", callback_data='back_to_main')])
@@ -383,7 +622,7 @@ async def handle_edit_tracked_item(update: Update, context: ContextTypes.DEFAULT
 
         context.user_data['editing_item'] = item_index
 
-        await update_message(update, f"You're editing the alert for '{item['name']}' with current max price S${item['price']:.2f}.\n"
+        await update_message(update, f"You're editing the alert for '{item['name']}' ({describe_tracked_item(item)}).\n"
                                      "To update, enter a new item name and max price (e.g., 'iPhone 12 500'), or type 'delete' to remove this alert.")
         return EDIT_TRACKED_ITEM
     except Exception as e:
@@ -0,0 +1,177 @@
+from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+import time
+from browser_profile import build_profile
+from metrics import SCRAPE_STAGE_SECONDS, BROWSER_REQUESTS, BROWSER_PAGE_BYTES
+from config import (
+    BROWSER_POOL_MAX_PAGES, BROWSER_POOL_RECYCLE_AFTER, BROWSER_POOL_HEALTH_CHECK_INTERVAL, BROWSER_STORAGE_STATE_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    # Keeps one warm Chromium alive and hands out a fresh context/page per use.
+    # The browser is relaunched after `recycle_after` uses or when it stops responding.
+    # Launch, context and request-routing settings come from the browser profile.
+
+    def __init__(self, max_pages=BROWSER_POOL_MAX_PAGES, recycle_after=BROWSER_POOL_RECYCLE_AFTER,
+                 health_check_interval=BROWSER_POOL_HEALTH_CHECK_INTERVAL, profile=None):
+        self.profile = profile or build_profile()
+        self.max_pages = max_pages
+        self.recycle_after = recycle_after
+        self.health_check_interval = health_check_interval
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._uses = 0
+        self._active = {}
+        self._last_health_check = 0.0
+        self._retired = []
+        self._storage_state_saved = 0.0
+        self.last_traffic = None  # PageTraffic of the most recently released page
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+                logger.info("Browser pool started.")
+            if self._browser is None:
+                await self._launch()
+
+    async def stop(self) -> None:
+        async with self._lock:
+            for browser in self._retired:
+                await self._close_browser(browser)
+            self._retired.clear()
+            if self._browser is not None:
+                await self._close_browser(self._browser)
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+            logger.info("Browser pool stopped.")
+
+    async def _launch(self) -> None:
+        started = time.monotonic()
+        self._browser = await self._playwright.chromium.launch(**self.profile.launch_options())
+        self._uses = 0
+        self._last_health_check = time.monotonic()
+        SCRAPE_STAGE_SECONDS.observe(time.monotonic() - started, stage='launch')
+        logger.info(f"Launched pooled browser ({self.profile.name} profile) in {time.monotonic() - started:.2f}s")
+
+    async def _close_browser(self, browser) -> None:
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing pooled browser: {str(e)}")
+
+    async def _is_healthy(self) -> bool:
+        if self._browser is None or not self._browser.is_connected():
+            return False
+        if time.monotonic() - self._last_health_check < self.health_check_interval:
+            return True
+        try:
+            context = await asyncio.wait_for(self._browser.new_context(), timeout=10)
+            await context.close()
+            self._last_health_check = time.monotonic()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled browser failed health check: {str(e)}")
+            return False
+
+    async def _checkout(self):
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            if self._uses >= self.recycle_after:
+                logger.info(f"Recycling pooled browser after {self._uses} uses.")
+                self._retire()
+            elif not await self._is_healthy():
+                logger.info("Relaunching unhealthy pooled browser.")
+                self._retire()
+            if self._browser is None:
+                await self._launch()
+            self._uses += 1
+            self._active[self._browser] = self._active.get(self._browser, 0) + 1
+            return self._browser
+
+    def _retire(self) -> None:
+        # Pages still open on the old browser keep running; it is closed once they finish.
+        if self._browser is None:
+            return
+        if self._active.get(self._browser):
+            self._retired.append(self._browser)
+        else:
+            asyncio.create_task(self._close_browser(self._browser))
+        self._browser = None
+
+    async def _checkin(self, browser) -> None:
+        async with self._lock:
+            self._active[browser] -= 1
+            if self._active[browser] == 0:
+                del self._active[browser]
+                if browser in self._retired:
+                    self._retired.remove(browser)
+                    await self._close_browser(browser)
+
+    def mark_unhealthy(self) -> None:
+        # Forces the next checkout to run a full health check.
+        self._last_health_check = 0.0
+
+    async def _save_storage_state(self, context) -> None:
+        # Cookies and local storage are carried over to later contexts so the site sees a returning visitor
+        path = self.profile.storage_state_path
+        if not path or time.monotonic() - self._storage_state_saved < BROWSER_STORAGE_STATE_INTERVAL:
+            return
+        self._storage_state_saved = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            await context.storage_state(path=path)
+        except Exception as e:
+            logger.warning(f"Could not save browser storage state: {str(e)}")
+
+    def _record_traffic(self, traffic) -> None:
+        self.last_traffic = traffic
+        BROWSER_REQUESTS.inc(traffic.requests - traffic.blocked - traffic.cached, outcome='fetched')
+        BROWSER_REQUESTS.inc(traffic.blocked, outcome='blocked')
+        BROWSER_REQUESTS.inc(traffic.cached, outcome='cached')
+        BROWSER_PAGE_BYTES.observe(traffic.bytes)
+        logger.info(f"Browser page traffic: {traffic.summary()}")
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._semaphore:
+            browser = await self._checkout()
+            context = None
+            traffic = None
+            completed = False
+            try:
+                context = await browser.new_context(**self.profile.context_options())
+                page = await context.new_page()
+                traffic = await self.profile.install(page)
+                yield page
+                completed = True
+            finally:
+                if traffic is not None:
+                    self._record_traffic(traffic)
+                if context is not None and completed:
+                    await self._save_storage_state(context)
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.warning(f"Error closing browser context: {str(e)}")
+                        self.mark_unhealthy()
+                await self._checkin(browser)
+
+
+browser_pool = BrowserPool()
\ No newline at end of file
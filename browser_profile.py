@@ -0,0 +1,216 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse
+from config import (
+    BROWSER_PROFILE, BROWSER_VIEWPORT, BROWSER_BLOCKED_RESOURCE_TYPES, BROWSER_ALLOWED_DOMAINS,
+    BROWSER_STATIC_CACHE_BYTES, BROWSER_STATIC_CACHE_MAX_AGE, BROWSER_STORAGE_STATE_PATH, CAROUSELL_BASE_URL
+)
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_RESOURCE_TYPES = ('script', 'stylesheet')
+UNCACHEABLE_DIRECTIVES = frozenset(('no-store', 'no-cache', 'private'))
+
+
+def _split(value: str) -> tuple:
+    return tuple(part.strip().lower() for part in value.split(',') if part.strip())
+
+
+def _parse_viewport(value: str) -> Optional[dict]:
+    if not value:
+        return None
+    width, _, height = value.lower().partition('x')
+    return {'width': int(width), 'height': int(height)}
+
+
+def cache_lifetime(cache_control: str, max_age=BROWSER_STATIC_CACHE_MAX_AGE) -> int:
+    # Seconds a response may be served from StaticCache: its max-age, capped at `max_age`
+    # (which also applies when it has none); 0 for no-store, no-cache and private responses
+    directives = {}
+    for part in cache_control.lower().split(','):
+        name, _, value = part.strip().partition('=')
+        directives[name] = value.strip().strip('"')
+    if UNCACHEABLE_DIRECTIVES & directives.keys():
+        return 0
+    if 'max-age' in directives:
+        try:
+            return max(0, min(int(directives['max-age']), max_age))
+        except ValueError:
+            return 0
+    return max_age
+
+
+class StaticCache:
+    # In-memory LRU of first-party scripts and stylesheets shared by every page in the pool.
+    # Browser contexts don't share Chromium's HTTP cache, so without this each scrape
+    # downloads the same JS bundles again.
+
+    def __init__(self, max_bytes=BROWSER_STATIC_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # url -> (expires_at, status, headers, body)
+        self._size = 0
+
+    def get(self, url):
+        # (status, headers, body), or None when missing or expired
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[url]
+            self._size -= len(entry[3])
+            return None
+        self._entries.move_to_end(url)
+        return entry[1:]
+
+    def put(self, url, status, headers, body, lifetime) -> None:
+        if lifetime <= 0 or len(body) > self.max_bytes // 4 or url in self._entries:
+            return
+        self._entries[url] = (time.monotonic() + lifetime, status, headers, body)
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, (_, _, _, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+
+class PageTraffic:
+    # Request accounting for one page: what was fetched, blocked or served from StaticCache
+    __slots__ = ('requests', 'blocked', 'cached', 'bytes', 'cached_bytes', 'from_cache')
+
+    def __init__(self):
+        self.requests = 0
+        self.blocked = 0
+        self.cached = 0
+        self.bytes = 0  # response headers + bodies received over the network
+        self.cached_bytes = 0
+        self.from_cache = set()  # requests fulfilled from StaticCache, excluded from `bytes`
+
+    def on_request(self, request) -> None:
+        self.requests += 1
+
+    async def on_request_finished(self, request) -> None:
+        if request in self.from_cache:
+            self.from_cache.discard(request)
+            return
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        self.bytes += sizes.get('responseBodySize', 0) + sizes.get('responseHeadersSize', 0)
+
+    def summary(self) -> str:
+        return (f"{self.requests} requests, {self.blocked} blocked, {self.cached} from cache, "
+                f"{self.bytes / 1024:.0f} KiB transferred")
+
+
+@dataclass
+class BrowserProfile:
+    name: str
+    headless: bool
+    viewport: Optional[dict] = None
+    blocked_resource_types: frozenset = frozenset()
+    allowed_domains: tuple = ()  # empty allows every domain
+    storage_state_path: Optional[str] = None
+    static_cache: Optional[StaticCache] = None
+    screenshots: bool = True
+
+    @property
+    def intercepts(self) -> bool:
+        return bool(self.blocked_resource_types or self.allowed_domains or self.static_cache)
+
+    def launch_options(self) -> dict:
+        options = {'headless': self.headless}
+        if self.headless:
+            options['args'] = ['--disable-gpu', '--disable-extensions', '--mute-audio']
+        return options
+
+    def context_options(self) -> dict:
+        options = {}
+        if self.viewport:
+            options['viewport'] = self.viewport
+        if self.storage_state_path and os.path.exists(self.storage_state_path):
+            options['storage_state'] = self.storage_state_path
+        return options
+
+    def is_allowed_host(self, url: str) -> bool:
+        if not self.allowed_domains:
+            return True
+        host = (urlparse(url).hostname or '').lower()
+        return any(host == domain or host.endswith('.' + domain) for domain in self.allowed_domains)
+
+    async def install(self, page) -> PageTraffic:
+        traffic = PageTraffic()
+        page.on('request', traffic.on_request)
+        page.on('requestfinished', traffic.on_request_finished)
+        if self.intercepts:
+            async def handle_route(route):
+                # Playwright runs route handlers as background tasks: a route left unresolved by an
+                # error would stall the page until the scrape deadline, so let the request through
+                try:
+                    await self._handle_route(route, traffic)
+                except Exception as e:
+                    logger.warning(f"Route handler failed for {route.request.url}: {str(e)}")
+                    try:
+                        await route.continue_()
+                    except Exception:
+                        pass  # already handled, or the page is gone
+            await page.route('**/*', handle_route)
+        return traffic
+
+    async def _handle_route(self, route, traffic: PageTraffic) -> None:
+        request = route.request
+        if request.resource_type in self.blocked_resource_types or not self.is_allowed_host(request.url):
+            traffic.blocked += 1
+            await route.abort('blockedbyclient')
+            return
+
+        if self.static_cache is None or request.method != 'GET' or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+            await route.continue_()
+            return
+
+        cached = self.static_cache.get(request.url)
+        if cached is not None:
+            status, headers, body = cached
+            traffic.cached += 1
+            traffic.cached_bytes += len(body)
+            traffic.from_cache.add(request)
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logger.warning(f"Could not fetch {request.url} for the static cache: {str(e)}")
+            await route.continue_()
+            return
+        if response.status == 200:
+            self.static_cache.put(request.url, response.status, response.headers, body,
+                                  cache_lifetime(response.headers.get('cache-control', '')))
+        await route.fulfill(response=response, body=body)
+
+
+def build_profile(name=BROWSER_PROFILE) -> BrowserProfile:
+    if name == 'full':
+        # The original behaviour: a visible browser loading everything
+        return BrowserProfile('full', headless=False)
+    if name != 'lean':
+        raise ValueError(f"Unknown browser profile {name!r}; expected 'lean' or 'full'")
+
+    base_host = (urlparse(CAROUSELL_BASE_URL).hostname or '').lower()
+    allowed = _split(BROWSER_ALLOWED_DOMAINS)
+    if base_host and base_host not in allowed:
+        allowed += (base_host,)
+    return BrowserProfile(
+        'lean',
+        headless=True,
+        viewport=_parse_viewport(BROWSER_VIEWPORT),
+        blocked_resource_types=frozenset(_split(BROWSER_BLOCKED_RESOURCE_TYPES)),
+        allowed_domains=allowed,
+        storage_state_path=BROWSER_STORAGE_STATE_PATH or None,
+        static_cache=StaticCache() if BROWSER_STATIC_CACHE_BYTES else None,
+        screenshots=False,
+    )
\ No newline at end of file
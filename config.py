@@ -0,0 +1,121 @@
+import os
+
+# Telegram
+TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN', '')
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', '')  # e.g. a local Bot API server; empty uses Telegram's
+BOT_MODE = os.getenv('BOT_MODE', 'polling')  # 'polling' or 'webhook'
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '8'))  # updates processed at the same time, one per user
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # public URL Telegram posts to, including WEBHOOK_PATH
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Browser pool
+BROWSER_POOL_MAX_PAGES = int(os.getenv('BROWSER_POOL_MAX_PAGES', '3'))
+BROWSER_POOL_RECYCLE_AFTER = int(os.getenv('BROWSER_POOL_RECYCLE_AFTER', '50'))
+BROWSER_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv('BROWSER_POOL_HEALTH_CHECK_INTERVAL', '60'))  # seconds
+
+# Browser profile: 'lean' runs headless with a small viewport and blocks heavy resources and third-party
+# domains; 'full' is a visible browser that loads the whole page
+BROWSER_PROFILE = os.getenv('BROWSER_PROFILE', 'lean')
+BROWSER_VIEWPORT = os.getenv('BROWSER_VIEWPORT', '1024x768')  # WxH
+BROWSER_BLOCKED_RESOURCE_TYPES = os.getenv('BROWSER_BLOCKED_RESOURCE_TYPES', 'image,media,font,imageset,beacon')
+BROWSER_ALLOWED_DOMAINS = os.getenv('BROWSER_ALLOWED_DOMAINS', 'carousell.sg,carousell.com,karousell.com')
+BROWSER_STATIC_CACHE_BYTES = int(os.getenv('BROWSER_STATIC_CACHE_BYTES', str(32 * 1024 * 1024)))  # 0 disables
+BROWSER_STATIC_CACHE_MAX_AGE = int(os.getenv('BROWSER_STATIC_CACHE_MAX_AGE', '3600'))  # seconds, when max-age is absent or longer
+BROWSER_STORAGE_STATE_INTERVAL = int(os.getenv('BROWSER_STORAGE_STATE_INTERVAL', '600'))  # seconds between saves
+
+# Page loading
+SCRAPE_TARGET_RESULTS = int(os.getenv('SCRAPE_TARGET_RESULTS', '60'))
+SCRAPE_DEADLINE = float(os.getenv('SCRAPE_DEADLINE', '45'))  # seconds, per attempt
+SCRAPE_SCROLL_SETTLE = float(os.getenv('SCRAPE_SCROLL_SETTLE', '2.5'))  # seconds to wait for new cards after a scroll
+
+# Scraper engine: 'auto' tries the HTTP fast path and falls back to the browser, 'http' or 'browser' force one
+SCRAPER_ENGINE = os.getenv('SCRAPER_ENGINE', 'auto')
+CAROUSELL_BASE_URL = os.getenv('CAROUSELL_BASE_URL', 'https://www.carousell.sg').rstrip('/')
+HTTP_SCRAPE_TIMEOUT = float(os.getenv('HTTP_SCRAPE_TIMEOUT', '10'))  # seconds
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '10'))
+
+# Listing card parser: 'auto' uses lxml when installed and falls back to BeautifulSoup ('bs4')
+PARSER_BACKEND = os.getenv('PARSER_BACKEND', 'auto')
+
+# Search result cache
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '300'))  # seconds
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '256'))
+
+# Scrape queue
+SCRAPE_MAX_CONCURRENCY = int(os.getenv('SCRAPE_MAX_CONCURRENCY', '2'))
+
+# Scrape retries: exponential backoff with jitter between attempts, and a circuit breaker that pauses
+# scheduled scrapes after repeated failures (or any block/captcha page)
+SCRAPE_MAX_ATTEMPTS = int(os.getenv('SCRAPE_MAX_ATTEMPTS', '3'))  # per browser scrape
+SCRAPE_RETRY_BASE_DELAY = float(os.getenv('SCRAPE_RETRY_BASE_DELAY', '2'))  # seconds, doubled per retry
+SCRAPE_RETRY_MAX_DELAY = float(os.getenv('SCRAPE_RETRY_MAX_DELAY', '60'))  # seconds
+SCRAPE_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('SCRAPE_CIRCUIT_FAILURE_THRESHOLD', '5'))  # failed scrapes in a row
+SCRAPE_CIRCUIT_RESET_TIMEOUT = float(os.getenv('SCRAPE_CIRCUIT_RESET_TIMEOUT', '300'))  # seconds, doubled per trip
+SCRAPE_CIRCUIT_MAX_RESET_TIMEOUT = float(os.getenv('SCRAPE_CIRCUIT_MAX_RESET_TIMEOUT', '3600'))  # seconds
+
+# Debug captures of failed scrapes (page HTML, plus a screenshot when the browser profile allows it)
+DEBUG_CAPTURE_SAMPLE_RATE = float(os.getenv('DEBUG_CAPTURE_SAMPLE_RATE', '0.25'))  # 0 disables
+DEBUG_CAPTURE_MIN_INTERVAL = float(os.getenv('DEBUG_CAPTURE_MIN_INTERVAL', '300'))  # seconds, per failure reason
+DEBUG_CAPTURE_MAX_BYTES = int(os.getenv('DEBUG_CAPTURE_MAX_BYTES', str(1024 * 1024)))  # per file
+DEBUG_CAPTURE_MAX_FILES = int(os.getenv('DEBUG_CAPTURE_MAX_FILES', '40'))
+
+# Scrape workers: 'inprocess' scrapes inside the bot, 'queue' hands jobs to scrape_worker.py processes
+# over a Redis-compatible queue (Redis, or job_broker.py as a local stand-in)
+SCRAPE_BACKEND = os.getenv('SCRAPE_BACKEND', 'inprocess')
+SCRAPE_QUEUE_URL = os.getenv('SCRAPE_QUEUE_URL', 'redis://127.0.0.1:6390/0')
+SCRAPE_QUEUE_PREFIX = os.getenv('SCRAPE_QUEUE_PREFIX', 'carousell:scrape')
+SCRAPE_JOB_TIMEOUT = float(os.getenv('SCRAPE_JOB_TIMEOUT', '120'))  # seconds without any reply from a worker
+SCRAPE_WORKER_CONCURRENCY = int(os.getenv('SCRAPE_WORKER_CONCURRENCY', '1'))  # jobs per worker process
+SCRAPE_LOCAL_WORKERS = int(os.getenv('SCRAPE_LOCAL_WORKERS', '0'))  # worker processes (and a broker) the bot starts itself
+
+# Result browsing sessions
+RESULT_SESSION_TTL = int(os.getenv('RESULT_SESSION_TTL', '1800'))  # seconds since the user last touched their results
+RESULT_SESSION_MEMORY_BUDGET = int(os.getenv('RESULT_SESSION_MEMORY_BUDGET', str(64 * 1024 * 1024)))  # bytes, all sessions
+RESULT_SESSION_MAX = int(os.getenv('RESULT_SESSION_MAX', '10000'))
+RESULT_SESSION_SWEEP_INTERVAL = int(os.getenv('RESULT_SESSION_SWEEP_INTERVAL', '300'))  # seconds
+
+# Scheduled searches
+SCHEDULER_MIN_FIRST_DELAY = int(os.getenv('SCHEDULER_MIN_FIRST_DELAY', '10'))  # seconds
+SCHEDULER_MAX_JITTER = int(os.getenv('SCHEDULER_MAX_JITTER', '300'))  # seconds
+# Intervals adapt to how many new listings each run finds
+SCHEDULER_MIN_INTERVAL = float(os.getenv('SCHEDULER_MIN_INTERVAL', '10'))  # minutes, floor for any group
+SCHEDULER_MAX_INTERVAL = float(os.getenv('SCHEDULER_MAX_INTERVAL', '1440'))  # minutes, ceiling for automatic groups
+SCHEDULER_AUTO_INTERVAL = float(os.getenv('SCHEDULER_AUTO_INTERVAL', '60'))  # minutes, starting point for automatic groups
+SCHEDULER_ADAPT_RANGE = float(os.getenv('SCHEDULER_ADAPT_RANGE', '4'))  # fixed choices may move this factor either way
+SCHEDULER_TARGET_NEW_LISTINGS = float(os.getenv('SCHEDULER_TARGET_NEW_LISTINGS', '3'))  # new listings wanted per run
+SCHEDULER_STALE_BACKOFF = float(os.getenv('SCHEDULER_STALE_BACKOFF', '1.5'))  # interval growth after a run with nothing new
+SCHEDULER_HOURLY_BUDGET = int(os.getenv('SCHEDULER_HOURLY_BUDGET', '120'))  # scheduled scrapes per hour, 0 for unlimited
+
+# Outgoing Telegram messages (Bot API limits: ~30 messages/s overall, ~1 message/s per chat)
+OUTBOX_GLOBAL_RATE = float(os.getenv('OUTBOX_GLOBAL_RATE', '25'))  # messages per second
+OUTBOX_CHAT_RATE = float(os.getenv('OUTBOX_CHAT_RATE', '1'))  # messages per second per chat
+OUTBOX_CHAT_BURST = int(os.getenv('OUTBOX_CHAT_BURST', '3'))  # short bursts per chat go through, so replies to taps stay quick
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+
+# Metrics
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))  # 0 disables the metrics endpoint
+METRICS_PROFILING = os.getenv('METRICS_PROFILING', '0') == '1'  # allow /debug/profile?seconds=N
+
+# Result exports
+EXPORT_FORMAT = os.getenv('EXPORT_FORMAT', 'csv')  # csv, csv.gz, json, json.gz or xlsx (needs openpyxl)
+EXPORT_ARCHIVE_DIR = os.getenv('EXPORT_ARCHIVE_DIR', '')  # keep a copy of every export here; empty keeps none
+EXPORT_ARCHIVE_MAX_AGE_DAYS = float(os.getenv('EXPORT_ARCHIVE_MAX_AGE_DAYS', '7'))  # 0 keeps files forever
+EXPORT_ARCHIVE_MAX_FILES = int(os.getenv('EXPORT_ARCHIVE_MAX_FILES', '500'))  # 0 for no limit
+
+# Local storage
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+SEEN_LISTINGS_DB_PATH = os.getenv('SEEN_LISTINGS_DB_PATH', os.path.join(DATA_DIR, 'seen_listings.db'))
+SEEN_LISTINGS_TTL = int(os.getenv('SEEN_LISTINGS_TTL', str(14 * 24 * 3600)))  # seconds
+PRICE_HISTORY_DB_PATH = os.getenv('PRICE_HISTORY_DB_PATH', os.path.join(DATA_DIR, 'price_history.db'))
+PRICE_HISTORY_RETENTION = int(os.getenv('PRICE_HISTORY_RETENTION', str(180 * 24 * 3600)))  # seconds
+PRICE_STATS_WINDOWS = os.getenv('PRICE_STATS_WINDOWS', '1d,7d,30d')  # default /stats windows
+DEBUG_CAPTURE_DIR = os.getenv('DEBUG_CAPTURE_DIR', os.path.join(DATA_DIR, 'debug'))
+BROWSER_STORAGE_STATE_PATH = os.getenv('BROWSER_STORAGE_STATE_PATH', os.path.join(DATA_DIR, 'browser_state.json'))
+PERSISTENCE_DB_PATH = os.getenv('PERSISTENCE_DB_PATH', os.path.join(DATA_DIR, 'bot_data.db'))
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '5'))  # seconds
+PERSISTENCE_WRITE_DELAY = float(os.getenv('PERSISTENCE_WRITE_DELAY', '0.5'))  # seconds to batch writes
\ No newline at end of file
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime
+from metrics import DEBUG_CAPTURES
+from config import (
+    DEBUG_CAPTURE_DIR, DEBUG_CAPTURE_SAMPLE_RATE, DEBUG_CAPTURE_MIN_INTERVAL, DEBUG_CAPTURE_MAX_BYTES,
+    DEBUG_CAPTURE_MAX_FILES
+)
+
+logger = logging.getLogger(__name__)
+
+TRUNCATED_MARKER = b"\n<!-- truncated by debug capture -->\n"
+
+
+class DebugCapture:
+    # Saves the HTML (and a screenshot, when asked) of pages that failed to scrape, for a sample
+    # of failures only: at most one capture per reason every `min_interval` seconds, each kept
+    # with probability `sample_rate`. HTML is cut to `max_bytes`, larger screenshots are dropped,
+    # files are written off the event loop and only the newest `max_files` are kept.
+
+    def __init__(self, directory=DEBUG_CAPTURE_DIR, sample_rate=DEBUG_CAPTURE_SAMPLE_RATE,
+                 min_interval=DEBUG_CAPTURE_MIN_INTERVAL, max_bytes=DEBUG_CAPTURE_MAX_BYTES,
+                 max_files=DEBUG_CAPTURE_MAX_FILES):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.min_interval = min_interval
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._last_capture = {}  # reason -> monotonic time of the last capture
+
+    def _should_capture(self, reason: str) -> bool:
+        if not self.directory or self.sample_rate <= 0:
+            return False
+        now = time.monotonic()
+        last = self._last_capture.get(reason)
+        if last is not None and now - last < self.min_interval:
+            return False
+        if random.random() >= self.sample_rate:
+            return False
+        self._last_capture[reason] = now
+        return True
+
+    async def capture(self, page, reason: str, html=None, screenshot=False) -> bool:
+        # `html` is the page content when the caller already fetched it
+        if not self._should_capture(reason):
+            DEBUG_CAPTURES.inc(outcome='skipped')
+            return False
+        try:
+            html = await page.content() if html is None else html
+            image = await page.screenshot(type='jpeg', quality=50) if screenshot else None
+            path = await asyncio.to_thread(self._write, reason, html, image)
+        except Exception as e:
+            DEBUG_CAPTURES.inc(outcome='failed')
+            logger.warning(f"Could not capture debug info for {reason}: {str(e)}")
+            return False
+        DEBUG_CAPTURES.inc(outcome='saved')
+        logger.info(f"Saved debug capture {path}")
+        return True
+
+    def _write(self, reason: str, html: str, image) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, f"{reason}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+        data = html.encode('utf-8', errors='replace')
+        if len(data) > self.max_bytes:
+            data = data[:self.max_bytes] + TRUNCATED_MARKER
+        with open(f"{prefix}.html", 'wb') as f:
+            f.write(data)
+        if image is not None and len(image) <= self.max_bytes:
+            with open(f"{prefix}.jpg", 'wb') as f:
+                f.write(image)
+        self._prune()
+        return f"{prefix}.html"
+
+    def _prune(self) -> None:
+        with os.scandir(self.directory) as entries:
+            files = sorted(((entry.stat().st_mtime, entry.path) for entry in entries if entry.is_file()), reverse=True)
+        for _, path in files[self.max_files:]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove debug capture {path}: {str(e)}")
+
+
+debug_capture = DebugCapture()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Optional
+from metrics import SCRAPE_STAGE_SECONDS
+from config import EXPORT_FORMAT, EXPORT_ARCHIVE_DIR, EXPORT_ARCHIVE_MAX_AGE_DAYS, EXPORT_ARCHIVE_MAX_FILES
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDNAMES = ['name', 'price', 'price_cents', 'username', 'id', 'url', 'scraped_at']
+EXPORT_FORMATS = ('csv', 'csv.gz', 'json', 'json.gz', 'xlsx')
+FILENAME_PREFIX = 'carousell_results_'
+
+
+class Export:
+    # A finished results document held in memory, ready for send_document
+    __slots__ = ('filename', 'data')
+
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"Export({self.filename!r}, {len(self.data)} bytes)"
+
+
+def _write_csv(results, text) -> None:
+    writer = csv.DictWriter(text, fieldnames=CSV_FIELDNAMES, extrasaction='ignore')
+    writer.writeheader()
+    for item in results:
+        writer.writerow(item.to_dict())
+
+
+def _write_json(results, text) -> None:
+    # One listing at a time rather than json.dump of the whole list, so no second copy is built
+    text.write('[')
+    for i, item in enumerate(results):
+        text.write(',\n' if i else '\n')
+        json.dump(item.to_dict(), text, ensure_ascii=False)
+    text.write('\n]\n')
+
+
+def _write_xlsx(results, buffer) -> None:
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Results')
+    sheet.append(CSV_FIELDNAMES)
+    for item in results:
+        row = item.to_dict()
+        sheet.append([row.get(field) for field in CSV_FIELDNAMES])
+    workbook.save(buffer)
+
+
+def export_filename(search_term: str, fmt: str) -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{FILENAME_PREFIX}{search_term.replace(' ', '_')}_{timestamp}.{fmt}"
+
+
+def build_export(results, search_term: str, fmt: str = EXPORT_FORMAT) -> Export:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == 'xlsx' and not OPENPYXL_AVAILABLE:
+        logger.warning("openpyxl is not installed; exporting CSV instead of XLSX")
+        fmt = 'csv'
+
+    buffer = io.BytesIO()
+    with SCRAPE_STAGE_SECONDS.time(stage='export'):
+        if fmt == 'xlsx':
+            _write_xlsx(results, buffer)
+        else:
+            kind, _, compression = fmt.partition('.')
+            # mtime=0 keeps the bytes identical for identical results
+            raw = gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) if compression == 'gz' else buffer
+            text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            (_write_csv if kind == 'csv' else _write_json)(results, text)
+            text.flush()
+            text.detach()
+            if raw is not buffer:
+                raw.close()
+
+    export = Export(export_filename(search_term, fmt), buffer.getvalue())
+    logger.info(f"Exported {len(results)} results for '{search_term}' as {fmt} ({len(export)} bytes)")
+    return export
+
+
+class ExportArchive:
+    # Optional on-disk copies of exports (EXPORT_ARCHIVE_DIR). Files older than max_age_days,
+    # and the oldest beyond max_files, are removed after every save.
+
+    def __init__(self, directory=EXPORT_ARCHIVE_DIR, max_age_days=EXPORT_ARCHIVE_MAX_AGE_DAYS,
+                 max_files=EXPORT_ARCHIVE_MAX_FILES):
+        self.directory = directory
+        self.max_age_days = max_age_days
+        self.max_files = max_files
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def save(self, export: Export) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, export.filename)
+        with open(path, 'wb') as f:
+            f.write(export.data)
+        self.prune()
+        return path
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        try:
+            with os.scandir(self.directory) as entries:
+                files = sorted(((entry.stat().st_mtime, entry.path) for entry in entries
+                                if entry.is_file() and entry.name.startswith(FILENAME_PREFIX)), reverse=True)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for i, (mtime, path) in enumerate(files):
+            too_old = self.max_age_days and now - mtime > self.max_age_days * 86400
+            if too_old or (self.max_files and i >= self.max_files):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove archived export {path}: {str(e)}")
+        if removed:
+            logger.info(f"Removed {removed} archived export(s) from {self.directory}")
+        return removed
+
+
+export_archive = ExportArchive()
+
+
+async def export_results(results, search_term: str, fmt: str = EXPORT_FORMAT) -> Export:
+    # Builds the export off the event loop, archiving a copy when an archive is configured
+    export = await asyncio.to_thread(build_export, results, search_term, fmt)
+    if export_archive.enabled:
+        try:
+            path = await asyncio.to_thread(export_archive.save, export)
+            logger.info(f"Archived export to {path}")
+        except OSError as e:
+            logger.error(f"Failed to archive export {export.filename}: {str(e)}")
+    return export
\ No newline at end of file
@@ -0,0 +1,228 @@
+import argparse
+import itertools
+import json
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {'id': 100000001, 'is_bot': True, 'first_name': 'Load Test Bot', 'username': 'load_test_bot',
+            'can_join_groups': False, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+# Methods Telegram counts against its flood limits
+RATE_LIMITED_METHODS = frozenset(('sendMessage', 'sendDocument', 'sendPhoto', 'editMessageText',
+                                  'editMessageReplyMarkup', 'pinChatMessage'))
+MESSAGE_METHODS = frozenset(('sendMessage', 'sendDocument', 'sendPhoto', 'editMessageText', 'editMessageReplyMarkup'))
+
+
+class RateBucket:
+    # Token bucket; kept separate from outbox.TokenBucket so this module doesn't read the bot's config
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        # Seconds until a token is available
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+def parse_params(content_type: str, body: bytes) -> dict:
+    # PTB posts form fields, or multipart/form-data when it uploads a file
+    if content_type.startswith('application/json'):
+        return json.loads(body or b'{}')
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            payload = part.get_payload(decode=True) or b''
+            if part.get_filename():
+                params[name] = {'filename': part.get_filename(), 'size': len(payload)}
+            else:
+                params[name] = payload.decode('utf-8', errors='replace')
+        return params
+    return {key: values[-1] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+
+class BotApiRequestHandler(BaseHTTPRequestHandler):
+    # Answers POST /bot<token>/<method> the way the Bot API does: 200 with {"ok": true, "result": ...},
+    # or 429 with retry_after when the call is over the rate limit.
+    protocol_version = 'HTTP/1.1'  # PTB keeps connections open
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        method = self.path.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+        try:
+            params = parse_params(self.headers.get('Content-Type', ''), body)
+        except ValueError as e:
+            self._reply(400, {'ok': False, 'error_code': 400, 'description': f"Bad Request: {str(e)}"})
+            return
+        self._reply(*self.server.api.handle(method, params))
+
+    do_GET = do_POST
+
+    def _reply(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class FakeBotApi:
+    # Stand-in for the Telegram Bot API, for offline runs. It answers the methods the bot uses
+    # with plausible objects, counts every call and enforces Telegram's flood limits: about
+    # `global_rate` messages per second in total and `chat_rate` per chat (with a burst of
+    # `chat_burst`), answering 429 with retry_after beyond them. `latency` seconds are added to
+    # every call to stand in for the network. `on_send(method, chat_id, params)` is called for
+    # every accepted message. Point the bot at it with TELEGRAM_API_BASE_URL=<api.base_url>.
+
+    def __init__(self, host='127.0.0.1', port=0, global_rate=30.0, chat_rate=1.0, chat_burst=3, latency=0.0,
+                 on_send=None):
+        self._server = ThreadingHTTPServer((host, port), BotApiRequestHandler)
+        self._server.api = self
+        self._server.daemon_threads = True
+        self._thread = None
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.latency = latency
+        self.on_send = on_send
+        self._lock = threading.Lock()
+        self._global_bucket = RateBucket(global_rate, global_rate) if global_rate else None
+        self._chat_buckets = {}
+        self._message_ids = defaultdict(itertools.count)  # chat_id -> message id counter
+        self.calls = Counter()  # method -> calls, including rejected ones
+        self.rate_limited = Counter()  # method -> 429 answers
+        self.sends_per_chat = Counter()
+        self.uploaded_bytes = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _retry_after(self, chat_id) -> int:
+        # Seconds the caller must wait, 0 when the call may go through now
+        if self._global_bucket is not None:
+            delay = self._global_bucket.delay()
+            if delay > 0:
+                return math.ceil(delay)
+        bucket = None
+        if chat_id is not None and self.chat_rate:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[chat_id] = RateBucket(self.chat_rate, self.chat_burst)
+            delay = bucket.delay()
+            if delay > 0:
+                return math.ceil(delay)
+        if self._global_bucket is not None:
+            self._global_bucket.take()
+        if bucket is not None:
+            bucket.take()
+        return 0
+
+    def _message(self, chat_id, message_id, params) -> dict:
+        message = {'message_id': message_id, 'date': int(time.time()), 'from': BOT_USER,
+                   'chat': {'id': chat_id, 'type': 'private'}}
+        if 'text' in params:
+            message['text'] = params['text']
+        document = params.get('document')
+        if isinstance(document, dict):
+            message['document'] = {'file_id': f"doc-{chat_id}-{message_id}", 'file_unique_id': f"doc{message_id}",
+                                   'file_name': document['filename'], 'file_size': document['size']}
+        return message
+
+    def handle(self, method: str, params: dict):
+        # Returns (HTTP status, response payload)
+        if self.latency:
+            time.sleep(self.latency)
+        chat_id = params.get('chat_id')
+        chat_id = int(chat_id) if chat_id not in (None, '') and str(chat_id).lstrip('-').isdigit() else chat_id
+
+        with self._lock:
+            self.calls[method] += 1
+            if method in RATE_LIMITED_METHODS:
+                retry_after = self._retry_after(chat_id)
+                if retry_after:
+                    self.rate_limited[method] += 1
+                    return 429, {'ok': False, 'error_code': 429,
+                                 'description': f"Too Many Requests: retry after {retry_after}",
+                                 'parameters': {'retry_after': retry_after}}
+            if method not in MESSAGE_METHODS:
+                return 200, {'ok': True, 'result': BOT_USER if method == 'getMe' else True}
+            self.sends_per_chat[chat_id] += 1
+            document = params.get('document')
+            if isinstance(document, dict):
+                self.uploaded_bytes += document['size']
+            if method.startswith('edit'):
+                message_id = int(params.get('message_id', 0))
+            else:
+                message_id = next(self._message_ids[chat_id]) + 1
+
+        if self.on_send is not None:
+            self.on_send(method, chat_id, params)
+        return 200, {'ok': True, 'result': self._message(chat_id, message_id, params)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'rate_limited': dict(self.rate_limited),
+                'chats': len(self.sends_per_chat),
+                'max_sends_per_chat': max(self.sends_per_chat.values(), default=0),
+                'uploaded_bytes': self.uploaded_bytes,
+            }
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a fake Telegram Bot API locally.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--global-rate', type=float, default=30.0, help="messages per second, 0 for no limit")
+    parser.add_argument('--chat-rate', type=float, default=1.0, help="messages per second per chat, 0 for no limit")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every call")
+    args = parser.parse_args()
+
+    api = FakeBotApi(args.host, args.port, args.global_rate, args.chat_rate, latency=args.latency)
+    print(f"Serving a fake Bot API at {api.base_url}")
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        api.stop()
+        print(json.dumps(api.stats(), indent=2))
\ No newline at end of file
@@ -0,0 +1,89 @@
+import argparse
+import logging
+import os
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DEFAULT_FIXTURE = 'search_iphone_15.html'
+
+
+def fixture_name(search_term: str) -> str:
+    return 'search_' + re.sub(r'[^a-z0-9]+', '_', search_term.lower()).strip('_') + '.html'
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    # Serves /search/<term> from fixtures/search_<term>.html, falling back to the default page.
+
+    def do_GET(self):
+        path = unquote(self.path.split('?')[0])
+        if not path.startswith('/search/'):
+            self.send_error(404)
+            return
+
+        fixtures_dir = self.server.fixtures_dir
+        filepath = os.path.join(fixtures_dir, fixture_name(path[len('/search/'):]))
+        if not os.path.exists(filepath):
+            filepath = os.path.join(fixtures_dir, self.server.default_fixture)
+        with open(filepath, 'rb') as f:
+            body = f.read()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class FixtureServer:
+    # Stand-in for carousell.sg that serves recorded search pages, for offline runs.
+    # Point the bot at it with CAROUSELL_BASE_URL=<server.base_url>.
+
+    def __init__(self, host='127.0.0.1', port=0, fixtures_dir=FIXTURES_DIR, default_fixture=DEFAULT_FIXTURE):
+        self._server = ThreadingHTTPServer((host, port), FixtureRequestHandler)
+        self._server.fixtures_dir = fixtures_dir
+        self._server.default_fixture = default_fixture
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve recorded Carousell search pages locally.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    server = FixtureServer(args.host, args.port, args.fixtures)
+    print(f"Serving fixtures from {args.fixtures} at {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
\ No newline at end of file
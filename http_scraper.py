@@ -0,0 +1,186 @@
+import json
+import logging
+import re
+import time
+from urllib.parse import quote
+import httpx
+from config import CAROUSELL_BASE_URL, HTTP_SCRAPE_TIMEOUT, HTTP_MAX_CONNECTIONS
+from listing import Listing
+from metrics import SCRAPE_STAGE_SECONDS
+from scrape_policy import ScrapeFailure, looks_blocked, TIMEOUT, BLOCKED, PARSE, ERROR, BLOCK_STATUSES
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-SG,en;q=0.9',
+}
+
+NEXT_DATA_PATTERN = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+INITIAL_STATE_PATTERN = re.compile(r'window\.initialState\s*=\s*(\{.*?\})\s*;?\s*</script>', re.S)
+
+# Carousell renders card fields as a list of {"component": ..., "stringContent": ...} entries
+CARD_COMPONENTS = {
+    'listing_title': 'name',
+    'listing_price': 'price',
+    'listing_condition': 'condition',
+    'listing_location': 'location',
+}
+
+_client = None
+
+
+class HttpScrapeError(ScrapeFailure):
+    pass
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            headers=HEADERS,
+            timeout=HTTP_SCRAPE_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def extract_embedded_state(html: str):
+    for pattern in (NEXT_DATA_PATTERN, INITIAL_STATE_PATTERN):
+        match = pattern.search(html)
+        if match:
+            try:
+                return json.loads(match.group(1))
+            except ValueError as e:
+                logger.warning(f"Could not decode embedded page state: {str(e)}")
+    return None
+
+
+def _format_price(value) -> str:
+    if isinstance(value, (int, float)):
+        return f"S${value:,.0f}" if float(value).is_integer() else f"S${value:,.2f}"
+    return str(value).strip()
+
+
+def _price_cents(value):
+    if isinstance(value, (int, float)):
+        return round(value * 100)
+    return None
+
+
+def _card_fields(node) -> dict:
+    fields = {}
+    for key in ('aboveFold', 'belowFold'):
+        for component in node.get(key) or []:
+            if isinstance(component, dict):
+                field = CARD_COMPONENTS.get(component.get('component'))
+                if field and component.get('stringContent'):
+                    fields[field] = component['stringContent']
+    return fields
+
+
+def _to_listing(node):
+    fields = _card_fields(node)
+    seller = node.get('seller') or {}
+    name = node.get('title') or fields.get('name')
+    price = node.get('price') if node.get('price') not in (None, '') else fields.get('price')
+    username = seller.get('username') if isinstance(seller, dict) else None
+    listing_id = node.get('id') or node.get('listingID')
+    if not (name and price is not None and username and listing_id):
+        return None
+
+    url = node.get('url') or ''
+    if url.startswith('/'):
+        url = CAROUSELL_BASE_URL + url
+    elif not url:
+        url = f"{CAROUSELL_BASE_URL}/p/{listing_id}/"
+
+    extra = {}
+    if fields.get('condition'):
+        extra['condition'] = fields['condition']
+    if fields.get('location'):
+        extra['location'] = fields['location']
+    photo = node.get('thumbnailURL') or node.get('photoUrls') or node.get('media')
+    if isinstance(photo, list) and photo:
+        photo = photo[0]
+    if isinstance(photo, dict):
+        photo = photo.get('photoItem', {}).get('url') or photo.get('url')
+    if isinstance(photo, str):
+        extra['thumbnail'] = photo
+
+    return Listing(
+        id=str(listing_id),
+        name=str(name).strip(),
+        price=_format_price(price),
+        username=str(username).strip(),
+        url=url.split('?')[0],
+        price_cents=_price_cents(price),
+        extra=extra,
+    )
+
+
+def parse_embedded_listings(state) -> list:
+    # Walks the page state and picks out every object shaped like a listing card.
+    results = []
+    seen = set()
+    stack = [state]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if 'seller' in node and ('title' in node or 'belowFold' in node or 'aboveFold' in node):
+                item = _to_listing(node)
+                if item and item.id not in seen:
+                    seen.add(item.id)
+                    results.append(item)
+                    continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return results
+
+
+async def scrape_with_http(search_term) -> list:
+    started = time.monotonic()
+    url = f"{CAROUSELL_BASE_URL}/search/{quote(search_term)}"
+    try:
+        response = await get_client().get(url)
+    except httpx.TimeoutException as e:
+        raise HttpScrapeError(f"request timed out: {str(e)}", TIMEOUT) from e
+    except httpx.HTTPError as e:
+        raise HttpScrapeError(f"request failed: {str(e)}", ERROR) from e
+    if response.status_code != 200:
+        kind = BLOCKED if response.status_code in BLOCK_STATUSES else ERROR
+        raise HttpScrapeError(f"unexpected status {response.status_code}", kind)
+    fetched = time.monotonic()
+    SCRAPE_STAGE_SECONDS.observe(fetched - started, stage='http_fetch')
+
+    state = extract_embedded_state(response.text)
+    if state is None:
+        if looks_blocked(response.text):
+            raise HttpScrapeError("got a block or captcha page", BLOCKED)
+        raise HttpScrapeError("no embedded page state found", PARSE)
+    results = parse_embedded_listings(state)
+    SCRAPE_STAGE_SECONDS.observe(time.monotonic() - fetched, stage='parse')
+    if not results:
+        raise HttpScrapeError("embedded page state contained no listings", PARSE)
+
+    logger.info(f"HTTP fast path found {len(results)} listings "
+                f"(fetch {fetched - started:.2f}s, parse {time.monotonic() - fetched:.3f}s, {response.http_version})")
+    return results
\ No newline at end of file
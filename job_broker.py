@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import logging
+from collections import deque
+from job_queue import read_reply, JobQueueError
+
+logger = logging.getLogger(__name__)
+
+# A local stand-in for Redis that implements just the list commands the scrape job queue uses
+# (LPUSH, RPUSH, RPOP, BRPOP, LLEN, DEL), plus PING/SELECT/AUTH/EXPIRE so ordinary Redis
+# clients can connect. Everything lives in memory and is lost on restart.
+
+
+class JobBroker:
+
+    def __init__(self, host='127.0.0.1', port=6390):
+        self.host = host
+        self.port = port
+        self._lists = {}  # key -> deque, newest on the left
+        self._waiters = {}  # key -> deque of futures from blocked BRPOPs
+        self._server = None
+        self._clients = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Job broker listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._clients):
+                task.cancel()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        await self._server.serve_forever()
+
+    def _push(self, key, values, left=True) -> int:
+        items = self._lists.setdefault(key, deque())
+        for value in values:
+            # Hand the value straight to the longest-waiting BRPOP when there is one
+            waiters = self._waiters.get(key)
+            while waiters and waiters[0].done():
+                waiters.popleft()
+            if waiters:
+                waiters.popleft().set_result((key, value))
+            elif left:
+                items.appendleft(value)
+            else:
+                items.append(value)
+        if not items:
+            del self._lists[key]
+        return len(items)
+
+    def _pop(self, key):
+        items = self._lists.get(key)
+        if not items:
+            return None
+        value = items.pop()
+        if not items:
+            del self._lists[key]
+        return value
+
+    async def _brpop(self, keys, timeout):
+        for key in keys:
+            value = self._pop(key)
+            if value is not None:
+                return [key, value]
+
+        future = asyncio.get_running_loop().create_future()
+        for key in keys:
+            self._waiters.setdefault(key, deque()).append(future)
+        try:
+            key, value = await asyncio.wait_for(future, timeout=timeout or None)
+            return [key, value]
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            for key in keys:
+                waiters = self._waiters.get(key)
+                if waiters is not None:
+                    try:
+                        waiters.remove(future)
+                    except ValueError:
+                        pass
+                    if not waiters:
+                        del self._waiters[key]
+
+    async def _run_command(self, args):
+        command = args[0].decode().upper()
+        keys = args[1:]
+        if command in ('PING',):
+            return '+PONG'
+        if command in ('SELECT', 'AUTH', 'CLIENT'):
+            return '+OK'
+        if command in ('LPUSH', 'RPUSH'):
+            return self._push(keys[0], keys[1:], left=command == 'LPUSH')
+        if command == 'RPOP':
+            return self._pop(keys[0])
+        if command == 'BRPOP':
+            return await self._brpop(keys[:-1], float(keys[-1]))
+        if command == 'LLEN':
+            return len(self._lists.get(keys[0], ()))
+        if command == 'DEL':
+            return sum(1 for key in keys if self._lists.pop(key, None) is not None)
+        if command == 'EXPIRE':
+            return 1 if keys[0] in self._lists else 0
+        return JobQueueError(f"ERR unknown command '{command}'")
+
+    async def _handle_client(self, reader, writer) -> None:
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                try:
+                    args = await read_reply(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if not isinstance(args, list) or not args:
+                    writer.write(b"-ERR expected a command array\r\n")
+                    break
+                if args[0].upper() == b'QUIT':
+                    writer.write(b"+OK\r\n")
+                    break
+                writer.write(encode_reply(await self._run_command(args)))
+                await writer.drain()
+        except asyncio.CancelledError:
+            # Broker shutting down; blocked BRPOPs are simply dropped
+            pass
+        except Exception as e:
+            logger.error(f"Job broker client error: {str(e)}", exc_info=True)
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+
+def encode_reply(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, JobQueueError):
+        return f"-{str(value)}\r\n".encode()
+    if isinstance(value, str) and value.startswith('+'):
+        return f"{value}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, (bytes, str)):
+        data = value if isinstance(value, bytes) else value.encode()
+        return f"${len(data)}\r\n".encode() + data + b"\r\n"
+    return f"*{len(value)}\r\n".encode() + b''.join(encode_reply(item) for item in value)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run an in-memory Redis stand-in for the scrape job queue.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(JobBroker(args.host, args.port).serve_forever())
+    except KeyboardInterrupt:
+        pass
\ No newline at end of file
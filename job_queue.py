@@ -0,0 +1,226 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+import uuid
+from urllib.parse import urlparse
+from listing import Listing
+from exports import export_results
+from scrape_policy import ScrapeFailure, ERROR
+from config import SCRAPE_QUEUE_URL, SCRAPE_QUEUE_PREFIX, SCRAPE_JOB_TIMEOUT, SCRAPER_ENGINE
+
+logger = logging.getLogger(__name__)
+
+# Scrape jobs travel over any Redis-compatible server (Redis itself, or job_broker.py as a local
+# stand-in) using only LPUSH/BRPOP on lists:
+#   <prefix>:jobs            job requests, pushed by bots and popped by workers
+#   <prefix>:replies:<bot>   replies for one bot process: started, batch, done or error messages
+POLL_TIMEOUT = 1  # seconds each BRPOP blocks before re-checking for shutdown
+
+
+class JobQueueError(Exception):
+    pass
+
+
+class RespConnection:
+    # Minimal asyncio client for the Redis serialization protocol (RESP2)
+
+    def __init__(self, url=SCRAPE_QUEUE_URL):
+        parsed = urlparse(url)
+        if parsed.scheme not in ('redis', 'tcp'):
+            raise ValueError(f"Unsupported queue URL {url!r}; expected redis://host:port/db")
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._execute('AUTH', self.password)
+        if self.db:
+            await self._execute('SELECT', self.db)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self._writer = None
+
+    async def execute(self, *args):
+        async with self._lock:
+            if self._writer is None:
+                await self.connect()
+            try:
+                return await self._execute(*args)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                # Drop the connection so the next command reconnects
+                self._writer = None
+                raise JobQueueError(f"queue connection failed: {str(e)}") from e
+
+    async def _execute(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        self._writer.write(b''.join(parts))
+        await self._writer.drain()
+        return await read_reply(self._reader)
+
+
+async def read_reply(reader):
+    line = await reader.readuntil(b"\r\n")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode()
+    if kind == b'-':
+        raise JobQueueError(payload.decode())
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise JobQueueError(f"unexpected reply {line!r}")
+
+
+def jobs_key(prefix=SCRAPE_QUEUE_PREFIX) -> str:
+    return f"{prefix}:jobs"
+
+
+def replies_key(bot_id, prefix=SCRAPE_QUEUE_PREFIX) -> str:
+    return f"{prefix}:replies:{bot_id}"
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode('utf-8')
+
+
+def decode(data: bytes) -> dict:
+    return json.loads(data)
+
+
+class _Job:
+    __slots__ = ('job_id', 'search_term', 'stream', 'results', 'messages')
+
+    def __init__(self, job_id, search_term, stream):
+        self.job_id = job_id
+        self.search_term = search_term
+        self.stream = stream
+        self.results = []
+        self.messages = asyncio.Queue()
+
+
+class RemoteScraper:
+    # Stands in for scrape_carousell_async in the bot process: each scrape becomes a job on the
+    # queue and its listings stream back from whichever worker picks it up. The CSV is written
+    # here, so workers may run on other machines.
+
+    def __init__(self, url=SCRAPE_QUEUE_URL, prefix=SCRAPE_QUEUE_PREFIX, job_timeout=SCRAPE_JOB_TIMEOUT):
+        self.url = url
+        self.prefix = prefix
+        self.job_timeout = job_timeout
+        self.bot_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._commands = RespConnection(url)
+        self._replies = RespConnection(url)
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._reader_task = None
+
+    def _ensure_reader(self) -> None:
+        if self._reader_task is None or self._reader_task.done():
+            self._reader_task = asyncio.create_task(self._read_replies())
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        await self._commands.close()
+        await self._replies.close()
+
+    async def _read_replies(self) -> None:
+        key = replies_key(self.bot_id, self.prefix)
+        while True:
+            try:
+                reply = await self._replies.execute('BRPOP', key, POLL_TIMEOUT)
+            except JobQueueError as e:
+                logger.warning(f"Reading scrape replies failed: {str(e)}")
+                await asyncio.sleep(POLL_TIMEOUT)
+                continue
+            if reply is None:
+                continue
+            try:
+                message = decode(reply[1])
+            except ValueError as e:
+                logger.warning(f"Dropping malformed scrape reply: {str(e)}")
+                continue
+            job = self._jobs.get(message.get('job'))
+            if job is not None:
+                job.messages.put_nowait(message)
+
+    async def scrape(self, search_term, engine=SCRAPER_ENGINE, stream=None):
+        # Same contract as scrape_carousell_async: returns (results, export) and pushes
+        # batches to `stream` as they arrive.
+        self._ensure_reader()
+        job = _Job(f"{self.bot_id}:{next(self._ids)}", search_term, stream)
+        self._jobs[job.job_id] = job
+        try:
+            await self._commands.execute('LPUSH', jobs_key(self.prefix), encode({
+                'job': job.job_id,
+                'reply_to': replies_key(self.bot_id, self.prefix),
+                'search_term': search_term,
+                'engine': engine,
+                'enqueued_at': time.time(),
+            }))
+            await self._collect(job)
+        finally:
+            del self._jobs[job.job_id]
+
+        if not job.results:
+            return [], None
+        return job.results, await export_results(job.results, search_term)
+
+    async def _collect(self, job: _Job) -> None:
+        # The timeout is measured between messages, so a slow but progressing scrape isn't cut off
+        while True:
+            try:
+                message = await asyncio.wait_for(job.messages.get(), timeout=self.job_timeout)
+            except asyncio.TimeoutError:
+                raise JobQueueError(f"no reply for scrape job {job.job_id} within {self.job_timeout}s") from None
+
+            kind = message.get('type')
+            if kind == 'started':
+                logger.info(f"Scrape job {job.job_id} for '{job.search_term}' started on worker {message.get('worker')}")
+            elif kind == 'batch':
+                batch = [Listing.from_dict(item) for item in message.get('items', [])]
+                if job.stream is not None:
+                    batch = job.stream.extend(batch)
+                job.results.extend(batch)
+            elif kind == 'done':
+                logger.info(f"Scrape job {job.job_id} finished with {len(job.results)} listings")
+                return
+            elif kind == 'error':
+                raise ScrapeFailure(f"worker failed scrape job {job.job_id}: {message.get('error')}",
+                                    message.get('kind', ERROR))
+
+
+remote_scraper = RemoteScraper()
\ No newline at end of file
@@ -0,0 +1,62 @@
+import time
+from typing import Optional
+from utils import parse_price_cents
+
+
+class Listing:
+    # Compact record for one scraped listing. The price is parsed once at scrape time into
+    # integer cents (None when it isn't a number); `price` keeps the text shown on Carousell.
+    FIELDS = ('id', 'name', 'price', 'price_cents', 'username', 'url', 'scraped_at', 'extra')
+    __slots__ = FIELDS + ('__weakref__',)  # weakly referenced by the shared listing store
+
+    def __init__(self, id: str, name: str, price: str, username: str, url: str = '',
+                 price_cents: Optional[int] = None, scraped_at: Optional[float] = None, extra: Optional[dict] = None):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.price_cents = parse_price_cents(price) if price_cents is None else price_cents
+        self.username = username
+        self.url = url
+        self.scraped_at = time.time() if scraped_at is None else scraped_at
+        self.extra = extra or None  # optional fields such as condition, location, thumbnail
+
+    @property
+    def key(self) -> str:
+        return self.id or f"{self.name}|{self.username}"
+
+    @property
+    def price_value(self) -> Optional[float]:
+        return None if self.price_cents is None else self.price_cents / 100
+
+    def link(self) -> str:
+        return self.url or f"carousell.sg/u/{self.username}/"
+
+    def to_dict(self) -> dict:
+        row = {
+            'name': self.name,
+            'price': self.price,
+            'price_cents': self.price_cents,
+            'username': self.username,
+            'id': self.id,
+            'url': self.url,
+            'scraped_at': self.scraped_at,
+        }
+        if self.extra:
+            row.update(self.extra)
+        return row
+
+    @classmethod
+    def from_dict(cls, row: dict) -> 'Listing':
+        fields = {name: row.get(name) for name in cls.FIELDS if name != 'extra'}
+        extra = {name: value for name, value in row.items() if name not in cls.FIELDS}
+        return cls(extra=extra, **fields)
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.FIELDS, state):
+            setattr(self, slot, value)
+
+    def __repr__(self):
+        return f"Listing(id={self.id!r}, name={self.name!r}, price={self.price!r}, username={self.username!r})"
\ No newline at end of file
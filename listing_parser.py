@@ -0,0 +1,130 @@
+import logging
+import time
+from collections import Counter
+from metrics import LISTING_CARDS, LISTING_FIELD_FAILURES
+from config import PARSER_BACKEND, CAROUSELL_BASE_URL
+from listing import Listing
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+CARD_TESTID_PREFIX = 'listing-card-'
+SELLER_TESTID = 'listing-card-text-seller-name'
+# Carousell's generated class names for the price and title paragraphs
+PRICE_CLASSES = ('D_lf', 'D_lg', 'D_lk', 'D_lm', 'D_lq', 'D_lt', 'D_l_')
+NAME_CLASSES = ('D_lf', 'D_lg', 'D_lk', 'D_ln', 'D_lq', 'D_ls', 'D_lo', 'D_lA')
+FIELDS = ('price', 'name', 'username')
+
+
+def _listing_url(href) -> str:
+    if not href:
+        return ''
+    href = href.split('?')[0]
+    return CAROUSELL_BASE_URL + href if href.startswith('/') else href
+
+
+def _pick_fields(paragraphs):
+    # paragraphs: (class attribute, data-testid, text, title) per <p>, in document order.
+    # Mirrors the selector precedence of the original BeautifulSoup parser in a single walk.
+    price = [None, None, None]
+    name = [None, None, None]
+    username = [None, None]
+    for class_attr, testid, text, title in paragraphs:
+        has_currency = 'S$' in text
+        if price[0] is None and all(c in class_attr for c in PRICE_CLASSES):
+            price[0] = text
+        if price[1] is None and 'price' in class_attr:
+            price[1] = text
+        if price[2] is None and has_currency:
+            price[2] = text
+        if name[0] is None and all(c in class_attr for c in NAME_CLASSES):
+            name[0] = title or text
+        if name[1] is None and 'title' in class_attr:
+            name[1] = title or text
+        if name[2] is None and not has_currency:
+            name[2] = title or text
+        if username[0] is None and testid == SELLER_TESTID:
+            username[0] = text
+        if username[1] is None and '@' in text:
+            username[1] = text
+    pick = lambda candidates: next((c for c in candidates if c is not None), None)
+    return {'price': pick(price), 'name': pick(name), 'username': pick(username)}
+
+
+def _build_item(card_testid, fields, href, counts):
+    missing = [field for field in FIELDS if not fields[field]]
+    if missing:
+        for field in missing:
+            counts[f'missing_{field}'] += 1
+        return None
+    return Listing(
+        id=card_testid[len(CARD_TESTID_PREFIX):],
+        name=fields['name'],
+        price=fields['price'],
+        username=fields['username'],
+        url=_listing_url(href),
+    )
+
+
+def _parse_with_lxml(html, counts):
+    tree = lxml.html.fromstring(html)
+    results = []
+    for card in tree.xpath(f'//div[starts-with(@data-testid, "{CARD_TESTID_PREFIX}")]'):
+        counts['cards'] += 1
+        paragraphs = []
+        href = None
+        for element in card.iter('p', 'a'):
+            if element.tag == 'a':
+                if href is None and '/p/' in (element.get('href') or ''):
+                    href = element.get('href')
+                continue
+            paragraphs.append((element.get('class') or '', element.get('data-testid'),
+                               element.text_content().strip(), element.get('title')))
+        item = _build_item(card.get('data-testid'), _pick_fields(paragraphs), href, counts)
+        if item:
+            results.append(item)
+    return results
+
+
+def _parse_with_bs4(html, counts):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    results = []
+    for card in soup.find_all('div', {'data-testid': lambda x: x and x.startswith(CARD_TESTID_PREFIX)}):
+        counts['cards'] += 1
+        paragraphs = [(' '.join(p.get('class') or []), p.get('data-testid'), p.get_text().strip(), p.get('title'))
+                      for p in card.find_all('p')]
+        link = card.find('a', href=lambda x: x and '/p/' in x)
+        item = _build_item(card['data-testid'], _pick_fields(paragraphs), link['href'] if link else None, counts)
+        if item:
+            results.append(item)
+    return results
+
+
+def parse_listings(html: str, backend: str = PARSER_BACKEND) -> list:
+    if backend == 'auto':
+        backend = 'lxml' if LXML_AVAILABLE else 'bs4'
+
+    started = time.monotonic()
+    counts = Counter()
+    if backend == 'lxml':
+        results = _parse_with_lxml(html, counts)
+    else:
+        results = _parse_with_bs4(html, counts)
+    counts['parsed'] = len(results)
+    LISTING_CARDS.inc(counts['cards'], outcome='seen')
+    LISTING_CARDS.inc(len(results), outcome='parsed')
+    for key, value in counts.items():
+        if key.startswith('missing_'):
+            LISTING_FIELD_FAILURES.inc(value, field=key[len('missing_'):])
+
+    failures = ', '.join(f"{key}={value}" for key, value in counts.items() if key.startswith('missing_'))
+    logger.info(f"Parsed {len(results)}/{counts['cards']} listing cards with {backend} "
+                f"in {(time.monotonic() - started) * 1000:.1f}ms" + (f" ({failures})" if failures else ""))
+    return results
\ No newline at end of file
@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from benchmark import git_commit
+from fake_bot_api import FakeBotApi, BOT_USER
+from fixture_server import FixtureServer
+
+# Load test for the bot: virtual users go through /start, a search, paging, filtering and setting
+# a price alert, driving the real Application, ConversationHandler and handlers in-process.
+# Telegram is replaced by FakeBotApi (which enforces flood limits) and Carousell by FixtureServer,
+# so runs are offline. Reports handler latency per step, throughput and peak memory as JSON.
+# The fake servers run in this process too, so peak memory includes them.
+
+DEFAULT_TERMS = ['iphone 15', 'ipad air', 'macbook pro', 'nintendo switch', 'airpods']
+FIRST_USER_ID = 700000000
+ERROR_REPLY_MARKERS = ('An error occurred', 'Oops!')
+ALERT_SET_MARKER = 'Price alert set'
+
+
+def percentiles(samples) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {'n': 0}
+
+    def rank(q):
+        return samples[min(len(samples) - 1, max(0, math.ceil(q * len(samples)) - 1))] * 1000
+
+    return {
+        'n': len(samples),
+        'p50_ms': rank(0.50),
+        'p90_ms': rank(0.90),
+        'p99_ms': rank(0.99),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'max_ms': samples[-1] * 1000,
+    }
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class VirtualUser:
+    # Builds the updates one Telegram user would send; each user is also their own private chat
+
+    update_ids = itertools.count(1)
+
+    def __init__(self, user_id: int):
+        self.user = {'id': user_id, 'is_bot': False, 'first_name': f"Load{user_id}", 'language_code': 'en'}
+        self.chat = {'id': user_id, 'type': 'private', 'first_name': f"Load{user_id}"}
+        self.message_ids = itertools.count(1)
+
+    def message(self, text: str) -> dict:
+        message = {'message_id': next(self.message_ids), 'date': int(time.time()), 'chat': self.chat,
+                   'from': self.user, 'text': text}
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'update_id': next(self.update_ids), 'message': message}
+
+    def callback(self, data: str) -> dict:
+        # A press on a button of the bot's message; the bot edits that message in reply
+        update_id = next(self.update_ids)
+        message = {'message_id': 1, 'date': int(time.time()), 'chat': self.chat, 'from': BOT_USER, 'text': '...'}
+        return {'update_id': update_id, 'callback_query': {'id': str(update_id), 'from': self.user,
+                                                           'chat_instance': str(self.chat['id']),
+                                                           'message': message, 'data': data}}
+
+    def script(self, search_term: str, pages: int) -> list:
+        # (step name, update) pairs in the order the user sends them
+        steps = [('start', self.message('/start')),
+                 ('menu', self.callback('search')),
+                 ('search', self.message(search_term))]
+        steps += [('page', self.callback('next_page')) for _ in range(pages)]
+        if pages:
+            steps.append(('page', self.callback('prev_page')))
+        steps += [('filter', self.callback('filter_item')),
+                  ('filter', self.message('2')),
+                  ('sort', self.callback('sort_price_asc')),
+                  ('menu', self.callback('back_to_main')),
+                  ('alert', self.callback('set_alert')),
+                  ('alert', self.message(search_term)),
+                  ('alert', self.message('100-500 -case'))]
+        return steps
+
+
+async def run_user(application, user: VirtualUser, search_term: str, pages: int, think_time: float,
+                   start_delay: float, latencies: dict) -> bool:
+    from telegram import Update
+
+    await asyncio.sleep(start_delay)
+    for step, data in user.script(search_term, pages):
+        update = Update.de_json(data, application.bot)
+        started = time.perf_counter()
+        try:
+            # Through the update processor, so CONCURRENT_UPDATES applies as it does in production
+            await application.update_processor.process_update(update, application.process_update(update))
+        except Exception as e:
+            print(f"User {user.user['id']}: {step} failed: {str(e)}")
+            return False
+        latencies[step].append(time.perf_counter() - started)
+        if think_time:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * think_time)
+    return True
+
+
+async def run_load(args, api: FakeBotApi) -> dict:
+    # Imported here: config is read at import time, after main() has set up the environment
+    import main as bot_main
+    import logging
+
+    logging.getLogger().setLevel(args.log_level)
+    application = bot_main.build_application(token='100000001:LOADTEST', base_url=api.base_url)
+    await application.initialize()
+    await bot_main.post_init(application)  # only run_polling/run_webhook call it themselves
+    await application.start()
+
+    latencies = defaultdict(list)
+    users = [VirtualUser(FIRST_USER_ID + i) for i in range(args.users)]
+    started = time.perf_counter()
+    try:
+        outcomes = await asyncio.gather(*(
+            run_user(application, user, args.terms[i % len(args.terms)], args.pages, args.think_time,
+                     args.ramp_up * i / args.users, latencies)
+            for i, user in enumerate(users)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await application.stop()  # also waits for the background tasks handlers started
+        await bot_main.post_shutdown(application)
+        await application.shutdown()
+
+    total = sum(len(samples) for samples in latencies.values())
+    return {
+        'elapsed_s': elapsed,
+        'updates': total,
+        'throughput_updates_per_s': total / elapsed if elapsed else 0.0,
+        'completed_users': sum(outcomes),
+        'latency': {'all': percentiles([sample for samples in latencies.values() for sample in samples]),
+                    **{step: percentiles(samples) for step, samples in latencies.items()}},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the bot in-process against fake Telegram and Carousell servers.")
+    parser.add_argument('--users', type=int, default=50, help="Number of virtual users")
+    parser.add_argument('--ramp-up', type=float, default=10.0, help="Seconds over which users start")
+    parser.add_argument('--think-time', type=float, default=1.0, help="Mean seconds a user waits between steps")
+    parser.add_argument('--pages', type=int, default=3, help="Result pages each user pages forward through")
+    parser.add_argument('--terms', nargs='+', default=DEFAULT_TERMS, help="Search terms, spread over the users")
+    parser.add_argument('--engine', default='http', help="SCRAPER_ENGINE to use (the browser needs Playwright)")
+    parser.add_argument('--no-cache', action='store_true', help="Disable the search cache (SEARCH_CACHE_TTL=0)")
+    parser.add_argument('--concurrent-updates', type=int, help="CONCURRENT_UPDATES, default from the environment")
+    parser.add_argument('--global-rate', type=float, default=30.0, help="Fake Bot API messages per second, 0 for no limit")
+    parser.add_argument('--chat-rate', type=float, default=1.0, help="Fake Bot API messages per second per chat")
+    parser.add_argument('--api-latency', type=float, default=0.05, help="Seconds the fake Bot API adds to every call")
+    parser.add_argument('--trace-memory', action='store_true', help="Also report the tracemalloc peak (slows the bot down)")
+    parser.add_argument('--log-level', default='WARNING', help="Log level for bot.log during the run")
+    parser.add_argument('--output', default='load_results.json')
+    args = parser.parse_args()
+    if args.users < 1:
+        sys.exit("--users must be at least 1.")
+
+    replies = Counter()
+    replies_lock = threading.Lock()
+
+    def on_send(method, chat_id, params):
+        text = params.get('text') or ''
+        with replies_lock:
+            if any(marker in text for marker in ERROR_REPLY_MARKERS):
+                replies['error'] += 1
+            elif ALERT_SET_MARKER in text:
+                replies['alert_set'] += 1
+
+    fixtures = FixtureServer()
+    api = FakeBotApi(global_rate=args.global_rate, chat_rate=args.chat_rate, latency=args.api_latency,
+                     on_send=on_send)
+    fixtures.start()
+    api.start()
+    data_dir = tempfile.TemporaryDirectory(prefix='load_test_')
+    # Keep the run away from real data, metrics port and archives
+    os.environ.update({
+        'CAROUSELL_BASE_URL': fixtures.base_url,
+        'SCRAPER_ENGINE': args.engine,
+        'SCRAPE_BACKEND': 'inprocess',
+        'METRICS_PORT': '0',
+        'EXPORT_ARCHIVE_DIR': '',
+        'DATA_DIR': data_dir.name,
+        'SEEN_LISTINGS_DB_PATH': os.path.join(data_dir.name, 'seen_listings.db'),
+        'PRICE_HISTORY_DB_PATH': os.path.join(data_dir.name, 'price_history.db'),
+        'PERSISTENCE_DB_PATH': os.path.join(data_dir.name, 'bot_data.db'),
+        'DEBUG_CAPTURE_DIR': os.path.join(data_dir.name, 'debug'),
+        'BROWSER_STORAGE_STATE_PATH': os.path.join(data_dir.name, 'browser_state.json'),
+    })
+    if args.no_cache:
+        os.environ['SEARCH_CACHE_TTL'] = '0'
+    if args.concurrent_updates is not None:
+        os.environ['CONCURRENT_UPDATES'] = str(args.concurrent_updates)
+
+    baseline_rss = peak_rss_mb()
+    if args.trace_memory:
+        tracemalloc.start()
+    try:
+        results = asyncio.run(run_load(args, api))
+    finally:
+        api.stop()
+        fixtures.stop()
+        data_dir.cleanup()
+
+    from config import CONCURRENT_UPDATES, SEARCH_CACHE_TTL
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': {
+            'users': args.users,
+            'ramp_up_s': args.ramp_up,
+            'think_time_s': args.think_time,
+            'pages': args.pages,
+            'terms': args.terms,
+            'engine': args.engine,
+            'concurrent_updates': CONCURRENT_UPDATES,
+            'search_cache_ttl': SEARCH_CACHE_TTL,
+            'api_global_rate': args.global_rate,
+            'api_chat_rate': args.chat_rate,
+            'api_latency_ms': args.api_latency * 1000,
+        },
+        **results,
+        'alerts_set': replies['alert_set'],
+        'error_replies': replies['error'],
+        'memory': {
+            'baseline_rss_mb': baseline_rss,
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'bot_api': api.stats(),
+    }
+    if args.trace_memory:
+        report['memory']['tracemalloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({key: report[key] for key in ('throughput_updates_per_s', 'completed_users', 'alerts_set',
+                                                   'error_replies', 'latency', 'memory', 'bot_api')}, indent=2))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,12 +1,33 @@
+import asyncio
 import logging
+from urllib.parse import urlparse
 from telegram import Update
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ConversationHandler
 from bot_handlers import (
     start, help_command, handle_main_menu, handle_search, handle_results_navigation,
     handle_filter_item, handle_set_price_alert, handle_set_frequency, stop_scheduled_search,
-    view_tracked_items, handle_edit_tracked_item, handle_edit_tracked_item_input
+    view_tracked_items, handle_edit_tracked_item, handle_edit_tracked_item_input, restore_subscriptions,
+    handle_refine_results, stats_command, subscription_scheduler
 )
-from utils import MAIN_MENU, SEARCH, VIEWING_RESULTS, FILTERING, SET_PRICE_ALERT, SET_FREQUENCY, VIEW_TRACKED_ITEMS, EDIT_TRACKED_ITEM
+from browser_pool import browser_pool
+from http_scraper import close_client
+from persistence import SQLitePersistence
+from metrics import metrics_server, registry, instrument_handler
+from search_cache import search_cache
+from scrape_dispatcher import scrape_dispatcher
+from outbox import outbox
+from result_sessions import result_sessions
+from scrape_policy import scrape_breaker
+from job_queue import remote_scraper
+from job_broker import JobBroker
+from scrape_worker import local_workers
+from update_processor import PerUserUpdateProcessor
+from config import (
+    SCRAPER_ENGINE, TELEGRAM_TOKEN, TELEGRAM_API_BASE_URL, BOT_MODE, CONCURRENT_UPDATES, WEBHOOK_LISTEN, WEBHOOK_PORT,
+    WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS, METRICS_PORT,
+    SCRAPE_BACKEND, SCRAPE_QUEUE_URL, SCRAPE_LOCAL_WORKERS, RESULT_SESSION_SWEEP_INTERVAL
+)
+from utils import MAIN_MENU, SEARCH, VIEWING_RESULTS, FILTERING, SET_PRICE_ALERT, SET_FREQUENCY, VIEW_TRACKED_ITEMS, EDIT_TRACKED_ITEM, REFINING_RESULTS, STATE_NAMES
 
 # Enable logging
 logging.basicConfig(
@@ -17,40 +38,115 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def main() -> None:
-    try:
-        # Replace 'YOUR_BOT_TOKEN' with your actual bot token
-        application = Application.builder().token('').build()
-        logger.info("Bot application created successfully.")
-
-        conv_handler = ConversationHandler(
-            entry_points=[CommandHandler('start', start)],
-            states={
-                MAIN_MENU: [CallbackQueryHandler(handle_main_menu)],
-                SEARCH: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search)],
-                VIEWING_RESULTS: [CallbackQueryHandler(handle_results_navigation)],
-                FILTERING: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_filter_item)],
-                SET_PRICE_ALERT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_set_price_alert)],
-                SET_FREQUENCY: [CallbackQueryHandler(handle_set_frequency)],
-                VIEW_TRACKED_ITEMS: [
-                    CallbackQueryHandler(handle_edit_tracked_item, pattern=r'^edit_\d+$'),
-                    CallbackQueryHandler(handle_main_menu, pattern='^back_to_main$')
-                ],
-                EDIT_TRACKED_ITEM: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_edit_tracked_item_input)],
-            },
-            fallbacks=[
-                CommandHandler('help', help_command),
-                CommandHandler('stop', stop_scheduled_search),
-                CommandHandler('start', start),
+# The conversation only uses messages (commands and text) and inline button presses
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+job_broker = None
+
+async def sweep_result_sessions(context) -> None:
+    result_sessions.sweep()
+
+async def post_init(application: Application) -> None:
+    global job_broker
+    if SCRAPE_BACKEND == 'queue':
+        if SCRAPE_LOCAL_WORKERS:
+            # Host the queue ourselves; the workers' URL must point at this process
+            url = urlparse(SCRAPE_QUEUE_URL)
+            job_broker = JobBroker(url.hostname or '127.0.0.1', url.port or 6379)
+            await job_broker.start()
+            local_workers.start(SCRAPE_LOCAL_WORKERS, SCRAPE_QUEUE_URL)
+    elif SCRAPER_ENGINE != 'http':
+        await browser_pool.start()
+    restore_subscriptions(application)
+    # Result lists used to be kept (and persisted) in user_data; they now live in result_sessions
+    for user_data in application.user_data.values():
+        user_data.pop('search_results', None)
+    application.job_queue.run_repeating(sweep_result_sessions, interval=RESULT_SESSION_SWEEP_INTERVAL,
+                                        first=RESULT_SESSION_SWEEP_INTERVAL, name='result_session_sweep')
+    if METRICS_PORT:
+        registry.register_collector('search_cache', search_cache.stats)
+        registry.register_collector('scrape_dispatcher', scrape_dispatcher.stats)
+        registry.register_collector('outbox', outbox.stats)
+        registry.register_collector('subscription_scheduler', subscription_scheduler.stats)
+        registry.register_collector('result_sessions', result_sessions.stats)
+        registry.register_collector('scrape_breaker', scrape_breaker.stats)
+        metrics_server.start()
+
+async def post_shutdown(application: Application) -> None:
+    metrics_server.stop()
+    await browser_pool.stop()
+    await close_client()
+    await remote_scraper.close()
+    if SCRAPE_LOCAL_WORKERS:
+        await asyncio.to_thread(local_workers.stop)
+    if job_broker is not None:
+        await job_broker.stop()
+
+def build_application(token: str = TELEGRAM_TOKEN, base_url: str = TELEGRAM_API_BASE_URL, persistence=None) -> Application:
+    builder = (Application.builder().token(token).concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+               .persistence(persistence if persistence is not None else SQLitePersistence())
+               .post_init(post_init).post_shutdown(post_shutdown))
+    if base_url:
+        builder = builder.base_url(f"{base_url.rstrip('/')}/bot").base_file_url(f"{base_url.rstrip('/')}/file/bot")
+    application = builder.build()
+    logger.info("Bot application created successfully.")
+
+    conv_handler = ConversationHandler(
+        name='main_conversation',
+        persistent=True,
+        entry_points=[CommandHandler('start', start)],
+        states={
+            MAIN_MENU: [CallbackQueryHandler(handle_main_menu)],
+            SEARCH: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search)],
+            VIEWING_RESULTS: [CallbackQueryHandler(handle_results_navigation)],
+            FILTERING: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_filter_item)],
+            REFINING_RESULTS: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_refine_results)],
+            SET_PRICE_ALERT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_set_price_alert)],
+            SET_FREQUENCY: [CallbackQueryHandler(handle_set_frequency)],
+            VIEW_TRACKED_ITEMS: [
+                CallbackQueryHandler(handle_edit_tracked_item, pattern=r'^edit_\d+$'),
+                CallbackQueryHandler(handle_main_menu, pattern='^back_to_main$')
             ],
-        )
-        logger.info("ConversationHandler created successfully.")
+            EDIT_TRACKED_ITEM: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_edit_tracked_item_input)],
+        },
+        fallbacks=[
+            CommandHandler('help', help_command),
+            CommandHandler('stop', stop_scheduled_search),
+            CommandHandler('stats', stats_command),
+            CommandHandler('start', start),
+        ],
+    )
+    # Record handler latency per conversation state
+    instrumented = [(STATE_NAMES.get(state, str(state)), handlers) for state, handlers in conv_handler.states.items()]
+    instrumented += [('entry', conv_handler.entry_points), ('fallback', conv_handler.fallbacks)]
+    for state_name, handlers in instrumented:
+        for handler in handlers:
+            handler.callback = instrument_handler(state_name, handler.callback)
+    logger.info("ConversationHandler created successfully.")
 
-        application.add_handler(conv_handler)
-        logger.info("ConversationHandler added to application.")
+    application.add_handler(conv_handler)
+    application.add_handler(CommandHandler('stats', stats_command))
+    logger.info("ConversationHandler added to application.")
+    return application
+
+def main() -> None:
+    try:
+        application = build_application()
 
-        logger.info("Bot is starting...")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if BOT_MODE == 'webhook':
+            logger.info(f"Bot is starting in webhook mode on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}...")
+            application.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                webhook_url=WEBHOOK_URL or None,
+                secret_token=WEBHOOK_SECRET_TOKEN or None,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=ALLOWED_UPDATES,
+            )
+        else:
+            logger.info("Bot is starting...")
+            application.run_polling(allowed_updates=ALLOWED_UPDATES)
     except Exception as e:
         logger.error(f"An error occurred while starting the bot: {str(e)}", exc_info=True)
 
@@ -0,0 +1,305 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from config import METRICS_HOST, METRICS_PORT, METRICS_PROFILING
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (0, 1, 5, 10, 20, 40, 60, 100, 200, 500)
+MAX_PROFILE_SECONDS = 300
+
+
+def _format_labels(labelnames, values, extra=None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _samples(self):
+        for key, (bucket_counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, name, stats) -> None:
+        # Exports a component's `stats()` dict as the gauge `<name>_stat{key="..."}` on every scrape
+        self._collectors[name] = stats
+
+    def expose(self) -> str:
+        blocks = [metric.expose() for metric in self._metrics.values()]
+        for name, stats in self._collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Metrics collector {name} failed: {str(e)}")
+                continue
+            lines = [f"# HELP {name}_stat Internal counters reported by {name}.stats()", f"# TYPE {name}_stat gauge"]
+            lines.extend(f'{name}_stat{{key="{key}"}} {_format_value(value)}'
+                         for key, value in values.items() if isinstance(value, (int, float)))
+            blocks.append('\n'.join(lines))
+        return '\n'.join(blocks) + '\n'
+
+
+registry = Registry()
+
+SCRAPE_STAGE_SECONDS = registry.histogram('scrape_stage_seconds', "Time spent in each scraper stage.", ['stage'])
+SCRAPES = registry.counter('scrapes', "Finished scrapes by engine and outcome.", ['engine', 'outcome'])
+SCRAPE_RETRIES = registry.counter('scrape_retries', "Browser scrape attempts that were retried.", ['reason'])
+SCRAPE_FAILURES = registry.counter('scrape_failures', "Failed scrape attempts by engine and failure kind.",
+                                   ['engine', 'kind'])
+CIRCUIT_STATE = registry.gauge('scrape_circuit_state', "Scrape circuit breaker state: 0 closed, 1 half-open, 2 open.")
+CIRCUIT_TRIPS = registry.counter('scrape_circuit_trips', "Times the scrape circuit breaker opened, by failure kind.",
+                                 ['kind'])
+DEBUG_CAPTURES = registry.counter('debug_captures', "Debug captures of failed scrapes by outcome.", ['outcome'])
+LISTING_CARDS = registry.counter('listing_cards', "Listing cards found by the parser, and how many became listings.",
+                                 ['outcome'])
+LISTING_FIELD_FAILURES = registry.counter('listing_field_failures', "Listing cards the parser could not read a field from.",
+                                          ['field'])
+LISTINGS_PER_SCRAPE = registry.histogram('listings_per_scrape', "Listings returned by one scrape.", buckets=COUNT_BUCKETS)
+SEARCH_LATENCY_SECONDS = registry.histogram('search_latency_seconds',
+                                            "Interactive search latency until the first page and until all results.",
+                                            ['phase'])
+SCHEDULED_JOB_LAG_SECONDS = registry.histogram('scheduled_job_lag_seconds',
+                                               "Delay between a scheduled search being due and starting.")
+BROWSER_REQUESTS = registry.counter('browser_requests', "Browser requests by how they were handled.", ['outcome'])
+BROWSER_PAGE_BYTES = registry.histogram('browser_page_bytes', "Bytes received over the network per scraped page.",
+                                        buckets=(64e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6, 32e6))
+SCHEDULED_RUNS = registry.counter('scheduled_runs', "Scheduled search group runs by outcome.", ['outcome'])
+HANDLER_SECONDS = registry.histogram('handler_seconds', "Handler latency per conversation state.",
+                                     ['state', 'handler'])
+
+
+def instrument_handler(state, callback):
+    # Wraps a PTB handler callback so its latency is recorded under the given conversation state
+    @wraps(callback)
+    async def timed(update, context):
+        with HANDLER_SECONDS.time(state=state, handler=callback.__name__):
+            return await callback(update, context)
+    return timed
+
+
+class Profiler:
+    # Runs cProfile on the event loop thread for a fixed window, on request
+
+    def __init__(self):
+        self.loop = None
+        self._busy = threading.Lock()
+
+    async def _profile(self, seconds) -> str:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(60)
+        return output.getvalue()
+
+    def profile(self, seconds) -> str:
+        # Called from the metrics server thread; blocks until the profile window has passed
+        if self.loop is None:
+            raise RuntimeError("profiler is not attached to an event loop")
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("a profile is already running")
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._profile(seconds), self.loop)
+            return future.result(timeout=seconds + 30)
+        finally:
+            self._busy.release()
+
+
+profiler = Profiler()
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/metrics':
+            self._reply(200, registry.expose(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif url.path == '/debug/profile':
+            if not self.server.profiling_enabled:
+                self._reply(404, "profiling is disabled (set METRICS_PROFILING=1)\n")
+                return
+            try:
+                seconds = float(parse_qs(url.query).get('seconds', ['10'])[0])
+            except ValueError:
+                self._reply(400, "seconds must be a number\n")
+                return
+            try:
+                self._reply(200, profiler.profile(min(max(seconds, 0.1), MAX_PROFILE_SECONDS)))
+            except RuntimeError as e:
+                self._reply(409, f"{str(e)}\n")
+        else:
+            self._reply(404, "not found\n")
+
+    def _reply(self, status, body, content_type='text/plain; charset=utf-8'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics request: {format % args}")
+
+
+class MetricsServer:
+    # Serves /metrics (Prometheus text format) and, when enabled, /debug/profile?seconds=N
+
+    def __init__(self, host=METRICS_HOST, port=METRICS_PORT, profiling_enabled=METRICS_PROFILING):
+        self.host = host
+        self.port = port
+        self.profiling_enabled = profiling_enabled
+        self._server = None
+        self._thread = None
+
+    def start(self, loop=None) -> None:
+        profiler.loop = loop or asyncio.get_running_loop()
+        self._server = ThreadingHTTPServer((self.host, self.port), MetricsRequestHandler)
+        self._server.profiling_enabled = self.profiling_enabled
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics server listening on http://{self.host}:{self._server.server_address[1]}/metrics")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+metrics_server = MetricsServer()
\ No newline at end of file
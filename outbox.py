@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from telegram.error import RetryAfter, TimedOut, NetworkError, BadRequest, Forbidden
+from config import OUTBOX_GLOBAL_RATE, OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST, OUTBOX_MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+ALERT_SEPARATOR = "\n\n➖➖➖\n\n"
+MAX_IDLE_BUCKETS = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        # Seconds until a token is available
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Outbox:
+    # Single path for outgoing bot messages. Sends are throttled by a global and a per-chat
+    # token bucket, kept in order per chat, retried on flood control (honouring retry_after)
+    # and transient network errors, and pending alerts for the same chat are merged.
+
+    def __init__(self, global_rate=OUTBOX_GLOBAL_RATE, chat_rate=OUTBOX_CHAT_RATE, chat_burst=OUTBOX_CHAT_BURST,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS):
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts} (OUTBOX_MAX_ATTEMPTS)")
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_buckets = {}
+        self._chat_locks = {}  # chat_id -> [lock, callers holding or waiting for it]
+        self._pending_alerts = {}  # chat_id -> [texts, future] not yet picked up for sending
+        self._paused_until = 0.0
+        self._tasks = set()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.coalesced = 0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > MAX_IDLE_BUCKETS:
+                self._chat_buckets = {key: value for key, value in self._chat_buckets.items() if not value.idle}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _wait_for_flood_pause(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def call(self, chat_id, send):
+        # send: zero-argument callable returning the Bot API coroutine, so it can be retried
+        # The lock is dropped only once nobody holds or waits for it: a woken waiter that hasn't
+        # taken it yet leaves it unlocked, and a new lock then would let two sends run at once
+        entry = self._chat_locks.get(chat_id)
+        if entry is None:
+            entry = self._chat_locks[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await self._send_with_retry(chat_id, send)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chat_locks[chat_id]
+
+    async def _send_with_retry(self, chat_id, send):
+        for attempt in range(1, self.max_attempts + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self._wait_for_flood_pause()
+            await self._global.acquire()
+            try:
+                result = await send()
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                error = e
+                retry_after = e.retry_after
+                delay = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+                # Flood control applies to the whole bot, so every chat waits it out
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(f"Flood control for chat {chat_id}, retrying in {delay:.0f}s (attempt {attempt})")
+            except (BadRequest, Forbidden):
+                # BadRequest subclasses NetworkError but retrying it can't help
+                self.failed += 1
+                raise
+            except (TimedOut, NetworkError) as e:
+                error = e
+                delay = min(2 ** attempt, 30)
+                logger.warning(f"Send to chat {chat_id} failed ({str(e)}), retrying in {delay}s (attempt {attempt})")
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(delay)
+            if attempt < self.max_attempts:
+                self.retried += 1
+        self.failed += 1
+        raise error
+
+    def submit(self, chat_id, send) -> asyncio.Future:
+        # Fire-and-forget variant of call(); failures are logged
+        task = asyncio.create_task(self.call(chat_id, send))
+        self._tasks.add(task)
+        task.add_done_callback(self._finish_task)
+        return task
+
+    def _finish_task(self, task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Queued send failed: {str(task.exception())}")
+
+    def send_alert(self, bot, chat_id, text: str) -> asyncio.Future:
+        # Alerts still waiting for their turn in this chat are merged into one message
+        pending = self._pending_alerts.get(chat_id)
+        if pending is not None:
+            texts, future = pending
+            if sum(len(t) + len(ALERT_SEPARATOR) for t in texts) + len(text) <= MAX_MESSAGE_LENGTH:
+                texts.append(text)
+                self.coalesced += 1
+                return future
+
+        texts = [text]
+
+        def send():
+            # Once sending starts, later alerts go into a new message
+            if self._pending_alerts.get(chat_id, (None,))[0] is texts:
+                del self._pending_alerts[chat_id]
+            return bot.send_message(chat_id, ALERT_SEPARATOR.join(texts))
+
+        future = self.submit(chat_id, send)
+        self._pending_alerts[chat_id] = (texts, future)
+        return future
+
+    def stats(self) -> dict:
+        return {
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._tasks),
+        }
+
+
+outbox = Outbox()
\ No newline at end of file
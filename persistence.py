@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from telegram.ext import BasePersistence, PersistenceInput
+from config import PERSISTENCE_DB_PATH, PERSISTENCE_UPDATE_INTERVAL, PERSISTENCE_WRITE_DELAY
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS chat_data (chat_id INTEGER PRIMARY KEY, data BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS bot_data (id INTEGER PRIMARY KEY CHECK (id = 0), data BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS callback_data (id INTEGER PRIMARY KEY CHECK (id = 0), data BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS conversations (name TEXT NOT NULL, key TEXT NOT NULL, state BLOB NOT NULL, "
+    "PRIMARY KEY (name, key))",
+)
+
+
+class SQLitePersistence(BasePersistence):
+    # Stores user/chat/bot data and conversation states in SQLite, one row per user or chat.
+    # Updates are pickled immediately but written in batches by a single background task,
+    # so handlers never wait on disk I/O.
+
+    def __init__(self, path=PERSISTENCE_DB_PATH, update_interval=PERSISTENCE_UPDATE_INTERVAL,
+                 write_delay=PERSISTENCE_WRITE_DELAY, store_data: PersistenceInput = None):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.path = path
+        self.write_delay = write_delay
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = {}  # (table, key) -> pickled data, or None to delete
+        self._writer = None
+        self._flush_requested = asyncio.Event()  # ends the write delay early on shutdown
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+        return self._conn
+
+    def _load_all(self, query, params=()):
+        with self._lock:
+            return self._connect().execute(query, params).fetchall()
+
+    # Reading
+
+    async def get_user_data(self):
+        rows = await asyncio.to_thread(self._load_all, "SELECT user_id, data FROM user_data")
+        logger.info(f"Loaded persisted data for {len(rows)} users")
+        return {user_id: pickle.loads(data) for user_id, data in rows}
+
+    async def get_chat_data(self):
+        rows = await asyncio.to_thread(self._load_all, "SELECT chat_id, data FROM chat_data")
+        logger.info(f"Loaded persisted data for {len(rows)} chats")
+        return {chat_id: pickle.loads(data) for chat_id, data in rows}
+
+    async def get_bot_data(self):
+        rows = await asyncio.to_thread(self._load_all, "SELECT data FROM bot_data")
+        return pickle.loads(rows[0][0]) if rows else {}
+
+    async def get_callback_data(self):
+        rows = await asyncio.to_thread(self._load_all, "SELECT data FROM callback_data")
+        return pickle.loads(rows[0][0]) if rows else None
+
+    async def get_conversations(self, name):
+        rows = await asyncio.to_thread(self._load_all, "SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    # Writing
+
+    def _queue(self, table, key, data) -> None:
+        self._pending[(table, key)] = None if data is None else pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_soon())
+
+    async def _write_soon(self) -> None:
+        try:
+            await asyncio.wait_for(self._flush_requested.wait(), self.write_delay)
+        except asyncio.TimeoutError:
+            pass
+        await self._write_pending()
+
+    async def _write_pending(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        written = False
+        try:
+            await asyncio.to_thread(self._write_batch, pending)
+            written = True
+        except Exception as e:
+            logger.error(f"Failed to write {len(pending)} persistence updates: {str(e)}", exc_info=True)
+        finally:
+            if not written:
+                # Keep the batch (also when cancelled mid-write) so the next write retries it,
+                # unless newer data replaced it meanwhile
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+
+    def _write_batch(self, pending) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for (table, key), data in pending.items():
+                    if table == 'conversations':
+                        name, conversation_key = key
+                        if data is None:
+                            conn.execute("DELETE FROM conversations WHERE name = ? AND key = ?", (name, conversation_key))
+                        else:
+                            conn.execute("INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                                         (name, conversation_key, data))
+                        continue
+                    column = {'user_data': 'user_id', 'chat_data': 'chat_id'}.get(table, 'id')
+                    if data is None:
+                        conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (key,))
+                    else:
+                        conn.execute(f"INSERT OR REPLACE INTO {table} ({column}, data) VALUES (?, ?)", (key, data))
+        logger.debug(f"Wrote {len(pending)} persistence updates")
+
+    async def update_user_data(self, user_id, data) -> None:
+        self._queue('user_data', user_id, data)
+
+    async def update_chat_data(self, chat_id, data) -> None:
+        self._queue('chat_data', chat_id, data)
+
+    async def update_bot_data(self, data) -> None:
+        self._queue('bot_data', 0, data)
+
+    async def update_callback_data(self, data) -> None:
+        self._queue('callback_data', 0, data)
+
+    async def update_conversation(self, name, key, new_state) -> None:
+        self._queue('conversations', (name, json.dumps(list(key))), new_state)
+
+    async def drop_user_data(self, user_id) -> None:
+        self._queue('user_data', user_id, None)
+
+    async def drop_chat_data(self, chat_id) -> None:
+        self._queue('chat_data', chat_id, None)
+
+    async def refresh_user_data(self, user_id, user_data) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    async def flush(self) -> None:
+        # Let a running writer finish rather than cancel it mid-write, then write what is left
+        self._flush_requested.set()
+        if self._writer is not None:
+            await asyncio.wait([self._writer])
+        await self._write_pending()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
\ No newline at end of file
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+from config import WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN
+
+# Replays recorded Telegram updates against a running webhook, e.g. to exercise the bot locally
+# without Telegram. Each file holds one update object or a list of them.
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def load_updates(paths) -> list:
+    updates = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        updates.extend(data if isinstance(data, list) else [data])
+    return updates
+
+
+async def post_updates(url, updates, secret_token='', repeat=1, concurrency=1) -> list:
+    # Returns the latency (seconds) of every POST. Update ids are offset on repeats so PTB
+    # treats each copy as a new update.
+    headers = {SECRET_HEADER: secret_token} if secret_token else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def post(update):
+            async with semaphore:
+                started = time.monotonic()
+                response = await client.post(url, json=update, headers=headers)
+                latencies.append(time.monotonic() - started)
+                if response.status_code != 200:
+                    print(f"update {update.get('update_id')}: HTTP {response.status_code} {response.text[:200]}")
+
+        for round_number in range(repeat):
+            batch = [dict(update, update_id=update['update_id'] + round_number * 1_000_000) for update in updates]
+            if concurrency == 1:
+                for update in batch:
+                    await post(update)
+            else:
+                await asyncio.gather(*(post(update) for update in batch))
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="POST recorded Telegram updates to the bot's webhook.")
+    parser.add_argument('files', nargs='+', help="JSON files with recorded updates")
+    parser.add_argument('--url', default=f"http://127.0.0.1:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+    parser.add_argument('--secret-token', default=WEBHOOK_SECRET_TOKEN)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=1)
+    args = parser.parse_args()
+
+    updates = load_updates(args.files)
+    started = time.monotonic()
+    latencies = asyncio.run(post_updates(args.url, updates, args.secret_token, args.repeat, args.concurrency))
+    elapsed = time.monotonic() - started
+
+    if latencies:
+        print(f"Posted {len(latencies)} updates in {elapsed:.2f}s ({len(latencies) / elapsed:.1f}/s), "
+              f"median {statistics.median(latencies) * 1000:.1f}ms, max {max(latencies) * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
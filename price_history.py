@@ -0,0 +1,104 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import PRICE_HISTORY_DB_PATH, PRICE_HISTORY_RETENTION
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 6 * 3600  # seconds
+
+# Latest price per listing within [since, until), so relisted or re-scraped items count once
+LATEST_PRICES = (
+    "SELECT price_cents FROM ("
+    " SELECT listing_id, price_cents, MAX(scraped_at) FROM price_history"
+    " WHERE search_key = ? AND scraped_at >= ? AND scraped_at < ? AND price_cents IS NOT NULL"
+    " GROUP BY listing_id)"
+)
+
+
+class PriceHistoryStore:
+    # Append-only SQLite log of every scraped listing price per normalized search term,
+    # indexed by (term, time) so stats are answered with aggregate queries.
+
+    def __init__(self, path=PRICE_HISTORY_DB_PATH, retention=PRICE_HISTORY_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_purge = 0.0
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS price_history ("
+                " search_key TEXT NOT NULL,"
+                " listing_id TEXT NOT NULL,"
+                " price_cents INTEGER,"
+                " scraped_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_price_history_term_time "
+                               "ON price_history (search_key, scraped_at)")
+        return self._conn
+
+    def record(self, search_key: str, listings) -> None:
+        rows = [(search_key, listing.key, listing.price_cents, listing.scraped_at) for listing in listings]
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT INTO price_history (search_key, listing_id, price_cents, scraped_at) "
+                                 "VALUES (?, ?, ?, ?)", rows)
+                if now - self._last_purge > PURGE_INTERVAL:
+                    conn.execute("DELETE FROM price_history WHERE scraped_at < ?", (now - self.retention,))
+                    self._last_purge = now
+
+    def _percentile(self, conn, params, count, fraction):
+        # Nearest-rank percentile straight from the index-ordered prices
+        offset = min(count - 1, max(0, round(fraction * (count - 1))))
+        row = conn.execute(f"{LATEST_PRICES} ORDER BY price_cents LIMIT 1 OFFSET ?", (*params, offset)).fetchone()
+        return row[0] if row else None
+
+    def _window_stats(self, conn, search_key, since, until):
+        params = (search_key, since, until)
+        count, minimum, maximum = conn.execute(
+            f"SELECT COUNT(*), MIN(price_cents), MAX(price_cents) FROM ({LATEST_PRICES})", params).fetchone()
+        if not count:
+            return None
+        return {
+            'count': count,
+            'min': minimum,
+            'max': maximum,
+            'p25': self._percentile(conn, params, count, 0.25),
+            'median': self._percentile(conn, params, count, 0.5),
+            'p75': self._percentile(conn, params, count, 0.75),
+        }
+
+    def stats(self, search_key: str, window: float, now: float = None):
+        # Price stats (in cents) for the last `window` seconds, plus the median trend against
+        # the window before it. Returns None when nothing was recorded in the window.
+        now = time.time() if now is None else now
+        with self._lock:
+            conn = self._connect()
+            current = self._window_stats(conn, search_key, now - window, now + 1)
+            if current is None:
+                return None
+            previous = self._window_stats(conn, search_key, now - 2 * window, now - window)
+        current['trend'] = None
+        if previous and previous['median']:
+            current['trend'] = (current['median'] - previous['median']) / previous['median']
+        return current
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+price_history = PriceHistoryStore()
\ No newline at end of file
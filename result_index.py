@@ -0,0 +1,117 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+RANGE_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)?-(\d+(?:\.\d+)?)?$')
+
+SORT_ORDERS = {
+    'relevance': "Carousell order",
+    'price_asc': "price ⬆️",
+    'price_desc': "price ⬇️",
+    'newest': "newest",
+}
+
+
+def tokenize(text: str):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _newest_key(listing):
+    # Carousell listing IDs increase over time, so a higher ID means a newer listing
+    return (int(listing.id), listing.scraped_at) if listing.id.isdigit() else (-1, listing.scraped_at)
+
+
+class ResultIndex:
+    # Precomputed sort orders plus token, seller and price indexes over one result set,
+    # so sorting and filtering never rescans or re-parses the listings.
+
+    def __init__(self, listings):
+        self.size = len(listings)
+        positions = range(self.size)
+        priced = sorted((i for i in positions if listings[i].price_cents is not None),
+                        key=lambda i: listings[i].price_cents)
+        unpriced = [i for i in positions if listings[i].price_cents is None]
+        self._by_price = priced
+        self._prices = [listings[i].price_cents for i in priced]
+        self._orders = {
+            'relevance': list(positions),
+            'price_asc': priced + unpriced,
+            'price_desc': priced[::-1] + unpriced,
+            'newest': sorted(positions, key=lambda i: _newest_key(listings[i]), reverse=True),
+        }
+        self._tokens = defaultdict(set)
+        self._sellers = defaultdict(set)
+        for i, listing in enumerate(listings):
+            for token in tokenize(listing.name):
+                self._tokens[token].add(i)
+            self._sellers[listing.username.lower()].add(i)
+
+    def _price_range(self, min_cents, max_cents) -> set:
+        low = 0 if min_cents is None else bisect_left(self._prices, min_cents)
+        high = len(self._prices) if max_cents is None else bisect_right(self._prices, max_cents)
+        return set(self._by_price[low:high])
+
+    def select(self, sort='relevance', filters=None, hidden=()) -> list:
+        # Returns result positions in display order that pass `filters` and aren't hidden
+        filters = filters or {}
+        allowed = None
+
+        def narrow(matches):
+            nonlocal allowed
+            allowed = set(matches) if allowed is None else allowed & matches
+
+        if filters.get('min_cents') is not None or filters.get('max_cents') is not None:
+            narrow(self._price_range(filters.get('min_cents'), filters.get('max_cents')))
+        for token in filters.get('include', ()):
+            narrow(self._tokens.get(token, set()))
+        if filters.get('seller'):
+            narrow(self._sellers.get(filters['seller'], set()))
+
+        excluded = set(hidden)
+        for token in filters.get('exclude', ()):
+            excluded |= self._tokens.get(token, set())
+
+        return [i for i in self._orders.get(sort, self._orders['relevance'])
+                if (allowed is None or i in allowed) and i not in excluded]
+
+
+def parse_result_filters(text: str) -> dict:
+    # "100-500 iphone -case @seller" -> price range S$100-500, must mention iphone,
+    # must not mention case, sold by seller. Plain words and +words are both includes.
+    filters = {'include': [], 'exclude': []}
+    for part in text.split():
+        value = part[2:] if part.upper().startswith('S$') else part.lstrip('$')
+        range_match = RANGE_PATTERN.match(value)
+        if range_match and (range_match.group(1) or range_match.group(2)):
+            low, high = range_match.groups()
+            filters['min_cents'] = None if low is None else round(float(low) * 100)
+            filters['max_cents'] = None if high is None else round(float(high) * 100)
+        elif part.startswith('<') and part[1:].replace('.', '', 1).isdigit():
+            filters['max_cents'] = round(float(part[1:]) * 100)
+        elif part.startswith('>') and part[1:].replace('.', '', 1).isdigit():
+            filters['min_cents'] = round(float(part[1:]) * 100)
+        elif part.startswith('@') and len(part) > 1:
+            filters['seller'] = part[1:].lower()
+        elif part.startswith('-') and len(part) > 1:
+            filters['exclude'].extend(tokenize(part[1:]))
+        else:
+            filters['include'].extend(tokenize(part.lstrip('+')))
+    return filters
+
+
+def describe_filters(filters: dict) -> str:
+    parts = []
+    if filters.get('min_cents') is not None or filters.get('max_cents') is not None:
+        low = filters.get('min_cents')
+        high = filters.get('max_cents')
+        low_text = f"S${low / 100:,.2f}" if low is not None else "any"
+        high_text = f"S${high / 100:,.2f}" if high is not None else "any"
+        parts.append(f"price {low_text} - {high_text}")
+    if filters.get('include'):
+        parts.append("with " + ", ".join(filters['include']))
+    if filters.get('exclude'):
+        parts.append("without " + ", ".join(filters['exclude']))
+    if filters.get('seller'):
+        parts.append(f"seller @{filters['seller']}")
+    return "; ".join(parts)
\ No newline at end of file
@@ -0,0 +1,207 @@
+import logging
+import sys
+import time
+import weakref
+from collections import OrderedDict
+from result_index import ResultIndex
+from config import RESULT_SESSION_TTL, RESULT_SESSION_MEMORY_BUDGET, RESULT_SESSION_MAX
+
+logger = logging.getLogger(__name__)
+
+LIST_SLOT_BYTES = 8  # one pointer per list entry
+
+
+def estimate_listing_size(listing) -> int:
+    size = sys.getsizeof(listing)
+    for value in (listing.id, listing.name, listing.price, listing.username, listing.url):
+        size += sys.getsizeof(value)
+    if listing.extra:
+        size += sys.getsizeof(listing.extra) + sum(sys.getsizeof(value) for value in listing.extra.values())
+    return size
+
+
+class ListingStore:
+    # Deduplicates listings across result lists: every list interned here points at one shared
+    # Listing object per (key, price, name). Entries are weak, so a listing disappears once no
+    # result list, cache entry or session refers to it any more. It also accounts the memory of
+    # listings held by result sessions, counting each listing once however many lists hold it.
+
+    def __init__(self):
+        self._listings = weakref.WeakValueDictionary()
+        self._refs = {}  # listing key -> [result lists holding it, estimated bytes]
+        self.memory = 0
+        self.shared = 0
+
+    def intern(self, results) -> list:
+        # Replaces items in `results` in place with their canonical objects and returns the list
+        for i, item in enumerate(results):
+            canonical = self._listings.get(item.key)
+            if canonical is item:
+                continue
+            if canonical is not None and canonical.price_cents == item.price_cents and canonical.name == item.name:
+                results[i] = canonical
+                self.shared += 1
+            else:
+                self._listings[item.key] = item
+        return results
+
+    def retain(self, items) -> None:
+        # Keyed rather than by object, as intern() may swap a streamed list's items for their
+        # canonical (same key) objects after the list was retained
+        for item in items:
+            ref = self._refs.get(item.key)
+            if ref is None:
+                size = estimate_listing_size(item)
+                self._refs[item.key] = [1, size]
+                self.memory += size
+            else:
+                ref[0] += 1
+
+    def release(self, items) -> None:
+        for item in items:
+            ref = self._refs.get(item.key)
+            if ref is None:
+                continue
+            ref[0] -= 1
+            if not ref[0]:
+                del self._refs[item.key]
+                self.memory -= ref[1]
+
+    def __len__(self):
+        return len(self._listings)
+
+
+class _Session:
+    __slots__ = ('search_term', 'results', 'expires_at')
+
+    def __init__(self, search_term, results, expires_at):
+        self.search_term = search_term
+        self.results = results
+        self.expires_at = expires_at
+
+
+class ResultSessionStore:
+    # Result lists users are currently browsing, bounded by a global memory budget, a session
+    # count and a per-user TTL (refreshed on every access), with least recently used sessions
+    # evicted first. Users whose session is gone get their results re-fetched on demand; only
+    # small view state (term, page, filters) lives in user_data. A list shared by several
+    # sessions (a cached result set) costs its slots once; listings are accounted in `listings`.
+
+    def __init__(self, ttl=RESULT_SESSION_TTL, memory_budget=RESULT_SESSION_MEMORY_BUDGET, max_sessions=RESULT_SESSION_MAX,
+                 listings=None):
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.max_sessions = max_sessions
+        self.listings = listing_store if listings is None else listings
+        self._sessions = OrderedDict()  # user_id -> _Session, least recently used first
+        self._lists = {}  # id(results) -> [results, sessions using it, length accounted, ResultIndex or None]
+        self._slot_memory = 0
+        self.evicted = 0
+        self.expired = 0
+
+    @property
+    def memory(self) -> int:
+        return self._slot_memory + self.listings.memory
+
+    def _retain(self, results) -> None:
+        entry = self._lists.get(id(results))
+        if entry is None:
+            self._lists[id(results)] = [results, 1, len(results), None]
+            self._slot_memory += len(results) * LIST_SLOT_BYTES
+            self.listings.retain(results)
+        else:
+            entry[1] += 1
+
+    def _release(self, results) -> None:
+        entry = self._lists.get(id(results))
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._lists[id(results)]
+            self._slot_memory -= entry[2] * LIST_SLOT_BYTES
+            self.listings.release(results[:entry[2]])
+
+    def _refresh_estimate(self, results) -> None:
+        # Streamed lists keep growing after the session is created
+        entry = self._lists.get(id(results))
+        if entry is not None and entry[2] != len(results):
+            grown = results[entry[2]:]
+            entry[2] = len(results)
+            self._slot_memory += len(grown) * LIST_SLOT_BYTES
+            self.listings.retain(grown)
+
+    def index_for(self, results) -> ResultIndex:
+        # The index lives on the list's entry, so it goes with the list's last session. It is
+        # rebuilt when a streamed list has grown; a list no session holds gets a throwaway one.
+        entry = self._lists.get(id(results))
+        if entry is None:
+            return ResultIndex(results)
+        if entry[3] is None or entry[3].size != len(results):
+            entry[3] = ResultIndex(results)
+        return entry[3]
+
+    def _drop(self, user_id) -> None:
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            self._release(session.results)
+
+    def _evict(self, now) -> None:
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.expires_at <= now:
+                self.expired += 1
+            elif self.memory > self.memory_budget or len(self._sessions) > self.max_sessions:
+                self.evicted += 1
+            else:
+                break
+            self._drop(user_id)
+
+    def put(self, user_id, search_term, results) -> None:
+        now = time.monotonic()
+        self._drop(user_id)
+        self._sessions[user_id] = _Session(search_term, results, now + self.ttl)
+        self._retain(results)
+        self._evict(now)
+
+    def get(self, user_id):
+        # Returns the user's results (refreshing the TTL), or None when expired or evicted
+        now = time.monotonic()
+        session = self._sessions.get(user_id)
+        if session is None:
+            return None
+        if session.expires_at <= now:
+            self.expired += 1
+            self._drop(user_id)
+            return None
+        session.expires_at = now + self.ttl
+        self._sessions.move_to_end(user_id)
+        self._refresh_estimate(session.results)
+        self._evict(now)
+        return session.results if user_id in self._sessions else None
+
+    def peek(self, user_id):
+        session = self._sessions.get(user_id)
+        return None if session is None else session.results
+
+    def drop(self, user_id) -> None:
+        self._drop(user_id)
+
+    def sweep(self) -> None:
+        self._evict(time.monotonic())
+
+    def stats(self) -> dict:
+        return {
+            'sessions': len(self._sessions),
+            'result_lists': len(self._lists),
+            'memory_bytes': self.memory,
+            'memory_budget': self.memory_budget,
+            'evicted': self.evicted,
+            'expired': self.expired,
+            'shared_listings': len(listing_store),
+            'deduplicated': listing_store.shared,
+        }
+
+
+listing_store = ListingStore()
+result_sessions = ResultSessionStore()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any
+from scraper import scrape_carousell_async
+from job_queue import remote_scraper
+from scrape_policy import scrape_breaker, ScrapeFailure, ERROR
+from config import SCRAPE_MAX_CONCURRENCY, SCRAPE_BACKEND
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    round: int  # how many scrapes the same user already had queued, for fairness
+    seq: int
+    search_term: str = field(compare=False)
+    user_id: Any = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    scrape_options: dict = field(compare=False)
+
+
+class ScrapeDispatcher:
+    # Global scrape queue with a concurrency limit. Interactive searches are served before
+    # background ones, and within a priority each user's Nth queued scrape waits behind
+    # every other user's (N-1)th so one user can't monopolize the scrapers.
+
+    def __init__(self, scrape=None, max_concurrency=SCRAPE_MAX_CONCURRENCY, breaker=scrape_breaker):
+        if scrape is None:
+            scrape = remote_scraper.scrape if SCRAPE_BACKEND == 'queue' else scrape_carousell_async
+        self._scrape = scrape
+        self.breaker = breaker  # sees the outcome of every scrape, whichever backend ran it
+        self.max_concurrency = max_concurrency
+        self._queue = []
+        self._seq = itertools.count()
+        self._queued_per_user = Counter()
+        self._running = 0
+        self._tasks = set()
+        self._wait_times = deque(maxlen=1000)
+        self.completed = 0
+        self.failed = 0
+
+    def position(self, ticket: _Ticket) -> int:
+        return 1 + sum(1 for other in self._queue if other < ticket)
+
+    async def submit(self, search_term, priority=BACKGROUND, user_id=None, on_queued=None, **scrape_options):
+        ticket = _Ticket(priority, self._queued_per_user[user_id], next(self._seq), search_term, user_id,
+                         asyncio.get_running_loop().create_future(), time.monotonic(), scrape_options)
+        self._queue.append(ticket)
+        self._queued_per_user[user_id] += 1
+        self._dispatch()
+
+        if ticket in self._queue:
+            position = self.position(ticket)
+            logger.info(f"Scrape for '{search_term}' queued at position {position} ({self._running} running)")
+            if on_queued is not None:
+                try:
+                    await on_queued(position)
+                except Exception as e:
+                    logger.warning(f"Queue position callback failed: {str(e)}")
+
+        try:
+            return await ticket.future
+        except asyncio.CancelledError:
+            if ticket in self._queue:
+                self._remove(ticket)
+            raise
+
+    def _remove(self, ticket: _Ticket) -> None:
+        self._queue.remove(ticket)
+        self._queued_per_user[ticket.user_id] -= 1
+        if not self._queued_per_user[ticket.user_id]:
+            del self._queued_per_user[ticket.user_id]
+
+    def _dispatch(self) -> None:
+        while self._running < self.max_concurrency and self._queue:
+            ticket = min(self._queue)
+            self._remove(ticket)
+            if ticket.future.done():
+                continue
+            self._running += 1
+            task = asyncio.create_task(self._run(ticket))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, ticket: _Ticket) -> None:
+        wait = time.monotonic() - ticket.enqueued_at
+        self._wait_times.append(wait)
+        logger.info(f"Starting scrape for '{ticket.search_term}' after waiting {wait:.2f}s in queue")
+        try:
+            result = await self._scrape(ticket.search_term, **ticket.scrape_options)
+            self.breaker.record_success()
+            self.completed += 1
+            if not ticket.future.done():
+                ticket.future.set_result(result)
+        except asyncio.CancelledError:
+            ticket.future.cancel()
+            raise
+        except Exception as e:
+            self.failed += 1
+            self.breaker.record_failure(e.kind if isinstance(e, ScrapeFailure) else ERROR)
+            if not ticket.future.done():
+                ticket.future.set_exception(e)
+        finally:
+            self._running -= 1
+            self._dispatch()
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_times)
+        return {
+            'queued': len(self._queue),
+            'running': self._running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'wait_mean_s': sum(waits) / len(waits) if waits else 0.0,
+            'wait_p95_s': waits[int(len(waits) * 0.95)] if waits else 0.0,
+            'wait_max_s': waits[-1] if waits else 0.0,
+        }
+
+
+scrape_dispatcher = ScrapeDispatcher()
\ No newline at end of file
@@ -0,0 +1,158 @@
+import logging
+import random
+import time
+from metrics import CIRCUIT_STATE, CIRCUIT_TRIPS
+from config import (
+    SCRAPE_MAX_ATTEMPTS, SCRAPE_RETRY_BASE_DELAY, SCRAPE_RETRY_MAX_DELAY, SCRAPE_CIRCUIT_FAILURE_THRESHOLD,
+    SCRAPE_CIRCUIT_RESET_TIMEOUT, SCRAPE_CIRCUIT_MAX_RESET_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Failure kinds
+TIMEOUT = 'timeout'
+BLOCKED = 'blocked'  # captcha, bot challenge or a 403/429 from Carousell
+PARSE = 'parse'  # the page loaded but no listings could be read from it
+ERROR = 'error'  # anything else: network errors, browser crashes, queue failures
+
+BLOCK_STATUSES = (403, 429, 503)
+BLOCK_MARKERS = ('captcha', 'cf-challenge', 'challenge-platform', 'are you a robot', 'unusual traffic',
+                 'access denied', 'just a moment...')
+
+# Circuit states
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+PROBE_WAIT = 30  # seconds other scheduled scrapes wait while a half-open probe runs
+
+
+class ScrapeFailure(Exception):
+    # A scrape that failed in a way the breaker should count; `kind` is one of the kinds above
+
+    def __init__(self, message, kind=ERROR):
+        super().__init__(message)
+        self.kind = kind
+
+
+def looks_blocked(html: str) -> bool:
+    # Only meaningful for pages that had no listings; normal pages may mention captcha in scripts
+    text = html[:200_000].lower()
+    return any(marker in text for marker in BLOCK_MARKERS)
+
+
+class RetryPolicy:
+    # Exponential backoff with full jitter: retry n waits uniform(0, min(max_delay, base_delay * 2^n)),
+    # so concurrent scrapes failing together don't retry together. Blocks and parse failures are
+    # not retried: a retry won't parse any better, and hammering a block makes it last longer.
+    RETRYABLE = frozenset((TIMEOUT, ERROR))
+
+    def __init__(self, max_attempts=SCRAPE_MAX_ATTEMPTS, base_delay=SCRAPE_RETRY_BASE_DELAY,
+                 max_delay=SCRAPE_RETRY_MAX_DELAY):
+        if max_attempts < 1:
+            # Every scrape makes at least one attempt; SCRAPE_MAX_ATTEMPTS=1 disables retries
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts} (SCRAPE_MAX_ATTEMPTS)")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, kind: str, attempt: int, max_attempts=None) -> bool:
+        # `attempt` counts from 0 for the attempt that just failed
+        max_attempts = self.max_attempts if max_attempts is None else max_attempts
+        return kind in self.RETRYABLE and attempt + 1 < max_attempts
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    # Counts consecutive failed scrapes. After `failure_threshold` of them, or a single block,
+    # the circuit opens and scheduled scrapes pause for `reset_timeout`, doubled for every trip
+    # in a row up to `max_reset_timeout`. Afterwards it is half-open: one scheduled scrape at a
+    # time is let through as a probe, and its outcome closes the circuit or opens it again.
+    # Interactive searches are never refused, but get a single attempt while the circuit is open.
+
+    def __init__(self, failure_threshold=SCRAPE_CIRCUIT_FAILURE_THRESHOLD, reset_timeout=SCRAPE_CIRCUIT_RESET_TIMEOUT,
+                 max_reset_timeout=SCRAPE_CIRCUIT_MAX_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0  # consecutive failed scrapes
+        self.trips = 0  # consecutive trips without a successful scrape in between
+        self.total_trips = 0
+        self.opened_until = 0.0
+        self.last_failure_kind = None
+        self._probe_started = None
+        CIRCUIT_STATE.set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state, reason='') -> None:
+        if state == self.state:
+            return
+        log = logger.info if state == CLOSED else logger.warning
+        log(f"Scrape circuit {self.state} -> {state}{reason}")
+        self.state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state])
+
+    def _refresh(self) -> None:
+        if self.state == OPEN and time.monotonic() >= self.opened_until:
+            self._set_state(HALF_OPEN, "; the next scheduled scrape is a probe")
+
+    @property
+    def is_open(self) -> bool:
+        self._refresh()
+        return self.state == OPEN
+
+    def allow(self) -> bool:
+        # Whether a scheduled (background) scrape may run now
+        self._refresh()
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN:
+            # A probe that never reported back (e.g. served from the search cache) expires
+            now = time.monotonic()
+            if self._probe_started is None or now - self._probe_started > self.reset_timeout:
+                self._probe_started = now
+                return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(self.opened_until - time.monotonic(), PROBE_WAIT if self.state != CLOSED else 0.0)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.trips = 0
+        self._probe_started = None
+        self._set_state(CLOSED, " after a successful scrape")
+
+    def record_failure(self, kind: str) -> None:
+        self.failures += 1
+        self.last_failure_kind = kind
+        self._probe_started = None
+        self._refresh()
+        if self.state == OPEN:
+            return
+        if self.state == HALF_OPEN or kind == BLOCKED or self.failures >= self.failure_threshold:
+            self._open(kind)
+
+    def _open(self, kind: str) -> None:
+        timeout = min(self.reset_timeout * 2 ** self.trips, self.max_reset_timeout)
+        self.trips += 1
+        self.total_trips += 1
+        self.failures = 0
+        self.opened_until = time.monotonic() + timeout
+        CIRCUIT_TRIPS.inc(kind=kind)
+        self._set_state(OPEN, f" after a {kind} failure; pausing scheduled scrapes for {timeout:.0f}s")
+
+    def stats(self) -> dict:
+        self._refresh()
+        return {
+            'state': STATE_VALUES[self.state],
+            'consecutive_failures': self.failures,
+            'trips': self.total_trips,
+            'open_for_s': max(self.opened_until - time.monotonic(), 0.0) if self.state == OPEN else 0.0,
+        }
+
+
+retry_policy = RetryPolicy()
+scrape_breaker = CircuitBreaker()
\ No newline at end of file
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from job_queue import RespConnection, JobQueueError, jobs_key, encode, decode, POLL_TIMEOUT
+from scrape_policy import ScrapeFailure, ERROR, scrape_breaker
+from scraper import scrape_carousell_async, ResultStream
+from browser_pool import browser_pool
+from http_scraper import close_client
+from metrics import MetricsServer, registry
+from config import SCRAPE_QUEUE_URL, SCRAPE_QUEUE_PREFIX, SCRAPE_WORKER_CONCURRENCY, SCRAPER_ENGINE
+
+logger = logging.getLogger(__name__)
+
+REPLY_TTL = 600  # seconds a bot's reply list survives if the bot goes away
+
+
+class ScrapeWorker:
+    # Pulls scrape jobs off the queue, runs scrape_carousell_async for each and streams the
+    # listings back to the bot that asked, batch by batch.
+
+    def __init__(self, url=SCRAPE_QUEUE_URL, prefix=SCRAPE_QUEUE_PREFIX, concurrency=SCRAPE_WORKER_CONCURRENCY):
+        self.url = url
+        self.prefix = prefix
+        self.concurrency = concurrency
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._jobs = RespConnection(url)
+        self._replies = RespConnection(url)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+        self._stopping = asyncio.Event()
+        self.completed = 0
+        self.failed = 0
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info(f"Scrape worker {self.name} pulling jobs from {self.url} ({self.concurrency} at a time)")
+        try:
+            while not self._stopping.is_set():
+                await self._slots.acquire()
+                try:
+                    reply = await self._jobs.execute('BRPOP', jobs_key(self.prefix), POLL_TIMEOUT)
+                except JobQueueError as e:
+                    self._slots.release()
+                    logger.warning(f"Could not read scrape jobs: {str(e)}")
+                    await asyncio.sleep(POLL_TIMEOUT)
+                    continue
+                if reply is None:
+                    self._slots.release()
+                    continue
+                task = asyncio.create_task(self._run_job(reply[1]))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._jobs.close()
+            await self._replies.close()
+
+    async def _reply(self, reply_to, message) -> None:
+        await self._replies.execute('LPUSH', reply_to, encode(message))
+        await self._replies.execute('EXPIRE', reply_to, REPLY_TTL)
+
+    async def _run_job(self, payload) -> None:
+        try:
+            job = decode(payload)
+        except ValueError as e:
+            logger.error(f"Dropping malformed scrape job: {str(e)}")
+            self._slots.release()
+            return
+
+        job_id, reply_to = job['job'], job['reply_to']
+        started = time.monotonic()
+        stream = ResultStream()
+        scrape = None
+        try:
+            await self._reply(reply_to, {'job': job_id, 'type': 'started', 'worker': self.name})
+            scrape = asyncio.create_task(scrape_carousell_async(job['search_term'], job.get('engine', SCRAPER_ENGINE),
+                                                                stream=stream, export=False))
+            scrape.add_done_callback(lambda task: self._scrape_done(task, stream))
+            async for batch in stream.batches():
+                await self._reply(reply_to, {'job': job_id, 'type': 'batch', 'items': [item.to_dict() for item in batch]})
+            await self._reply(reply_to, {'job': job_id, 'type': 'done'})
+            self.completed += 1
+            logger.info(f"Job {job_id} for '{job['search_term']}' done: {len(stream.items)} listings "
+                        f"in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Scrape job {job_id} failed: {str(e)}", exc_info=True)
+            try:
+                await self._reply(reply_to, {'job': job_id, 'type': 'error', 'error': str(e),
+                                             'kind': e.kind if isinstance(e, ScrapeFailure) else ERROR})
+            except JobQueueError as reply_error:
+                logger.error(f"Could not report failure of job {job_id}: {str(reply_error)}")
+        finally:
+            # Don't leave the scrape running when its listings can no longer be sent
+            if scrape is not None and not scrape.done():
+                scrape.cancel()
+                await asyncio.gather(scrape, return_exceptions=True)
+            self._slots.release()
+
+    @staticmethod
+    def _scrape_done(task, stream) -> None:
+        # This process's breaker decides whether scrape_carousell_async retries, so it sees every
+        # scrape the worker runs, as the dispatcher's does in the bot. Queue errors aren't counted.
+        if task.cancelled():
+            stream.finish()
+            return
+        error = task.exception()
+        stream.finish(error=error)
+        if error is None:
+            scrape_breaker.record_success()
+        else:
+            scrape_breaker.record_failure(error.kind if isinstance(error, ScrapeFailure) else ERROR)
+
+    def stats(self) -> dict:
+        return {'completed': self.completed, 'failed': self.failed, 'running': len(self._tasks)}
+
+
+async def run_worker(url=SCRAPE_QUEUE_URL, concurrency=SCRAPE_WORKER_CONCURRENCY, engine=SCRAPER_ENGINE,
+                     metrics_port=0) -> None:
+    worker = ScrapeWorker(url, concurrency=concurrency)
+    metrics_server = None
+    if metrics_port:
+        registry.register_collector('scrape_worker', worker.stats)
+        metrics_server = MetricsServer(port=metrics_port)
+        metrics_server.start()
+    if engine != 'http':
+        await browser_pool.start()
+    try:
+        await worker.run()
+    finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+        await browser_pool.stop()
+        await close_client()
+
+
+def worker_process(url, concurrency, engine) -> None:
+    # Entry point for worker processes spawned by the bot
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO,
+                        filename='scrape_worker.log', filemode='a')
+    try:
+        asyncio.run(run_worker(url, concurrency, engine))
+    except KeyboardInterrupt:
+        pass
+
+
+class LocalWorkers:
+    # Worker processes started and stopped together with the bot (SCRAPE_LOCAL_WORKERS)
+
+    def __init__(self):
+        self._processes = []
+
+    def start(self, count, url=SCRAPE_QUEUE_URL, concurrency=SCRAPE_WORKER_CONCURRENCY, engine=SCRAPER_ENGINE) -> None:
+        # 'spawn' gives each worker a clean interpreter instead of a fork of the bot's event loop
+        context = multiprocessing.get_context('spawn')
+        for i in range(count):
+            process = context.Process(target=worker_process, args=(url, concurrency, engine),
+                                      name=f"scrape-worker-{i + 1}", daemon=True)
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Started {count} local scrape worker process(es)")
+
+    def stop(self, timeout=10) -> None:
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        self._processes.clear()
+
+
+local_workers = LocalWorkers()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a scrape worker that pulls jobs from the scrape queue.")
+    parser.add_argument('--queue', default=SCRAPE_QUEUE_URL, help="redis://host:port/db of Redis or job_broker.py")
+    parser.add_argument('--concurrency', type=int, default=SCRAPE_WORKER_CONCURRENCY)
+    parser.add_argument('--engine', default=SCRAPER_ENGINE, choices=['auto', 'http', 'browser'],
+                        help="the browser is launched up front unless this is 'http'; jobs carry their own engine")
+    parser.add_argument('--metrics-port', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(run_worker(args.queue, args.concurrency, args.engine, args.metrics_port))
+    except KeyboardInterrupt:
+        pass
\ No newline at end of file
@@ -1,144 +1,269 @@
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import asyncio
-from bs4 import BeautifulSoup
 import logging
-import csv
-import os
-from datetime import datetime
+import time
+from browser_pool import browser_pool
+from http_scraper import scrape_with_http, HttpScrapeError
+from listing_parser import parse_listings
+from exports import export_results
+from metrics import SCRAPE_STAGE_SECONDS, SCRAPES, SCRAPE_RETRIES, SCRAPE_FAILURES, LISTINGS_PER_SCRAPE
+from scrape_policy import ScrapeFailure, retry_policy, scrape_breaker, looks_blocked, TIMEOUT, BLOCKED, PARSE, ERROR
+from debug_capture import debug_capture
+from config import SCRAPE_TARGET_RESULTS, SCRAPE_DEADLINE, SCRAPE_SCROLL_SETTLE, SCRAPER_ENGINE, CAROUSELL_BASE_URL
 
 logger = logging.getLogger(__name__)
 
-MAX_RETRIES = 3
-RETRY_DELAY = 5
+LISTING_CARD_SELECTOR = 'div[data-testid^="listing-card-"]'
+SHOW_MORE_SELECTOR = 'button:has-text("Show more results")'
+NEW_CARDS_SCRIPT = "([selector, start]) => Array.from(document.querySelectorAll(selector)).slice(start).map(card => card.outerHTML)"
+MIN_WAIT = 0.05  # seconds; Playwright treats a timeout of 0 as no timeout at all
 
-async def save_debug_info(page, prefix):
-    # Save HTML
-    with open(f'{prefix}_debug.html', 'w', encoding='utf-8') as f:
-        f.write(await page.content())
-    logger.info(f"Saved {prefix}_debug.html")
+async def count_listing_cards(page) -> int:
+    return await page.locator(LISTING_CARD_SELECTOR).count()
 
-    # Save screenshot
-    await page.screenshot(path=f'{prefix}_debug.png')
-    logger.info(f"Saved {prefix}_debug.png")
+async def wait_for_more_cards(page, previous_count, timeout) -> bool:
+    if timeout <= 0:
+        return False
+    try:
+        await page.wait_for_function(
+            "([selector, count]) => document.querySelectorAll(selector).length > count",
+            arg=[LISTING_CARD_SELECTOR, previous_count],
+            timeout=max(timeout, MIN_WAIT) * 1000
+        )
+        return True
+    except PlaywrightTimeoutError:
+        return False
 
-async def scrape_carousell_async(search_term):
+async def load_listings(page, url, target_results=SCRAPE_TARGET_RESULTS, deadline=SCRAPE_DEADLINE, timings=None):
+    # Waits for listing cards to render, then scrolls only while new cards keep appearing,
+    # stopping at the target count or the deadline. Yields the card count every time it grows
+    # and records per-phase timings (seconds) in `timings`.
+    timings = {} if timings is None else timings
+    started = time.monotonic()
+    deadline_at = started + deadline
+
+    await page.goto(url, wait_until='domcontentloaded', timeout=deadline * 1000)
+    timings['goto'] = time.monotonic() - started
+    logger.info("Page loaded.")
+
+    phase_started = time.monotonic()
+    remaining = deadline_at - time.monotonic()
+    try:
+        if remaining <= 0:
+            raise PlaywrightTimeoutError("Deadline used up by page load")
+        await page.wait_for_selector(LISTING_CARD_SELECTOR, timeout=max(remaining, MIN_WAIT) * 1000)
+    except PlaywrightTimeoutError:
+        timings['wait'] = time.monotonic() - phase_started
+        logger.warning(f"No listing cards appeared within {deadline} seconds.")
+        return
+    timings['wait'] = time.monotonic() - phase_started
+
+    phase_started = time.monotonic()
+    count = await count_listing_cards(page)
+    yield count
+    scrolls = 0
+    while count < target_results and time.monotonic() < deadline_at:
+        await page.evaluate("window.scrollBy(0, window.innerHeight)")
+        scrolls += 1
+        settle = min(SCRAPE_SCROLL_SETTLE, deadline_at - time.monotonic())
+        if not await wait_for_more_cards(page, count, settle):
+            remaining = deadline_at - time.monotonic()
+            show_more_button = await page.query_selector(SHOW_MORE_SELECTOR) if remaining > 0 else None
+            if not show_more_button:
+                break
+            try:
+                await show_more_button.click(timeout=max(remaining, MIN_WAIT) * 1000)
+            except PlaywrightTimeoutError:
+                break
+            logger.info("Clicked 'Show more results' button")
+            if not await wait_for_more_cards(page, count, min(SCRAPE_SCROLL_SETTLE * 2, deadline_at - time.monotonic())):
+                break
+        count = await count_listing_cards(page)
+        yield count
+    timings['scroll'] = time.monotonic() - phase_started
+
+    logger.info(f"Loaded {count} listing cards after {scrolls} scrolls "
+                f"(goto {timings['goto']:.2f}s, wait {timings['wait']:.2f}s, scroll {timings['scroll']:.2f}s)")
+
+async def read_new_cards(page, start):
+    # Parses only the cards rendered since the last read; returns (listings, new card offset)
+    cards = await page.evaluate(NEW_CARDS_SCRIPT, [LISTING_CARD_SELECTOR, start])
+    if not cards:
+        return [], start
+    with SCRAPE_STAGE_SECONDS.time(stage='parse'):
+        listings = parse_listings('<div>' + ''.join(cards) + '</div>')
+    return listings, start + len(cards)
+
+class ResultStream:
+    # Listings from one scrape as they arrive, shared by everyone waiting on that scrape.
+    # Items are deduplicated, so batches re-sent by a retried attempt are dropped.
+
+    def __init__(self, items=None, export=None, done=False):
+        self.items = []
+        self.export = export  # exports.Export of the finished results
+        self.done = False
+        self.error = None
+        self._keys = set()
+        self._changed = asyncio.Event()
+        if items:
+            self.extend(items)
+        if done:
+            self.finish(export=export)
+
+    @classmethod
+    def finished(cls, items, export=None) -> 'ResultStream':
+        # A complete stream over an existing list (a cached result set), shared rather than copied
+        stream = cls(export=export)
+        stream.items = items
+        stream.done = True
+        return stream
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def extend(self, batch) -> list:
+        added = []
+        for item in batch:
+            key = item.key
+            if key not in self._keys:
+                self._keys.add(key)
+                added.append(item)
+        if added:
+            self.items.extend(added)
+            self._notify()
+        return added
+
+    def finish(self, results=None, export=None, error=None) -> None:
+        if results and not self.items:
+            self.extend(results)
+        self.export = export
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def wait_for(self, count) -> None:
+        while len(self.items) < count and not self.done:
+            await self._changed.wait()
+
+    async def batches(self):
+        offset = 0
+        while True:
+            if offset < len(self.items):
+                batch = self.items[offset:]
+                offset += len(batch)
+                yield batch
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+    async def result(self):
+        await self.wait_for(float('inf'))
+        if self.error is not None:
+            raise self.error
+        return self.items, self.export
+
+async def stream_carousell_async(search_term, engine=SCRAPER_ENGINE):
+    # Async generator yielding batches of listings as soon as they are scraped
     logger.info(f"Searching for '{search_term}' on Carousell...")
 
-    for attempt in range(MAX_RETRIES):
+    if engine in ('auto', 'http'):
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=False)
-                context = await browser.new_context()
-                page = await context.new_page()
+            results = await scrape_with_http(search_term)
+        except HttpScrapeError as e:
+            SCRAPES.inc(engine='http', outcome='failure')
+            SCRAPE_FAILURES.inc(engine='http', kind=e.kind)
+            if engine == 'http':
+                logger.error(f"HTTP scrape failed ({e.kind}): {str(e)}")
+                raise
+            logger.warning(f"HTTP fast path failed ({e.kind}: {str(e)}), falling back to the browser.")
+        else:
+            SCRAPES.inc(engine='http', outcome='success')
+            yield results
+            return
 
-                try:
-                    url = f"https://www.carousell.sg/search/{search_term}"
-                    await page.goto(url)
-                    logger.info("Page loaded.")
-
-                    await asyncio.sleep(15)
-                    logger.info("Waited for 15 seconds.")
-
-                    async def scroll_and_load_more():
-                        for i in range(5):
-                            await page.evaluate("window.scrollBy(0, window.innerHeight)")
-                            await asyncio.sleep(2)
-                            logger.info(f"Scrolled down {i + 1} times.")
-
-                        show_more_button = await page.query_selector('button:has-text("Show more results")')
-                        if show_more_button:
-                            await show_more_button.click()
-                            logger.info("Clicked 'Show more results' button")
-                            await asyncio.sleep(5)
-                        else:
-                            logger.info("'Show more results' button not found")
-
-                    await scroll_and_load_more()
-
-                    # Use BeautifulSoup for more flexible parsing
-                    content = await page.content()
-                    soup = BeautifulSoup(content, 'html.parser')
-                    listing_cards = soup.find_all('div', {'data-testid': lambda x: x and x.startswith('listing-card-')})
-
-                    logger.info(f"Number of listing cards found: {len(listing_cards)}")
-
-                    if not listing_cards:
-                        logger.warning("Could not find any listing elements. Saving debug info.")
-                        await save_debug_info(page, 'no_listings')
-                        return [], None
-
-                    results = []
-                    for i, card in enumerate(listing_cards):
-                        try:
-                            price = (card.select_one('p[class*="D_lf"][class*="D_lg"][class*="D_lk"][class*="D_lm"][class*="D_lq"][class*="D_lt"][class*="D_l_"]') or
-                                     card.select_one('p[class*="price"]') or
-                                     card.select_one('p:contains("S$")'))
-
-                            name = (card.select_one('p[class*="D_lf"][class*="D_lg"][class*="D_lk"][class*="D_ln"][class*="D_lq"][class*="D_ls"][class*="D_lo"][class*="D_lA"]') or
-                                    card.select_one('p[class*="title"]') or
-                                    card.select_one('p:not(:contains("S$"))'))
-
-                            username = card.select_one('p[data-testid="listing-card-text-seller-name"]') or card.select_one('p:contains("@")')
-
-                            logger.info(f"Card {i + 1}: Price: {bool(price)}, Name: {bool(name)}, Username: {bool(username)}")
-
-                            if price and name and username:
-                                item = {
-                                    'price': price.text.strip(),
-                                    'name': name.get('title') or name.text.strip(),
-                                    'username': username.text.strip()
-                                }
-                                results.append(item)
-                                logger.info(f"Added listing: {item['name']} - {item['price']}")
-                            else:
-                                logger.warning(f"Incomplete data: Price: {bool(price)}, Name: {bool(name)}, Username: {bool(username)}")
-                        except Exception as e:
-                            logger.error(f"Error processing card {i + 1}: {str(e)}")
-
-                    logger.info(f"Total results: {len(results)}")
-
-                    # Save results to CSV
-                    if results:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"carousell_results_{search_term.replace(' ', '_')}_{timestamp}.csv"
-                        filepath = os.path.join('search_results', filename)
-                        os.makedirs('search_results', exist_ok=True)
-
-                        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                            fieldnames = ['name', 'price', 'username']
-                            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                            writer.writeheader()
-                            for item in results:
-                                writer.writerow(item)
-
-                        logger.info(f"Results saved to {filepath}")
-                        return results, filepath
-                    else:
-                        logger.info("No results found")
-                        return [], None
+    async for batch in stream_with_browser(search_term):
+        yield batch
 
-                except PlaywrightTimeoutError:
-                    logger.warning(f"Timeout occurred on attempt {attempt + 1}. Retrying...")
-                    await asyncio.sleep(RETRY_DELAY)
-                    continue
+async def scrape_carousell_async(search_term, engine=SCRAPER_ENGINE, stream=None, export=True):
+    # Collects the whole scrape and returns it with an in-memory export (unless export is
+    # False). Batches are also pushed to `stream` as they arrive, when one is given.
+    stream = stream if stream is not None else ResultStream()
+    async for batch in stream_carousell_async(search_term, engine):
+        stream.extend(batch)
 
-                except Exception as e:
-                    logger.error(f"An error occurred: {str(e)}")
-                    await save_debug_info(page, 'error')
-                    return [], None
+    LISTINGS_PER_SCRAPE.observe(len(stream.items))
+    if not stream.items:
+        logger.info("No results found")
+        return [], None
+    return stream.items, await export_results(stream.items, search_term) if export else None
 
-                finally:
-                    await context.close()
-                    await browser.close()
+async def stream_with_browser(search_term):
+    # Retries timeouts and browser errors with backoff (retry_policy); blocks and pages whose
+    # cards can't be parsed fail straight away. Raises ScrapeFailure once it gives up.
+    # While the circuit breaker is open only one attempt is made.
+    max_attempts = 1 if scrape_breaker.is_open else retry_policy.max_attempts
+    screenshots = browser_pool.profile.screenshots
+    failure = None
+    for attempt in range(max_attempts):
+        if failure is not None:
+            delay = retry_policy.delay(attempt - 1)
+            SCRAPE_RETRIES.inc(reason=failure.kind)
+            logger.info(f"Retrying in {delay:.1f}s (attempt {attempt + 1} of {max_attempts})...")
+            await asyncio.sleep(delay)
 
+        found = 0
+        html = None
+        try:
+            async with browser_pool.page() as page:
+                try:
+                    url = f"{CAROUSELL_BASE_URL}/search/{search_term}"
+                    cards = 0
+                    read_cards = 0
+                    timings = {}
+                    async for cards in load_listings(page, url, timings=timings):
+                        batch, read_cards = await read_new_cards(page, read_cards)
+                        if batch:
+                            found += len(batch)
+                            yield batch
+                    for stage, seconds in timings.items():
+                        SCRAPE_STAGE_SECONDS.observe(seconds, stage=stage)
+
+                    if found:
+                        SCRAPES.inc(engine='browser', outcome='success')
+                        return
+                    html = await page.content()
+                    if looks_blocked(html):
+                        failure = ScrapeFailure("got a block or captcha page", BLOCKED)
+                    elif cards:
+                        failure = ScrapeFailure(f"{cards} listing cards rendered but none could be parsed", PARSE)
+                    else:
+                        logger.warning("Could not find any complete listings.")
+                        await debug_capture.capture(page, 'no_listings', html=html, screenshot=screenshots)
+                        SCRAPES.inc(engine='browser', outcome='empty')
+                        return
+                except PlaywrightTimeoutError as e:
+                    failure = ScrapeFailure(f"timed out: {str(e).splitlines()[0]}", TIMEOUT)
+                except Exception as e:
+                    failure = ScrapeFailure(str(e), ERROR)
+                await debug_capture.capture(page, failure.kind, html=html, screenshot=screenshots)
         except Exception as e:
-            logger.error(f"An error occurred on attempt {attempt + 1}: {str(e)}")
-            if attempt < MAX_RETRIES - 1:
-                logger.info(f"Retrying in {RETRY_DELAY} seconds...")
-                await asyncio.sleep(RETRY_DELAY)
-            else:
-                logger.error("Max retries reached. Scraping failed.")
-                return [], None
+            # Getting a page failed: the browser crashed, lost its connection or couldn't launch
+            browser_pool.mark_unhealthy()
+            failure = ScrapeFailure(str(e), ERROR)
+
+        SCRAPE_FAILURES.inc(engine='browser', kind=failure.kind)
+        logger.warning(f"Browser scrape attempt {attempt + 1} of {max_attempts} failed ({failure.kind}): {str(failure)}")
+        if found:
+            # Keep what was already streamed instead of starting over
+            SCRAPES.inc(engine='browser', outcome='partial')
+            return
+        if not retry_policy.should_retry(failure.kind, attempt, max_attempts):
+            break
 
-    # If we've reached this point, all retries failed
-    return [], None
\ No newline at end of file
+    logger.error(f"Scraping '{search_term}' failed ({failure.kind}).")
+    SCRAPES.inc(engine='browser', outcome='failure')
+    raise failure
\ No newline at end of file
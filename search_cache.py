@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import asyncio
+import logging
+import time
+from scrape_dispatcher import scrape_dispatcher
+from scraper import ResultStream
+from price_history import price_history
+from result_sessions import listing_store
+from config import SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_search_term(search_term: str) -> str:
+    return ' '.join(search_term.lower().split())
+
+
+class SearchCache:
+    # TTL + LRU cache in front of the scrape queue. Concurrent lookups for the same
+    # normalized term share a single in-flight scrape.
+
+    def __init__(self, scrape=scrape_dispatcher.submit, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self._scrape = scrape
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, results, export)
+        self._in_flight = {}  # key -> ResultStream
+        self._tasks = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, results, export = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return results, export
+
+    def _store(self, key, results, export) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, results, export)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def open_stream(self, search_term, **dispatch_options) -> ResultStream:
+        # Returns a stream of the term's results: already complete on a cache hit, otherwise
+        # shared with any in-flight scrape for the same term. dispatch_options (priority,
+        # user_id, on_queued) are passed to the scrape queue.
+        key = normalize_search_term(search_term)
+
+        cached = self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            logger.info(f"Search cache hit for '{key}'")
+            return ResultStream.finished(cached[0], cached[1])
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight scrape for '{key}'")
+            return in_flight
+
+        self.misses += 1
+        logger.info(f"Search cache miss for '{key}' ({self.stats()})")
+        stream = ResultStream()
+        self._in_flight[key] = stream
+        task = asyncio.create_task(self._fill(key, search_term, stream, dispatch_options))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return stream
+
+    async def _fill(self, key, search_term, stream, dispatch_options) -> None:
+        try:
+            results, export = await self._scrape(search_term, stream=stream, **dispatch_options)
+            # Prices are recorded from the scraped objects: intern() may swap in older canonical
+            # ones, whose scraped_at is from the scrape that first saw them
+            scraped = list(results)
+            # Share listing objects with earlier result sets instead of keeping duplicates
+            listing_store.intern(results)
+            # Failed or empty scrapes are not cached so the next lookup retries
+            if results:
+                self._store(key, results, export)
+            stream.finish(results, export)
+            if results:
+                await self._record_prices(key, scraped)
+        except Exception as e:
+            logger.error(f"Scrape for '{key}' failed: {str(e)}")
+            stream.finish(error=e)
+        finally:
+            del self._in_flight[key]
+
+    async def _record_prices(self, key, results) -> None:
+        try:
+            await asyncio.to_thread(price_history.record, key, results)
+        except Exception as e:
+            logger.error(f"Failed to record price history for '{key}': {str(e)}")
+
+    async def get(self, search_term, **dispatch_options):
+        results, export = await self.open_stream(search_term, **dispatch_options).result()
+        return list(results), export
+
+    def invalidate(self, search_term=None) -> None:
+        if search_term is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(normalize_search_term(search_term), None)
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'entries': len(self._entries),
+            'in_flight': len(self._in_flight),
+        }
+
+
+search_cache = SearchCache()
\ No newline at end of file
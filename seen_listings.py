@@ -0,0 +1,96 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import SEEN_LISTINGS_DB_PATH, SEEN_LISTINGS_TTL
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 3600  # seconds
+
+
+class SeenListingsStore:
+    # SQLite index of listings already alerted per (chat, search term). Rows not seen
+    # again within `ttl` seconds are purged so the index stays bounded.
+
+    def __init__(self, path=SEEN_LISTINGS_DB_PATH, ttl=SEEN_LISTINGS_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_purge = 0.0
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_listings ("
+                " chat_id INTEGER NOT NULL,"
+                " search_key TEXT NOT NULL,"
+                " listing_id TEXT NOT NULL,"
+                " price_cents INTEGER,"
+                " last_seen REAL NOT NULL,"
+                " PRIMARY KEY (chat_id, search_key, listing_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_listings_last_seen ON seen_listings (last_seen)")
+        return self._conn
+
+    def filter_new(self, chat_id: int, search_key: str, items) -> list:
+        # Returns the items that are new or cheaper than last time, and records all of them as seen.
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            keys = [item.key for item in items]
+            known = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT listing_id, price_cents FROM seen_listings WHERE chat_id = ? AND search_key = ? "
+                    f"AND listing_id IN ({','.join('?' * len(chunk))})",
+                    [chat_id, search_key, *chunk]
+                )
+                known.update(rows)
+
+            changed = []
+            rows = []
+            for key, item in zip(keys, items):
+                if key not in known:
+                    changed.append(item)
+                elif item.price_cents is not None and known[key] is not None and item.price_cents < known[key]:
+                    changed.append(item)
+                rows.append((chat_id, search_key, key, item.price_cents, now))
+
+            with conn:
+                conn.executemany(
+                    "INSERT INTO seen_listings (chat_id, search_key, listing_id, price_cents, last_seen) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (chat_id, search_key, listing_id) DO UPDATE SET price_cents = excluded.price_cents, last_seen = excluded.last_seen",
+                    rows
+                )
+                if now - self._last_purge > PURGE_INTERVAL:
+                    purged = conn.execute("DELETE FROM seen_listings WHERE last_seen < ?", (now - self.ttl,)).rowcount
+                    self._last_purge = now
+                    if purged:
+                        logger.info(f"Purged {purged} expired seen listings")
+        return changed
+
+    def forget(self, chat_id: int, search_key: str = None) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if search_key is None:
+                    conn.execute("DELETE FROM seen_listings WHERE chat_id = ?", (chat_id,))
+                else:
+                    conn.execute("DELETE FROM seen_listings WHERE chat_id = ? AND search_key = ?", (chat_id, search_key))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+seen_listings = SeenListingsStore()
\ No newline at end of file
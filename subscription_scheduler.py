@@ -0,0 +1,243 @@
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+from telegram.ext import ContextTypes
+from search_cache import search_cache, normalize_search_term
+from scrape_dispatcher import BACKGROUND
+from outbox import TokenBucket
+from scrape_policy import scrape_breaker
+from alert_rules import AlertRule, RuleSet
+from metrics import SCHEDULED_JOB_LAG_SECONDS, SCHEDULED_RUNS
+from config import (
+    SCHEDULER_MIN_FIRST_DELAY, SCHEDULER_MAX_JITTER, SCHEDULER_MIN_INTERVAL, SCHEDULER_MAX_INTERVAL,
+    SCHEDULER_AUTO_INTERVAL, SCHEDULER_ADAPT_RANGE, SCHEDULER_TARGET_NEW_LISTINGS, SCHEDULER_STALE_BACKOFF,
+    SCHEDULER_HOURLY_BUDGET
+)
+
+logger = logging.getLogger(__name__)
+
+AUTO = 0  # Subscription.minutes for "let the bot decide"
+RESCHEDULE_JITTER = 0.1  # +/- fraction added to every delay so groups drift apart
+
+
+@dataclass
+class Subscription:
+    chat_id: int
+    search_term: str
+    max_price: Optional[float]
+    minutes: int
+    rule: AlertRule = AlertRule()
+
+
+class GroupSchedule:
+    # Polling interval of one group, adapted to how many new listings each run finds.
+    # The interval stays within [floor, ceiling]: the global limits for automatic groups, or
+    # the chosen interval divided/multiplied by SCHEDULER_ADAPT_RANGE for fixed ones.
+    __slots__ = ('floor', 'ceiling', 'interval', 'new_per_hour', 'failures', 'last_run_at', 'last_keys', 'due')
+
+    def __init__(self, minutes: int):
+        if minutes == AUTO:
+            self.floor, self.ceiling, self.interval = SCHEDULER_MIN_INTERVAL, SCHEDULER_MAX_INTERVAL, SCHEDULER_AUTO_INTERVAL
+        else:
+            self.floor = max(SCHEDULER_MIN_INTERVAL, minutes / SCHEDULER_ADAPT_RANGE)
+            self.ceiling = max(self.floor, min(SCHEDULER_MAX_INTERVAL, minutes * SCHEDULER_ADAPT_RANGE))
+            self.interval = minutes
+        self.interval = min(max(self.interval, self.floor), self.ceiling)  # minutes
+        self.new_per_hour = None  # smoothed rate of listings not seen on the previous run
+        self.failures = 0
+        self.last_run_at = None
+        self.last_keys = None
+        self.due = None
+
+    def record_success(self, results, now=None) -> int:
+        now = time.time() if now is None else now
+        keys = {item.key for item in results}
+        new = None if self.last_keys is None else len(keys - self.last_keys)
+        if new is not None and self.last_run_at is not None:
+            hours = max(now - self.last_run_at, 60) / 3600
+            rate = new / hours
+            self.new_per_hour = rate if self.new_per_hour is None else 0.5 * self.new_per_hour + 0.5 * rate
+            if new == 0:
+                interval = self.interval * SCHEDULER_STALE_BACKOFF
+            else:
+                # Aim for about SCHEDULER_TARGET_NEW_LISTINGS new listings per run, moving at most 2x per step
+                target = SCHEDULER_TARGET_NEW_LISTINGS / max(self.new_per_hour, 1e-6) * 60
+                interval = min(max(target, self.interval / 2), self.interval * 2)
+            self.interval = min(max(interval, self.floor), self.ceiling)
+        self.failures = 0
+        self.last_run_at = now
+        self.last_keys = keys
+        return new or 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+
+    def next_delay(self) -> float:
+        # Seconds until the next run; repeated failures back off exponentially up to the ceiling
+        minutes = min(self.interval * 2 ** self.failures, max(self.ceiling, self.interval))
+        return minutes * 60
+
+
+class SubscriptionScheduler:
+    # Groups subscriptions by (normalized search term, interval) so each group costs one
+    # scrape per run no matter how many chats subscribe to it. Results are fanned out
+    # to every chat in the group through `deliver(context, subscription, matching_items, export)`,
+    # after matching the results against all of the group's alert rules in one pass (RuleSet).
+    # Each group reschedules itself after every run (see GroupSchedule), and all groups
+    # together stay within SCHEDULER_HOURLY_BUDGET scrapes per hour.
+
+    def __init__(self, deliver, hourly_budget=SCHEDULER_HOURLY_BUDGET):
+        self.deliver = deliver
+        self.hourly_budget = hourly_budget
+        self._budget = TokenBucket(hourly_budget / 3600, max(1.0, hourly_budget / 12)) if hourly_budget else None
+        self._groups = {}  # (term key, minutes) -> {chat_id: Subscription}
+        self._jobs = {}  # (term key, minutes) -> Job of the group's next run
+        self._schedules = {}  # (term key, minutes) -> GroupSchedule
+        self._by_chat = {}  # chat_id -> (term key, minutes)
+        self._rule_sets = {}  # (term key, minutes) -> RuleSet of the group's rules, built on first use
+        self.deferred = 0
+        self.paused = 0
+
+    def subscribe(self, job_queue, chat_id: int, search_term: str, max_price: Optional[float], minutes: int,
+                  rule: Optional[AlertRule] = None) -> Subscription:
+        self.unsubscribe(chat_id)
+
+        if rule is None:
+            rule = AlertRule(max_cents=None if max_price is None else round(max_price * 100))
+        group_key = (normalize_search_term(search_term), minutes)
+        subscription = Subscription(chat_id, search_term, max_price, minutes, rule)
+        self._groups.setdefault(group_key, {})[chat_id] = subscription
+        self._by_chat[chat_id] = group_key
+        self._rule_sets.pop(group_key, None)
+
+        if group_key not in self._jobs:
+            schedule = self._schedules[group_key] = GroupSchedule(minutes)
+            # Spread group start times so restarts and bursts of new subscriptions don't scrape at once
+            first = SCHEDULER_MIN_FIRST_DELAY + random.uniform(0, min(schedule.interval * 60, SCHEDULER_MAX_JITTER))
+            self._schedule(job_queue, group_key, first)
+            logger.info(f"Scheduled search group {group_key} starting in {first:.0f}s")
+
+        logger.info(f"Chat {chat_id} subscribed to {group_key} ({len(self._groups[group_key])} subscriber(s))")
+        return subscription
+
+    def unsubscribe(self, chat_id: int) -> bool:
+        group_key = self._by_chat.pop(chat_id, None)
+        if group_key is None:
+            return False
+
+        group = self._groups.get(group_key, {})
+        group.pop(chat_id, None)
+        self._rule_sets.pop(group_key, None)
+        if not group:
+            self._groups.pop(group_key, None)
+            self._schedules.pop(group_key, None)
+            job = self._jobs.pop(group_key, None)
+            if job is not None:
+                job.schedule_removal()
+            logger.info(f"Removed empty search group {group_key}")
+        return True
+
+    def get_subscription(self, chat_id: int) -> Optional[Subscription]:
+        group_key = self._by_chat.get(chat_id)
+        if group_key is None:
+            return None
+        return self._groups[group_key].get(chat_id)
+
+    def get_schedule(self, chat_id: int) -> Optional[GroupSchedule]:
+        return self._schedules.get(self._by_chat.get(chat_id))
+
+    def _rule_set(self, group_key) -> RuleSet:
+        rule_set = self._rule_sets.get(group_key)
+        if rule_set is None:
+            group = self._groups.get(group_key, {})
+            rule_set = self._rule_sets[group_key] = RuleSet({chat_id: sub.rule for chat_id, sub in group.items()})
+        return rule_set
+
+    def demand_per_hour(self) -> float:
+        return sum(60 / schedule.interval for schedule in self._schedules.values())
+
+    def _schedule(self, job_queue, group_key, delay: float) -> None:
+        self._schedules[group_key].due = time.time() + delay
+        self._jobs[group_key] = job_queue.run_once(self.run_group, when=delay, data=group_key,
+                                                   name=f"search:{group_key[0]}:{group_key[1]}")
+
+    def _reschedule(self, job_queue, group_key, finished_job) -> None:
+        schedule = self._schedules.get(group_key)
+        # Skip groups removed (or removed and re-created) while this run was in progress
+        if schedule is None or self._jobs.get(group_key) is not finished_job:
+            return
+        delay = schedule.next_delay()
+        # When every group's preferred interval together exceeds the budget, stretch them all evenly
+        demand = self.demand_per_hour()
+        if self.hourly_budget and demand > self.hourly_budget:
+            delay *= demand / self.hourly_budget
+        delay *= 1 + random.uniform(-RESCHEDULE_JITTER, RESCHEDULE_JITTER)
+        self._schedule(job_queue, group_key, delay)
+
+    def _record_lag(self, schedule: GroupSchedule) -> None:
+        if schedule.due is not None:
+            SCHEDULED_JOB_LAG_SECONDS.observe(max(time.time() - schedule.due, 0.0))
+
+    async def run_group(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        group_key = context.job.data
+        schedule = self._schedules.get(group_key)
+        subscriptions = list(self._groups.get(group_key, {}).values())
+        if schedule is None or not subscriptions:
+            return
+        self._record_lag(schedule)
+
+        if not scrape_breaker.allow():
+            # Scraping keeps failing: wait for the circuit breaker instead of adding load
+            delay = scrape_breaker.retry_after() + random.uniform(0, SCHEDULER_MIN_FIRST_DELAY)
+            self.paused += 1
+            SCHEDULED_RUNS.inc(outcome='paused')
+            logger.info(f"Scrape circuit is {scrape_breaker.state}; pausing group {group_key} for {delay:.0f}s")
+            self._schedule(context.job_queue, group_key, delay)
+            return
+
+        if self._budget is not None and not self._budget.try_acquire():
+            # Out of budget: try again once a scrape is available, without touching the interval
+            delay = self._budget.delay() + random.uniform(0, SCHEDULER_MIN_FIRST_DELAY)
+            self.deferred += 1
+            SCHEDULED_RUNS.inc(outcome='deferred')
+            logger.info(f"Hourly scrape budget used up; deferring group {group_key} by {delay:.0f}s")
+            self._schedule(context.job_queue, group_key, delay)
+            return
+
+        logger.info(f"Running scheduled search group {group_key} for {len(subscriptions)} chat(s)")
+        try:
+            try:
+                results, export = await search_cache.get(subscriptions[0].search_term, priority=BACKGROUND)
+            except Exception as e:
+                schedule.record_failure()
+                SCHEDULED_RUNS.inc(outcome='failed')
+                logger.error(f"Scheduled search for group {group_key} failed "
+                             f"({schedule.failures} in a row): {str(e)}", exc_info=True)
+                return
+
+            if results:
+                new = schedule.record_success(results)
+                logger.info(f"Group {group_key}: {new} new listings, next interval {schedule.interval:.0f} min")
+            else:
+                schedule.record_failure()
+            SCHEDULED_RUNS.inc(outcome='ran')
+
+            matches = self._rule_set(group_key).match(results) if results else {}
+            for subscription in subscriptions:
+                try:
+                    await self.deliver(context, subscription, matches.get(subscription.chat_id, []), export)
+                except Exception as e:
+                    logger.error(f"Error delivering scheduled results to chat {subscription.chat_id}: {str(e)}", exc_info=True)
+        finally:
+            self._reschedule(context.job_queue, group_key, context.job)
+
+    def stats(self) -> dict:
+        return {
+            'groups': len(self._schedules),
+            'demand_per_hour': self.demand_per_hour(),
+            'hourly_budget': self.hourly_budget,
+            'deferred': self.deferred,
+            'paused': self.paused,
+        }
\ No newline at end of file
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The bot's modules live in the repository root and read config at import time, so every
+# on-disk path is pointed at a scratch directory before any of them is imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='carousell_bot_tests_')
+for name in ('SEEN_LISTINGS_DB_PATH', 'PRICE_HISTORY_DB_PATH', 'PERSISTENCE_DB_PATH', 'DEBUG_CAPTURE_DIR',
+             'BROWSER_STORAGE_STATE_PATH', 'EXPORT_ARCHIVE_DIR'):
+    os.environ.pop(name, None)
+os.environ['METRICS_PORT'] = '0'
\ No newline at end of file
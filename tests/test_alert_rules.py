@@ -0,0 +1,37 @@
+import pytest
+
+from alert_rules import AlertRule, parse_alert_rule
+
+
+@pytest.mark.parametrize('text, max_cents', [
+    ('50', 5000),
+    ('S$50', 5000),
+    ('$12.50', 1250),
+    ('1,200', 120000),
+    ('$1,200', 120000),
+    ('S$ 1,200.50', 120050),
+    ('1,000,000', 100000000),
+])
+def test_bare_prices(text, max_cents):
+    assert parse_alert_rule(text) == AlertRule(max_cents=max_cents)
+
+
+def test_filter_rules():
+    rule = parse_alert_rule('1,000-2,000 iphone 15 -case @Seller !@reseller9 is:new')
+    assert (rule.min_cents, rule.max_cents) == (100000, 200000)
+    assert rule.include == {'iphone', '15'} and rule.exclude == {'case'}
+    assert rule.sellers == {'seller'} and rule.blocked_sellers == {'reseller9'}
+    assert rule.conditions == {'new'}
+    assert parse_alert_rule('<1,500 pro').max_cents == 150000
+    assert parse_alert_rule('>100').min_cents == 10000
+
+
+def test_keyword_rules_without_numbers():
+    assert parse_alert_rule('pro -case').include == {'pro'}
+    assert parse_alert_rule('@seller123').sellers == {'seller123'}
+
+
+@pytest.mark.parametrize('text', ['1,2', '1.2.3', 'under 500', '$1,20', 'iphone 15'])
+def test_numbers_that_are_not_a_price_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_alert_rule(text)
\ No newline at end of file
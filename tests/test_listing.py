@@ -0,0 +1,19 @@
+from listing import Listing
+from utils import parse_price_cents
+
+
+def test_parse_price_cents():
+    assert parse_price_cents('S$1,200') == 120000
+    assert parse_price_cents('Free') == 0
+    assert parse_price_cents('Contact seller') is None
+    assert parse_price_cents(None) is None
+
+
+def test_listing_without_a_price():
+    listing = Listing('1', 'iPhone 15', None, 'seller')
+    assert listing.price_cents is None
+
+    row = listing.to_dict()
+    del row['price_cents']
+    assert Listing.from_dict(row).price_cents is None
+    assert Listing.from_dict({'id': '2', 'name': 'iPad', 'username': 'seller'}).price_cents is None
\ No newline at end of file
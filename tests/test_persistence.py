@@ -0,0 +1,49 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from persistence import SQLitePersistence
+
+
+def test_flush_keeps_a_batch_whose_write_fails_during_shutdown(tmp_path):
+    path = str(tmp_path / 'bot_data.db')
+
+    async def scenario():
+        persistence = SQLitePersistence(path=path, write_delay=0)
+        write_batch = persistence._write_batch
+        writing = threading.Event()
+        calls = []
+
+        def flaky_write_batch(pending):
+            first = not calls
+            calls.append(dict(pending))
+            writing.set()
+            time.sleep(0.2)
+            if first:
+                raise sqlite3.OperationalError("database is locked")
+            write_batch(pending)
+
+        persistence._write_batch = flaky_write_batch
+        await persistence.update_user_data(1, {'term': 'iphone'})
+        await asyncio.to_thread(writing.wait)  # the writer is now in the middle of its batch
+        await persistence.update_user_data(2, {'term': 'ipad'})
+        await persistence.flush()
+        return await SQLitePersistence(path=path).get_user_data()
+
+    result = asyncio.run(scenario()); print('RESULT', result)
+    assert result == {1: {'term': 'iphone'}, 2: {'term': 'ipad'}}
+
+
+def test_flush_does_not_wait_out_the_write_delay(tmp_path):
+    path = str(tmp_path / 'bot_data.db')
+
+    async def scenario():
+        persistence = SQLitePersistence(path=path, write_delay=30)
+        await persistence.update_chat_data(5, {'subscription': {'term': 'switch'}})
+        started = time.monotonic()
+        await persistence.flush()
+        return time.monotonic() - started, await SQLitePersistence(path=path).get_chat_data()
+
+    elapsed, chat_data = asyncio.run(scenario())
+    assert elapsed < 5
+    assert chat_data == {5: {'subscription': {'term': 'switch'}}}
\ No newline at end of file
@@ -0,0 +1,37 @@
+import gc
+import weakref
+
+from listing import Listing
+from result_sessions import ListingStore, ResultSessionStore
+
+
+def listings(count, start=0):
+    return [Listing(str(i), f"Item {i}", f"S${i}", 'seller') for i in range(start, start + count)]
+
+
+def test_result_index_goes_with_the_session():
+    store = ResultSessionStore(ttl=60, memory_budget=10 ** 9, max_sessions=10, listings=ListingStore())
+    results = listings(5)
+    store.put(1, 'item', results)
+    store.put(2, 'item', results)  # a cached result set shared by two sessions
+
+    index = store.index_for(results)
+    assert store.index_for(results) is index
+    results.extend(listings(2, start=5))  # still streaming
+    index = store.index_for(results)
+    assert index.size == 7
+
+    index_ref = weakref.ref(index)
+    del index
+    store.drop(1)
+    assert index_ref() is not None
+    store.drop(2)
+    gc.collect()
+    assert index_ref() is None
+
+
+def test_lists_without_a_session_are_not_kept():
+    store = ResultSessionStore(listings=ListingStore())
+    results = listings(3)
+    assert store.index_for(results).select('price_desc') == [2, 1, 0]
+    assert not store._lists
\ No newline at end of file
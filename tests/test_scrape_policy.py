@@ -0,0 +1,17 @@
+import pytest
+
+from scrape_policy import RetryPolicy, TIMEOUT, BLOCKED
+
+
+def test_retries_only_retryable_failures_within_the_attempts():
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.should_retry(TIMEOUT, 0)
+    assert policy.should_retry(TIMEOUT, 1)
+    assert not policy.should_retry(TIMEOUT, 2)
+    assert not policy.should_retry(BLOCKED, 0)
+    assert not RetryPolicy(max_attempts=1).should_retry(TIMEOUT, 0)
+
+
+def test_at_least_one_attempt():
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
\ No newline at end of file
@@ -0,0 +1,71 @@
+import asyncio
+
+import scrape_worker
+from job_queue import JobQueueError, encode
+from listing import Listing
+from scrape_policy import CircuitBreaker, ScrapeFailure, BLOCKED, CLOSED, OPEN
+from scrape_worker import ScrapeWorker
+
+
+def job(job_id='j1'):
+    return encode({'job': job_id, 'reply_to': f"replies:{job_id}", 'search_term': 'iphone', 'engine': 'http'})
+
+
+def run_job(monkeypatch, scrape, reply):
+    breaker = CircuitBreaker(failure_threshold=3)
+    monkeypatch.setattr(scrape_worker, 'scrape_carousell_async', scrape)
+    monkeypatch.setattr(scrape_worker, 'scrape_breaker', breaker)
+
+    async def run():
+        worker = ScrapeWorker('redis://127.0.0.1:1/0', concurrency=1)
+        worker._reply = reply
+        await worker._slots.acquire()
+        await worker._run_job(job())
+        await asyncio.sleep(0)
+        return worker
+
+    return asyncio.run(run()), breaker
+
+
+def test_failed_reply_cancels_the_scrape(monkeypatch):
+    state = {}
+
+    async def scrape(search_term, engine, stream=None, export=True):
+        try:
+            stream.extend([Listing('1', 'iPhone 15', 'S$900', 'seller')])
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            state['cancelled'] = True
+            raise
+
+    async def reply(reply_to, message):
+        if message['type'] == 'batch':
+            raise JobQueueError("connection lost")
+
+    worker, breaker = run_job(monkeypatch, scrape, reply)
+    assert state.get('cancelled')
+    assert worker.failed == 1
+    assert breaker.failures == 0  # a queue error says nothing about Carousell
+
+
+def test_scrape_outcomes_reach_the_workers_breaker(monkeypatch):
+    async def blocked(search_term, engine, stream=None, export=True):
+        raise ScrapeFailure("captcha", kind=BLOCKED)
+
+    replies = []
+
+    async def reply(reply_to, message):
+        replies.append(message)
+
+    worker, breaker = run_job(monkeypatch, blocked, reply)
+    assert breaker.state == OPEN
+    assert replies[-1]['type'] == 'error' and replies[-1]['kind'] == BLOCKED
+
+    async def found(search_term, engine, stream=None, export=True):
+        items = [Listing('1', 'iPhone 15', 'S$900', 'seller')]
+        stream.extend(items)
+        return items, None
+
+    worker, breaker = run_job(monkeypatch, found, reply)
+    assert breaker.state == CLOSED and breaker.failures == 0
+    assert replies[-1]['type'] == 'done'
\ No newline at end of file
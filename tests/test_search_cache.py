@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sqlite3
+import time
+
+import search_cache
+from listing import Listing
+from price_history import PriceHistoryStore
+from result_sessions import ListingStore
+from search_cache import SearchCache
+
+
+def test_price_history_gets_the_time_of_each_scrape(monkeypatch, tmp_path):
+    history = PriceHistoryStore(path=os.path.join(tmp_path, 'price_history.db'))
+    store = ListingStore()
+    monkeypatch.setattr(search_cache, 'price_history', history)
+    monkeypatch.setattr(search_cache, 'listing_store', store)
+    first_seen, seen_again = time.time() - 60, time.time()
+    scrape_times = iter([first_seen, seen_again])
+
+    async def scrape(search_term, stream=None, **options):
+        # The same listing, unchanged, seen by two scrapes
+        return [Listing('42', 'iPhone 15', 'S$900', 'seller', scraped_at=next(scrape_times))], None
+
+    async def run():
+        cache = SearchCache(scrape=scrape)
+        first, _ = await cache.get('iphone')
+        await asyncio.gather(*cache._tasks)
+        cache.invalidate('iphone')
+        second, _ = await cache.get('iphone')
+        await asyncio.gather(*cache._tasks)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second[0] is first[0]  # interned to the first scrape's object
+
+    rows = sqlite3.connect(history.path).execute("SELECT scraped_at FROM price_history ORDER BY scraped_at").fetchall()
+    assert rows == [(first_seen,), (seen_again,)]
\ No newline at end of file
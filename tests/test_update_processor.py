@@ -0,0 +1,62 @@
+import asyncio
+
+from telegram import Update
+
+from update_processor import PerUserUpdateProcessor
+
+
+def message_update(update_id: int, user_id: int) -> Update:
+    user = {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"}
+    return Update.de_json({'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': 0, 'chat': {'id': user_id, 'type': 'private'}, 'from': user,
+        'text': 'hi'}}, None)
+
+
+def test_other_users_run_while_one_user_is_blocked():
+    async def run():
+        processor = PerUserUpdateProcessor(2)
+        release_a = asyncio.Event()
+        order = []
+
+        async def handle(name, wait=None):
+            order.append(f"{name} started")
+            if wait is not None:
+                await wait.wait()
+            order.append(f"{name} done")
+
+        # A's first update blocks, its second queues behind it; B must not wait for either
+        a1 = asyncio.create_task(processor.process_update(message_update(1, 1), handle('a1', release_a)))
+        a2 = asyncio.create_task(processor.process_update(message_update(2, 1), handle('a2')))
+        await asyncio.sleep(0)
+        b = asyncio.create_task(processor.process_update(message_update(3, 2), handle('b')))
+        await asyncio.wait_for(b, 1)
+        assert 'a1 done' not in order and 'a2 started' not in order
+
+        release_a.set()
+        await asyncio.gather(a1, a2)
+        assert order.index('a1 done') < order.index('a2 started')
+        assert not processor._locks
+
+    asyncio.run(run())
+
+
+def test_one_update_at_a_time_per_user():
+    async def run():
+        processor = PerUserUpdateProcessor(4)
+        running = 0
+        peak = 0
+        order = []
+
+        async def handle(n):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            order.append(n)
+            running -= 1
+
+        await asyncio.gather(*(processor.process_update(message_update(n, 1), handle(n)) for n in range(5)))
+        assert peak == 1
+        assert order == list(range(5))
+
+    asyncio.run(run())
\ No newline at end of file
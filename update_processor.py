@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    # Runs updates from different users at the same time (up to max_concurrent_updates), but
+    # one at a time and in arrival order per user and chat. The ConversationHandler relies on
+    # that: a second message while handle_search is still running must see the state it returns.
+    # An update waits for its user's turn before it takes one of the concurrent slots, so updates
+    # queued behind a slow one of the same user don't hold slots other users need.
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}  # (chat_id, user_id) -> [lock, updates holding or waiting for it]
+
+    @staticmethod
+    def _key(update):
+        if not isinstance(update, Update):
+            return None
+        chat, user = update.effective_chat, update.effective_user
+        if chat is None and user is None:
+            return None
+        return (chat.id if chat else None, user.id if user else None)
+
+    # process_update is only marked @final as a typing hint; it is overridden so the wait for the
+    # user's turn happens outside the semaphore the base class holds
+    async def process_update(self, update, coroutine) -> None:
+        key = self._key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+
+        # As in Outbox.call, the lock is dropped only once no update holds or waits for it
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                # The base class takes the concurrent slot and calls do_process_update
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
\ No newline at end of file
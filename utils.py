@@ -1,9 +1,19 @@
 from telegram import Update, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from outbox import outbox
+from typing import Optional
+import re
 
 # States for the ConversationHandler
-MAIN_MENU, SEARCH, VIEWING_RESULTS, FILTERING, SET_PRICE_ALERT, SET_FREQUENCY, VIEW_TRACKED_ITEMS, EDIT_TRACKED_ITEM = range(8)
+MAIN_MENU, SEARCH, VIEWING_RESULTS, FILTERING, SET_PRICE_ALERT, SET_FREQUENCY, VIEW_TRACKED_ITEMS, EDIT_TRACKED_ITEM, REFINING_RESULTS = range(9)
+STATE_NAMES = {
+    MAIN_MENU: 'main_menu', SEARCH: 'search', VIEWING_RESULTS: 'viewing_results', FILTERING: 'filtering',
+    SET_PRICE_ALERT: 'set_price_alert', SET_FREQUENCY: 'set_frequency', VIEW_TRACKED_ITEMS: 'view_tracked_items',
+    EDIT_TRACKED_ITEM: 'edit_tracked_item', REFINING_RESULTS: 'refining_results',
+}
+
+PRICE_PATTERN = re.compile(r'(\d[\d,]*(?:\.\d+)?)')
 
 async def send_typing_action(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
     await context.bot.send_chat_action(chat_id=chat_id, action="typing")
@@ -11,12 +21,25 @@ async def send_typing_action(context: ContextTypes.DEFAULT_TYPE, chat_id: int):
 async def update_message(update: Update, text: str, reply_markup: InlineKeyboardMarkup = None):
     if update.callback_query:
         await update.callback_query.answer()
-        await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+        return await outbox.call(update.effective_chat.id, lambda: update.callback_query.edit_message_text(
+            text, reply_markup=reply_markup, parse_mode=ParseMode.HTML))
     else:
-        await update.message.reply_text(text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+        return await outbox.call(update.effective_chat.id, lambda: update.message.reply_text(
+            text, reply_markup=reply_markup, parse_mode=ParseMode.HTML))
+
+def parse_price_cents(price: Optional[str]) -> Optional[int]:
+    # "S$1,200" -> 120000, "S$12.50" -> 1250, "Free" -> 0. Ranges use the lower bound.
+    # Returns None for anything that isn't a price, including a missing one.
+    if price is None:
+        return None
+    text = price.strip().lower()
+    if text in ('free', 's$0'):
+        return 0
+    match = PRICE_PATTERN.search(text)
+    if not match:
+        return None
+    return round(float(match.group(1).replace(',', '')) * 100)
 
 def format_price(price: str) -> float:
-    try:
-        return float(price.replace('S$', '').replace(',', ''))
-    except ValueError:
-        return 0.0
\ No newline at end of file
+    cents = parse_price_cents(price)
+    return 0.0 if cents is None else cents / 100
\ No newline at end of file